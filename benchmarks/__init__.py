@@ -0,0 +1 @@
+"""Benchmarks for py-rt against a local fake RT server."""
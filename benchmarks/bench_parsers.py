@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+"""Reply parser micro-benchmarks with stored baselines.
+
+Run from the project directory::
+
+    python -m benchmarks.bench_parsers
+    python -m benchmarks.bench_parsers --update
+
+Every case is timed as the best of several repeats. Results are compared
+with the baselines stored for the running Python version and the exit
+status is 1 if a case is slower than its baseline by more than the
+threshold. ``--update`` stores the current results as the new baselines.
+
+Timings depend on the machine, run ``--update`` on the base revision
+first when checking a change on another machine.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import timeit
+
+import pyrt
+
+from .corpus import Corpus
+
+__all__ = [
+    'BASELINES',
+    'cases',
+    'compare',
+    'measure',
+    'main'
+]
+
+
+BASELINES = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+# minimal duration of one timed run in seconds
+MIN_TIME = 0.2
+
+
+def python_key():
+    """Return baseline key of the running Python, e.g. 'cpython-3.11'.
+
+    Return:
+        str
+    """
+
+    return '{}-{}.{}'.format(
+        platform.python_implementation().lower(), *sys.version_info[:2])
+
+
+def cases():
+    """Return benchmark cases with prepared replies.
+
+    Return:
+        [(str, callable)]
+    """
+
+    rt = pyrt.RT4()
+
+    default = Corpus(content_size=2000)
+    single_line = Corpus(content_size=2000, line_words=0)
+    ascii_only = Corpus(content_size=2000, non_ascii=False)
+    wide = Corpus(fields=200)
+
+    search = default.search_reply(range(1, 5001))
+    search_long = default.search_reply(
+        range(1, 501), 'l', set(['Subject', 'Status', 'Queue']))
+    ticket = wide.show_reply([1])
+    history = default.history_reply(1, 100)
+    history_single_line = single_line.history_reply(1, 100)
+    history_ascii = ascii_only.history_reply(1, 100)
+    history_bytes = history.encode('utf-8')
+    history_body = rt.check_reply(history)
+
+    return [
+        ('check_reply/search_5000', lambda: rt.check_reply(search)),
+        ('check_reply/history_100', lambda: rt.check_reply(history)),
+        ('parse_reply/search_5000', lambda: rt.parse_reply(search)),
+        ('parse_reply/ticket_200_fields', lambda: rt.parse_reply(ticket)),
+        ('parse_multi_reply/search_long_500',
+         lambda: rt.parse_multi_reply(search_long)),
+        ('parse_history_reply/100_multi_line',
+         lambda: rt.parse_history_reply(history)),
+        ('parse_history_reply/100_single_line',
+         lambda: rt.parse_history_reply(history_single_line)),
+        ('parse_history_reply/100_ascii',
+         lambda: rt.parse_history_reply(history_ascii)),
+        ('parse_history_reply/100_bytes',
+         lambda: rt.parse_history_reply(history_bytes)),
+        ('strip_all/history_100', lambda: rt._strip_all(history_body)),
+    ]
+
+
+def measure(function, repeat=5):
+    """Return the best time of one call in seconds.
+
+    Args:
+        function (callable): the benchmark
+        repeat (int): number of timed runs
+
+    Return:
+        float
+    """
+
+    timer = timeit.Timer(function)
+
+    number = 1
+    while timer.timeit(number) < MIN_TIME:
+
+        number *= 2
+
+    return min(timer.repeat(repeat, number)) / number
+
+
+def compare(results, baselines, threshold):
+    """Return cases slower than their baselines.
+
+    Args:
+        results ({str: float}): the measured times
+        baselines ({str: float}): the baseline times
+        threshold (float): allowed slowdown, 0.25 for 25 %
+
+    Return:
+        [str]
+    """
+
+    return sorted(
+        name for name, seconds in results.items()
+        if name in baselines and seconds > baselines[name] * (1 + threshold))
+
+
+def load_baselines(path):
+
+    if not os.path.exists(path):
+
+        return {}
+
+    with io.open(path, encoding='utf-8') as fh:
+
+        return json.load(fh)
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        'cases', nargs='*', metavar='CASE',
+        help='case name prefixes to run, all by default')
+    parser.add_argument(
+        '--repeat', type=int, default=5, help='timed runs per case')
+    parser.add_argument(
+        '--threshold', type=float, default=0.25,
+        help='allowed slowdown against the baseline, default 0.25')
+    parser.add_argument(
+        '--baselines', default=BASELINES, help='baselines JSON file')
+    parser.add_argument(
+        '--update', action='store_true',
+        help='store the results as the new baselines')
+    args = parser.parse_args(argv)
+
+    key = python_key()
+    stored = load_baselines(args.baselines)
+    baselines = stored.get(key, {})
+
+    print('{:<40} {:>12} {:>12} {:>8}'.format(
+        'case', 'us/call', 'baseline', 'change'))
+
+    results = {}
+    for name, function in cases():
+
+        if args.cases and not any(name.startswith(c) for c in args.cases):
+
+            continue
+
+        seconds = measure(function, args.repeat)
+        results[name] = seconds
+
+        baseline = baselines.get(name)
+        if baseline:
+
+            change = '{:+.0%}'.format(seconds / baseline - 1)
+            baseline = '{:.1f}'.format(baseline * 1e6)
+
+        else:
+
+            change = 'new'
+            baseline = '-'
+
+        print('{:<40} {:>12.1f} {:>12} {:>8}'.format(
+            name, seconds * 1e6, baseline, change))
+
+    if args.update:
+
+        baselines.update(results)
+        stored[key] = baselines
+
+        with io.open(args.baselines, 'w', encoding='utf-8') as fh:
+
+            fh.write(json.dumps(
+                stored, indent=2, separators=(',', ': '), sort_keys=True))
+            fh.write('\n')
+
+        print('Baselines for {} updated.'.format(key))
+
+        return 0
+
+    slower = compare(results, baselines, args.threshold)
+    if slower:
+
+        print('Slower than the baseline: ' + ', '.join(slower))
+
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+
+    sys.exit(main())
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+
+"""RT4 benchmarks against the fake RT server.
+
+Run from the project directory::
+
+    python -m benchmarks.bench_rt4 --tickets 500 --latency 0.005
+
+Every benchmark reports throughput, p50/p99 latency of single calls and
+the peak memory allocated by Python during the benchmark. The fake
+server runs in a child process, so its memory is not counted. Memory is
+traced in a separate run of the same calls, tracing slows the calls
+down; it needs tracemalloc (Python 3) and ``--no-memory`` skips it.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import argparse
+import json
+import random
+import time
+
+from multiprocessing.pool import ThreadPool
+
+try:
+
+    import tracemalloc
+
+except ImportError:
+
+    tracemalloc = None
+
+import pyrt
+
+from .corpus import Corpus
+from .fake_rt import FakeRTProcess
+
+__all__ = [
+    'BENCHMARKS',
+    'run_benchmark',
+    'main'
+]
+
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+def bench_get_ticket(rt, server, rand):
+
+    ticket = rt.get_ticket(str(rand.randint(1, server.tickets)))
+
+    return ticket.subject
+
+
+def bench_search_ticket(rt, server, rand):
+
+    return rt.search_ticket("Queue = 'General'").list_all()
+
+
+def bench_search_ticket_long(rt, server, rand):
+
+    return rt.search_ticket(
+        "Queue = 'General'", fields=['Subject', 'Status', 'Priority'])
+
+
+def bench_load_history(rt, server, rand):
+
+    return rt.load_history(str(rand.randint(1, server.tickets)))
+
+
+def bench_create_ticket(rt, server, rand):
+
+    return rt.create_ticket({
+        'content': 'Queue: General\nSubject: Benchmark {}\n'.format(
+            rand.randint(1, 1000000)),
+    })
+
+
+BENCHMARKS = (
+    ('get_ticket', bench_get_ticket),
+    ('search_ticket', bench_search_ticket),
+    ('search_ticket_long', bench_search_ticket_long),
+    ('load_history', bench_load_history),
+    ('create_ticket', bench_create_ticket),
+)
+
+
+def percentile(values, percent):
+    """Return nearest-rank percentile of sorted values.
+
+    Args:
+        values ([float]): the sorted values
+        percent (float): the percentile, 0 - 100
+
+    Return:
+        float
+    """
+
+    if not values:
+
+        return 0.0
+
+    index = int(round(percent / 100.0 * (len(values) - 1)))
+
+    return values[index]
+
+
+def _run_calls(function, rt, server, requests, workers, seed):
+    """Run benchmark calls and return the time and sorted latencies.
+
+    Return:
+        (float, [float])
+    """
+
+    rands = [random.Random(seed + number) for number in range(requests)]
+
+    def call(rand):
+
+        start = timer()
+        function(rt, server, rand)
+
+        return timer() - start
+
+    pool = ThreadPool(workers)
+
+    try:
+
+        start = timer()
+        latencies = sorted(pool.map(call, rands))
+        elapsed = timer() - start
+
+    finally:
+
+        pool.close()
+        pool.join()
+
+    return elapsed, latencies
+
+
+def peak_memory(function, *args):
+    """Return peak memory traced during the call in kB or None.
+
+    Allocations of all threads of the process are traced, the peak is
+    relative to the memory traced before the call.
+
+    Args:
+        function (callable): the measured function
+        args: the function arguments
+
+    Return:
+        int
+    """
+
+    if tracemalloc is None:
+
+        return None
+
+    started = not tracemalloc.is_tracing()
+    if started:
+
+        tracemalloc.start()
+
+    elif hasattr(tracemalloc, 'reset_peak'):
+
+        tracemalloc.reset_peak()
+
+    try:
+
+        before = tracemalloc.get_traced_memory()[0]
+        function(*args)
+
+        return (tracemalloc.get_traced_memory()[1] - before) // 1024
+
+    finally:
+
+        if started:
+
+            tracemalloc.stop()
+
+
+def run_benchmark(
+        function, rt, server, requests=100, workers=1, seed=0, memory=True):
+    """Run benchmark function and return statistics.
+
+    Args:
+        function (callable): the benchmark (rt, server, random)
+        rt (pyrt.RT4): the client
+        server (FakeRT/FakeRTProcess): the fake server
+        requests (int): number of calls
+        workers (int): number of concurrent calls
+        seed (int): random seed for ticket IDs
+        memory (bool): repeat the calls with traced memory
+
+    Return:
+        dict: calls, seconds, throughput (calls/s), p50 and p99 (ms),
+        peak_kb (None if not traced)
+    """
+
+    args = (function, rt, server, requests, workers, seed)
+    elapsed, latencies = _run_calls(*args)
+
+    return {
+        'calls': requests,
+        'seconds': elapsed,
+        'throughput': requests / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 50) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'peak_kb': peak_memory(_run_calls, *args) if memory else None,
+    }
+
+
+def main(argv=None):
+
+    names = [name for name, _ in BENCHMARKS]
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        'benchmarks', nargs='*', metavar='BENCHMARK',
+        help='benchmarks to run, all by default: ' + ', '.join(names))
+    parser.add_argument(
+        '--requests', type=int, default=200, help='calls per benchmark')
+    parser.add_argument(
+        '--workers', type=int, default=1, help='concurrent calls')
+    parser.add_argument(
+        '--tickets', type=int, default=100,
+        help='tickets on the server, also the search reply size')
+    parser.add_argument(
+        '--fields', type=int, default=0, help='custom fields per ticket')
+    parser.add_argument(
+        '--transactions', type=int, default=10,
+        help='history transactions per ticket')
+    parser.add_argument(
+        '--content-size', type=int, default=200,
+        help='transaction content size in characters')
+    parser.add_argument(
+        '--line-words', type=int, default=10,
+        help='words per content line, 0 for single-line content')
+    parser.add_argument(
+        '--ascii', action='store_true', help='ASCII-only replies')
+    parser.add_argument(
+        '--latency', type=float, default=0.0,
+        help='server delay of every reply in seconds')
+    parser.add_argument(
+        '--no-memory', dest='memory', action='store_false',
+        help='skip the traced run measuring peak memory')
+    parser.add_argument(
+        '--json', metavar='FILE', help='write results to JSON file')
+    args = parser.parse_args(argv)
+
+    unknown = set(args.benchmarks) - set(names)
+    if unknown:
+
+        parser.error('unknown benchmarks: ' + ', '.join(sorted(unknown)))
+
+    selected = args.benchmarks or names
+    results = {}
+
+    corpus = Corpus(
+        fields=args.fields,
+        content_size=args.content_size,
+        line_words=args.line_words,
+        non_ascii=not args.ascii)
+    server = FakeRTProcess(
+        tickets=args.tickets,
+        transactions=args.transactions,
+        latency=args.latency,
+        corpus=corpus)
+
+    with server:
+
+        rt = pyrt.RT4(
+            server.url,
+            pool_connections=args.workers,
+            pool_maxsize=args.workers)
+        rt.login('bench', 'bench')
+
+        print('{:<20} {:>8} {:>12} {:>10} {:>10} {:>10}'.format(
+            'benchmark', 'calls', 'calls/s', 'p50 ms', 'p99 ms', 'peak kB'))
+
+        with rt:
+
+            for name, function in BENCHMARKS:
+
+                if name not in selected:
+
+                    continue
+
+                stats = run_benchmark(
+                    function, rt, server, args.requests, args.workers,
+                    memory=args.memory)
+                results[name] = stats
+
+                peak = stats['peak_kb']
+                print(
+                    '{:<20} {calls:>8} {throughput:>12.1f} {p50:>10.2f} '
+                    '{p99:>10.2f} {peak:>10}'.format(
+                        name, peak='-' if peak is None else peak, **stats))
+
+    if args.json:
+
+        with open(args.json, 'w') as fh:
+
+            json.dump(results, fh, indent=2, sort_keys=True)
+
+    return results
+
+
+if __name__ == '__main__':
+
+    main()
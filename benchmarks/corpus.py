@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+"""Synthetic RT REST 1.0 replies for benchmarks.
+
+Replies are deterministic, the same arguments always give the same text.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+__all__ = [
+    'Corpus'
+]
+
+
+OK = 'RT/4.0 200 Ok\n\n'
+
+ASCII_WORDS = (
+    'printer', 'network', 'access', 'password', 'server', 'mail',
+    'backup', 'license', 'laptop', 'update', 'install', 'account',
+)
+
+NON_ASCII_WORDS = (
+    'printer', 'network', 'access', 'password', 'server', 'mail',
+    'příliš', 'žluťoučký', 'kůň', 'úpěl', 'ďábelské', 'ódy',
+)
+
+# RT indents continuation lines of multi-line fields
+CONTINUATION = '\n         '
+
+
+class Corpus(object):
+    """Generator of RT reply bodies of controllable shape.
+
+    Transactions of ticket N have IDs N * 1000, N * 1000 + 1, ...
+
+    Args:
+        fields (int): number of additional custom fields of tickets
+        content_size (int): approximate size of transaction Content
+            in characters
+        line_words (int): words on one Content line, 0 for single-line
+            Content
+        non_ascii (bool): use non-ASCII words in subjects, custom fields
+            and Content
+    """
+
+    def __init__(
+            self,
+            fields=0,
+            content_size=200,
+            line_words=10,
+            non_ascii=True):
+
+        self.fields = fields
+        self.content_size = content_size
+        self.line_words = line_words
+        self.words = NON_ASCII_WORDS if non_ascii else ASCII_WORDS
+
+    def subject(self, id_):
+        """Return ticket subject.
+
+        Args:
+            id_ (int): the ticket ID
+
+        Return:
+            str
+        """
+
+        words = self.words
+
+        return 'Ticket {} - {} {}'.format(
+            id_, words[id_ % len(words)], words[(id_ * 7) % len(words)])
+
+    def ticket_record(self, id_):
+        """Return ticket fields as RT shows them.
+
+        Args:
+            id_ (int): the ticket ID
+
+        Return:
+            [(str, str)]
+        """
+
+        record = [
+            ('id', 'ticket/{}'.format(id_)),
+            ('Queue', ('General', 'Support', 'Sales')[id_ % 3]),
+            ('Owner', ('Nobody', 'root', 'tuser')[id_ % 3]),
+            ('Creator', 'root'),
+            ('Subject', self.subject(id_)),
+            ('Status', ('new', 'open', 'stalled', 'resolved')[id_ % 4]),
+            ('Priority', str(id_ % 100)),
+            ('InitialPriority', '0'),
+            ('FinalPriority', '0'),
+            ('Requestors', 'user{}@example.com'.format(id_ % 50)),
+            ('Cc', ''),
+            ('AdminCc', ''),
+            ('Created', 'Mon Jun 20 06:35:11 2016'),
+            ('Starts', 'Not set'),
+            ('Started', 'Not set'),
+            ('Due', 'Not set'),
+            ('Resolved', 'Not set'),
+            ('Told', 'Not set'),
+            ('LastUpdated', 'Tue Jun 21 08:00:00 2016'),
+            ('TimeEstimated', '0'),
+            ('TimeWorked', '0'),
+            ('TimeLeft', '0'),
+        ]
+
+        for number in range(self.fields):
+
+            record.append((
+                'CF.{{Field {}}}'.format(number),
+                self.words[(id_ + number) % len(self.words)]))
+
+        return record
+
+    def ticket_text(self, id_, names=None):
+        """Return ticket record text.
+
+        Args:
+            id_ (int): the ticket ID
+            names (set of str): the fields to show, None for all
+
+        Return:
+            str
+        """
+
+        return ''.join(
+            '{}: {}\n'.format(name, value)
+            for name, value in self.ticket_record(id_)
+            if names is None or name == 'id' or name in names)
+
+    def content(self, h_id):
+        """Return transaction Content value.
+
+        Args:
+            h_id (int): the transaction ID
+
+        Return:
+            str
+        """
+
+        words = []
+        length = 0
+        while length < self.content_size:
+
+            word = self.words[(h_id + len(words)) % len(self.words)]
+            words.append(word)
+            length += len(word) + 1
+
+        step = self.line_words or len(words) or 1
+
+        return CONTINUATION.join(
+            ' '.join(words[start:start + step])
+            for start in range(0, len(words), step))
+
+    def transaction_text(self, h_id, ticket):
+        """Return long format history transaction.
+
+        Args:
+            h_id (int): the transaction ID
+            ticket (int): the ticket ID
+
+        Return:
+            str
+        """
+
+        return (
+            'id: {h_id}\n'
+            'Ticket: {ticket}\n'
+            'TimeTaken: 0\n'
+            'Type: Comment\n'
+            'Field:\n'
+            'OldValue:\n'
+            'NewValue:\n'
+            'Data:\n'
+            'Description: Comments added by root\n'
+            'Content: {content}\n'
+            'Creator: root\n'
+            'Created: 2016-06-20 06:35:11\n'
+            'Attachments:\n'
+        ).format(h_id=h_id, ticket=ticket, content=self.content(h_id))
+
+    @staticmethod
+    def transaction_ids(ticket, transactions):
+        """Return transaction IDs of ticket.
+
+        Args:
+            ticket (int): the ticket ID
+            transactions (int): number of transactions
+
+        Return:
+            [int]
+        """
+
+        first = ticket * 1000
+
+        return list(range(first, first + transactions))
+
+    def show_reply(self, ids, names=None):
+        """Return ticket show reply for one or more tickets.
+
+        Args:
+            ids ([int]): the ticket IDs
+            names (set of str): the fields to show, None for all
+
+        Return:
+            str
+        """
+
+        return OK + '\n--\n\n'.join(
+            self.ticket_text(id_, names) for id_ in ids)
+
+    def search_reply(self, ids, format_='s', names=None):
+        """Return search reply.
+
+        Args:
+            ids ([int]): the found ticket IDs
+            format_ (str): 's', 'i' or 'l'
+            names (set of str): the fields of the long format
+
+        Return:
+            str
+        """
+
+        if format_ == 'i':
+
+            return OK + ''.join('ticket/{}\n'.format(id_) for id_ in ids)
+
+        if format_ == 'l':
+
+            return self.show_reply(ids, names)
+
+        return OK + ''.join(
+            '{}: {}\n'.format(id_, self.subject(id_)) for id_ in ids)
+
+    def history_reply(self, ticket, transactions):
+        """Return long format history reply.
+
+        Args:
+            ticket (int): the ticket ID
+            transactions (int): number of transactions
+
+        Return:
+            str
+        """
+
+        return OK + '\n--\n\n'.join(
+            self.transaction_text(h_id, ticket)
+            for h_id in self.transaction_ids(ticket, transactions))
+
+    def history_ids_reply(self, ticket, transactions):
+        """Return short history reply with transaction IDs.
+
+        Args:
+            ticket (int): the ticket ID
+            transactions (int): number of transactions
+
+        Return:
+            str
+        """
+
+        return OK + ''.join(
+            '{}: Comments added by root\n'.format(h_id)
+            for h_id in self.transaction_ids(ticket, transactions))
+
+    def transaction_reply(self, h_id, ticket):
+        """Return reply with one transaction.
+
+        Args:
+            h_id (int): the transaction ID
+            ticket (int): the ticket ID
+
+        Return:
+            str
+        """
+
+        return OK + self.transaction_text(h_id, ticket)
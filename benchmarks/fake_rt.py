@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+
+"""Fake RT REST 1.0 server for benchmarks.
+
+The server runs in a background thread of the benchmark process, or in
+a child process to keep its work and memory out of the measured one,
+and answers the REST calls used by :class:`pyrt.RT4` with generated
+replies. Shape of the replies (see :mod:`benchmarks.corpus`) and the
+latency of every request are tunable.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import multiprocessing
+import threading
+import time
+
+try:
+
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlsplit
+
+except ImportError:
+
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlsplit
+
+from .corpus import OK, Corpus
+
+__all__ = [
+    'FakeRT',
+    'FakeRTProcess'
+]
+
+
+REST_PATH = '/REST/1.0/'
+
+BAD_REQUEST = 'RT/4.0 400 Bad Request\n\n# Unknown request.\n'
+
+
+class FakeRT(object):
+    """Fake RT server in a background thread.
+
+    Ticket IDs are 1 to `tickets`, every ticket has `transactions`
+    history transactions and every search returns all tickets.
+
+    Args:
+        tickets (int): number of tickets
+        transactions (int): number of transactions of every ticket
+        latency (float): delay of every reply in seconds
+        corpus (Corpus): the reply generator, default shape for None
+        host (str): listening address
+        port (int): listening port, 0 for any free port
+    """
+
+    def __init__(
+            self,
+            tickets=100,
+            transactions=10,
+            latency=0.0,
+            corpus=None,
+            host='127.0.0.1',
+            port=0):
+
+        self.tickets = tickets
+        self.transactions = transactions
+        self.latency = latency
+        self.corpus = corpus if corpus is not None else Corpus()
+
+        self.requests = 0
+        self._created = tickets
+        self._lock = threading.Lock()
+
+        self._server = _Server((host, port), _Handler)
+        self._server.fake_rt = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """REST URL of the server."""
+
+        host, port = self._server.server_address[:2]
+
+        return 'http://{}:{}{}'.format(host, port, REST_PATH)
+
+    def start(self):
+        """Start serving in a background thread.
+
+        Return:
+            FakeRT
+        """
+
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket.
+
+        Return:
+            None
+        """
+
+        if self._thread is not None:
+
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+
+        self._server.server_close()
+
+    def __enter__(self):
+
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.stop()
+
+    def reply(self, method, path, params, form):
+        """Return reply text for request.
+
+        Args:
+            method (str): HTTP method
+            path (str): path relative to the REST URL
+            params ({str: str}): query parameters
+            form ({str: str}): form data of POST requests
+
+        Return:
+            str
+        """
+
+        with self._lock:
+
+            self.requests += 1
+
+        parts = path.strip('/').split('/')
+
+        if method == 'POST':
+
+            return self._post(parts, form)
+
+        if parts[0] == 'ticket' and len(parts) >= 3:
+
+            return self._ticket(parts[1], parts[2:], params)
+
+        if parts == ['search', 'ticket']:
+
+            return self._search(params)
+
+        if parts[0] == 'user' and len(parts) == 2:
+
+            return OK + (
+                'Name: {0}\nEmailAddress: {0}@example.com\n'
+                'Lang: en\nDisabled: 0\n').format(parts[1])
+
+        return BAD_REQUEST
+
+    def _ids(self, ids):
+
+        try:
+
+            return [int(id_) for id_ in ids.split(',')]
+
+        except ValueError:
+
+            return []
+
+    def _ticket(self, ids, parts, params):
+
+        ids = self._ids(ids)
+        if not ids:
+
+            return BAD_REQUEST
+
+        if parts == ['show']:
+
+            return self.corpus.show_reply(ids, _names(params))
+
+        id_ = ids[0]
+
+        if parts == ['history'] and params.get('format') == 'l':
+
+            return self.corpus.history_reply(id_, self.transactions)
+
+        if parts == ['history']:
+
+            return self.corpus.history_ids_reply(id_, self.transactions)
+
+        if len(parts) == 3 and parts[:2] == ['history', 'id']:
+
+            return self.corpus.transaction_reply(int(parts[2]), id_)
+
+        return BAD_REQUEST
+
+    def _search(self, params):
+
+        return self.corpus.search_reply(
+            range(1, self.tickets + 1),
+            params.get('format', 's'),
+            _names(params))
+
+    def _post(self, parts, form):
+
+        if parts == ['']:
+
+            return OK
+
+        if parts == ['ticket', 'new']:
+
+            with self._lock:
+
+                self._created += 1
+                id_ = self._created
+
+            return OK + '# Ticket {} created.\n'.format(id_)
+
+        if parts[0] == 'ticket' and len(parts) == 3:
+
+            return OK + '# Message recorded\n'
+
+        if parts[-1] in ('new', 'edit'):
+
+            return OK + '# Done.\n'
+
+        return BAD_REQUEST
+
+
+class FakeRTProcess(object):
+    """Fake RT server in a child process.
+
+    Accepts the arguments of :class:`FakeRT`.
+    """
+
+    def __init__(self, tickets=100, transactions=10, **kwargs):
+
+        self.tickets = tickets
+        self.transactions = transactions
+
+        self._kwargs = dict(
+            kwargs, tickets=tickets, transactions=transactions)
+        self._process = None
+        self._url = None
+
+    @property
+    def url(self):
+        """REST URL of the server."""
+
+        return self._url
+
+    def start(self):
+        """Start the server process and wait until it listens.
+
+        Return:
+            FakeRTProcess
+        """
+
+        parent, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_serve, args=(self._kwargs, child))
+        self._process.daemon = True
+        self._process.start()
+
+        self._url = parent.recv()
+        parent.close()
+
+        return self
+
+    def stop(self):
+        """Stop the server process.
+
+        Return:
+            None
+        """
+
+        if self._process is not None:
+
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def __enter__(self):
+
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.stop()
+
+
+def _serve(kwargs, connection):
+
+    server = FakeRT(**kwargs)
+    connection.send(server.url)
+    connection.close()
+
+    server._server.serve_forever(poll_interval=0.05)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = str('HTTP/1.1')
+
+    # headers and body are written separately
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+
+        self._reply('GET', {})
+
+    def do_POST(self):
+
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+
+        self._reply('POST', _single(parse_qs(body)))
+
+    def _reply(self, method, form):
+
+        fake_rt = self.server.fake_rt
+
+        url = urlsplit(self.path)
+        path = url.path
+        if path.startswith(REST_PATH):
+
+            path = path[len(REST_PATH):]
+
+        if fake_rt.latency:
+
+            time.sleep(fake_rt.latency)
+
+        params = _single(parse_qs(url.query))
+        body = fake_rt.reply(method, path, params, form).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+
+        pass
+
+
+def _single(values):
+
+    return dict((name, value[-1]) for name, value in values.items())
+
+
+def _names(params):
+
+    if params.get('fields'):
+
+        return set(params['fields'].split(','))
+
+    return None
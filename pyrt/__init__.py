@@ -1,3 +1,13 @@
 # __all__ = ['pyrt']
 
-from pyrt import *  # NOQA
+import sys
+
+from .pyrt import *  # NOQA
+from .limits import *  # NOQA
+from .store import *  # NOQA
+from .stats import *  # NOQA
+from .profiling import *  # NOQA
+
+if sys.version_info >= (3, 6):
+
+    from .aio import *  # NOQA
@@ -0,0 +1,856 @@
+# -*- coding: utf-8 -*-
+
+"""Asyncio client for Request tracker.
+
+Needs Python 3.6+ and the optional ``aiohttp`` package
+(``pip install py-rt[async]``), it is imported with the first session.
+"""
+
+import asyncio
+import sys
+
+from array import array
+
+from .limits import IDEMPOTENT_METHODS
+from .pyrt import (
+    BadRequestException, BatchError, RTBase, RequestEvent, Ticket,
+    TicketHistory, TicketList, _timer)
+
+__all__ = [
+    'AsyncRT4',
+    'AsyncTicket',
+    'AsyncTicketHistory'
+]
+
+
+def _retry_exceptions():
+    """Return failures of the HTTP request worth a retry.
+
+    aiohttp errors cannot occur until aiohttp is imported, it is not
+    imported here.
+
+    Return:
+        tuple of exception classes
+    """
+
+    aiohttp = sys.modules.get('aiohttp')
+    if aiohttp is None:
+
+        return (asyncio.TimeoutError,)
+
+    return (asyncio.TimeoutError, aiohttp.ClientConnectionError)
+
+
+class AsyncTicket(Ticket):
+    """Ticket of the asynchronous client.
+
+    Data are not loaded on attribute access, missing attributes are None
+    until :meth:`load_all` is awaited. The loading methods are
+    coroutines.
+
+    Args:
+        id_ (str): ticket ID
+        subject (str): ticket subject
+        data (str): data
+        rt (AsyncRT4): AsyncRT4 instance
+    Raises:
+        TypeError: if rt is None
+    """
+
+    __slots__ = ()
+
+    @property
+    def history(self):
+
+        if self._history is None:
+
+            self._history = AsyncTicketHistory(self.id_, self.rt)
+
+        return self._history
+
+    def _load(self):
+        """Do nothing, attribute access cannot wait for RT.
+
+        Return:
+            None
+        """
+
+    async def load_all(self):
+        """Load all data.
+
+        Return:
+            None
+        """
+
+        data = await self.rt.load_ticket(self.id_)
+        self.map_data(data)
+
+        await self.load_history()
+
+    async def load_history(self):
+        """Load the history.
+
+        Return:
+            None
+        """
+
+        await self.history.load()
+
+    async def comment(self, text):
+        """Add a comment to the ticket.
+
+        Args:
+            text (str): the comment text
+
+        Return:
+            None
+        """
+
+        data = {
+            'content':
+            'Action: correspond\nText: {}\n'.format(text)}
+        await self.rt.add_comment(self.id_, data)
+
+
+class AsyncTicketHistory(TicketHistory):
+    """History of ticket of the asynchronous client.
+
+    The loading methods are coroutines, the views are the same as in
+    :class:`TicketHistory`.
+
+    Args:
+        id_ (str): the ticket ID
+        rt (AsyncRT4): the AsyncRT4 instance
+    """
+
+    __slots__ = ()
+
+    async def load(self):
+        """Load all data into the object.
+
+        Return:
+            None
+        """
+
+        self.restore(await self.rt.load_history(self.id_))
+
+    async def update(self):
+        """Load only transactions newer than the last loaded one.
+
+        Return:
+            [{str: str}]: new transactions
+        """
+
+        if self.history is None:
+
+            await self.load()
+
+            return self.history_list
+
+        data = {}
+        for h_id in await self.rt.load_history_ids(self.id_):
+
+            if self.last_id is None or int(h_id) > self.last_id:
+
+                data[h_id] = await self.rt.load_transaction(self.id_, h_id)
+
+        return self._add(data)
+
+
+class AsyncRT4(RTBase):
+    """Asyncio request tracker.
+
+    Offers the requests of :class:`RT4` as coroutines. All requests
+    share one :class:`aiohttp.ClientSession` and the replies are parsed
+    by the methods of :class:`RTBase`. The tickets are
+    :class:`AsyncTicket` objects. Connections are limited by limit and
+    limit_per_host, the thread based concurrency limiter of
+    :class:`RT4` is not used.
+
+    Args:
+        rest_url (str): REST API URL
+        session (aiohttp.ClientSession): session to use instead of own one
+        limit (int): maximum number of connections
+        limit_per_host (int): maximum number of connections per host
+        keep_alive (bool): keep connections open between requests
+        kwargs: cache, store, observer, retry, timeout and normalize
+            options of :class:`RTBase`
+    """
+
+    ticket_class = AsyncTicket
+
+    def __init__(
+            self,
+            rest_url='http://localhost/REST/1.0/',
+            session=None,
+            limit=100,
+            limit_per_host=10,
+            keep_alive=True,
+            **kwargs):
+
+        super(AsyncRT4, self).__init__(rest_url, **kwargs)
+
+        # the session is created in the running loop
+        self.session = session
+        self._own_session = session is None
+        self._connector_args = {
+            'limit': limit,
+            'limit_per_host': limit_per_host,
+            'force_close': not keep_alive,
+        }
+
+    async def __aenter__(self):
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+
+        await self.close()
+
+    def _get_session(self):
+        '''Return the session, create it if needed.
+
+        :return: :class:`aiohttp.ClientSession`
+        '''
+
+        if self.session is None:
+
+            try:
+
+                import aiohttp
+
+            except ImportError:
+
+                raise ImportError('AsyncRT4 needs the aiohttp package')
+
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(**self._connector_args))
+
+        return self.session
+
+    async def close(self):
+        '''Close pooled connections if the session is owned.
+
+        :rtype: None
+        '''
+
+        if self._own_session and self.session is not None:
+
+            await self.session.close()
+            self.session = None
+
+    async def _send(self, method, url, event=None, **kwargs):
+        '''Send request and return the raw reply with its charset.
+
+        Idempotent requests are retried as in :meth:`RT4._send`.
+
+        :param str method: HTTP method
+        :param str url: URL
+        :param event: Request measurement to count the retries
+        :type event: :class:`RequestEvent`
+
+        :return: (bytes, str) - the charset is None if not declared
+        '''
+
+        retry = self.retry
+        if method not in IDEMPOTENT_METHODS:
+
+            retry = None
+
+        attempt = 0
+        while True:
+
+            try:
+
+                status, content, charset = await asyncio.wait_for(
+                    self._attempt(method, url, **kwargs), self.timeout)
+
+            except _retry_exceptions():
+
+                if retry is None or attempt >= retry.retries:
+
+                    raise
+
+            else:
+
+                if (retry is None or attempt >= retry.retries or
+                        status not in retry.statuses):
+
+                    return content, charset
+
+            await asyncio.sleep(retry.delay(attempt))
+            attempt += 1
+
+            if event is not None:
+
+                event.retries = attempt
+
+    async def _attempt(self, method, url, **kwargs):
+        '''Send one request and return the HTTP status and raw reply.
+
+        :param str method: HTTP method
+        :param str url: URL
+
+        :return: (int, bytes, str)
+        '''
+
+        session = self._get_session()
+        async with session.request(method, url, **kwargs) as response:
+
+            return response.status, await response.read(), response.charset
+
+    async def _request(
+            self, method, path, endpoint=None, ticket=None, parser=None,
+            **kwargs):
+        '''Send request to RT and return the reply text or parsed reply.
+
+        With cookie login the request is repeated once after a new login
+        if RT reports an expired session. The declared charset or UTF-8
+        is used, the charset is never guessed from the body. Observers
+        get a :class:`RequestEvent` for every request. Retries are made
+        by :meth:`_send`.
+
+        :param str method: HTTP method
+        :param str path: Path relative to the REST URL
+        :param str endpoint: Endpoint name for observers, path by default
+        :param ticket: Ticket ID for observers
+        :type ticket: str
+        :param parser: Function for the reply text, e.g. :meth:`parse_reply`
+        :type parser: callable
+
+        :return: str or the parser result
+        '''
+
+        url = self.rest_url + path
+        params = self._params(kwargs.pop('params', None))
+
+        event = RequestEvent(method, endpoint or path, ticket)
+        start = _timer()
+
+        try:
+
+            content, charset = await self._send(
+                method, url, event, params=params, **kwargs)
+
+            if self._login_data and self._unauthorized(content):
+
+                await self._session_login()
+                content, charset = await self._send(
+                    method, url, event, params=params, **kwargs)
+
+        except Exception as e:
+
+            event.network_time = _timer() - start
+            event.error = e
+            self._notify(event)
+            raise
+
+        event.network_time = _timer() - start
+        event.bytes = len(content)
+        event.status = self._reply_status(content)
+
+        start = _timer()
+
+        try:
+
+            reply = content.decode(charset or 'utf-8', 'replace')
+            if parser is None:
+
+                return reply
+
+            return parser(reply)
+
+        except Exception as e:
+
+            event.error = e
+            raise
+
+        finally:
+
+            event.parse_time = _timer() - start
+            self._notify(event)
+
+    async def login(self, login_name, password, cookie=False):
+        '''Save the credentials or log in with cookie.
+
+        :param str login_name: Login
+        :param str password: Password
+        :param bool cookie: Use cookie-based session login
+
+        :raises BadRequestException: if the cookie login is refused
+
+        :rtype: None
+        '''
+
+        if cookie:
+
+            self.credentials = None
+            self._login_data = {'user': login_name, 'pass': password}
+            await self._session_login()
+
+        else:
+
+            self.credentials = {'user': login_name, 'pass': password}
+            self._login_data = None
+
+    async def _session_login(self):
+        '''Log in and keep the RT session cookie in the session.
+
+        :raises BadRequestException: if RT refuses the credentials
+
+        :rtype: None
+        '''
+
+        event = RequestEvent('POST', 'login')
+        start = _timer()
+
+        try:
+
+            content, charset = await self._send(
+                'POST', self.rest_url, data=self._login_data)
+            event.bytes = len(content)
+            event.status = self._reply_status(content)
+
+        except Exception as e:
+
+            event.error = e
+            raise
+
+        finally:
+
+            event.network_time = _timer() - start
+            self._notify(event)
+
+        self.check_reply(content.decode(charset or 'utf-8', 'replace'))
+
+    async def load_ticket(self, id_):
+        r'''Load ticket data and return it as dictionary.
+
+        :param id\_: Ticket ID
+        :type id\_: str
+
+        :rtype: {str: str}
+        '''
+
+        cached = self.ticket_cache.get(str(id_))
+        if cached is not None:
+
+            last_updated = await self._last_updated(id_)
+            if last_updated == cached.get('LastUpdated'):
+
+                return dict(cached)
+
+        data = await self._get(
+            'ticket/' + str(id_) + '/show',
+            endpoint='ticket/show', ticket=id_, parser=self.parse_reply)
+
+        if data:
+
+            self.ticket_cache.put(str(id_), dict(data))
+
+        return data
+
+    async def _last_updated(self, id_):
+        r'''Load only LastUpdated field of ticket.
+
+        :param id\_: Ticket ID
+        :type id\_: str
+
+        :return: str or None
+        '''
+
+        data = await self._get(
+            'ticket/' + str(id_) + '/show', params={'fields': 'LastUpdated'},
+            endpoint='ticket/show', ticket=id_, parser=self.parse_reply)
+
+        return (data or {}).get('LastUpdated')
+
+    async def load_tickets(self, ids, chunk_size=50):
+        '''Load data for more tickets with multi-ticket show requests.
+
+        :param ids: Ticket IDs
+        :type ids: iterable of str
+        :param int chunk_size: Number of tickets in one request
+
+        :rtype: {str: {str: str}}
+        '''
+
+        ids = [str(id_) for id_ in ids]
+
+        tickets = {}
+        for start in range(0, len(ids), chunk_size):
+
+            chunk = ids[start:start + chunk_size]
+            records = await self._get(
+                'ticket/' + ','.join(chunk) + '/show',
+                endpoint='ticket/show', parser=self.parse_multi_reply)
+
+            for data in records or []:
+
+                id_ = self._record_id(data)
+                tickets[id_] = data
+                self.ticket_cache.put(id_, dict(data))
+
+        return tickets
+
+    async def get_ticket(self, id_):
+        r'''Return ticket object with data.
+
+        :param id\_: Ticket ID
+        :type id\_: str
+
+        :rtype: AsyncTicket
+        '''
+
+        tdata = await self.load_ticket(id_)
+
+        return self.ticket_class(id_, None, tdata, self)
+
+    async def get_tickets(self, ids, workers=8, ordered=True, errors=None):
+        '''Fetch tickets concurrently and yield ticket objects.
+
+        At most `workers` requests run at once. Failures do not stop the
+        batch, they are stored into `errors` or raised together after the
+        last ticket if `errors` is None.
+
+        :param ids: Ticket IDs
+        :type ids: iterable of str
+        :param int workers: Number of parallel requests
+        :param bool ordered: Yield tickets in input order, otherwise as
+            they complete
+        :param dict errors: Dictionary for failures - {id: exception}
+
+        :raises BatchError: if some tickets failed and errors is None
+
+        :return: async generator of :class:`AsyncTicket`
+        '''
+
+        failed = {} if errors is None else errors
+
+        semaphore = asyncio.Semaphore(workers)
+
+        async def fetch(id_):
+
+            async with semaphore:
+
+                try:
+
+                    tdata = await self.load_ticket(id_)
+
+                except Exception as e:
+
+                    return id_, None, e
+
+            if not tdata:
+
+                error = BadRequestException(
+                    'No data for ticket {}.'.format(id_))
+
+                return id_, None, error
+
+            return id_, self.ticket_class(id_, None, tdata, self), None
+
+        tasks = [asyncio.ensure_future(fetch(id_)) for id_ in ids]
+
+        try:
+
+            if ordered:
+
+                futures = tasks
+
+            else:
+
+                futures = asyncio.as_completed(tasks)
+
+            for future in futures:
+
+                id_, ticket, error = await future
+
+                if error is None:
+
+                    yield ticket
+
+                else:
+
+                    failed[id_] = error
+
+        finally:
+
+            for task in tasks:
+
+                task.cancel()
+
+        if errors is None and failed:
+
+            raise BatchError(failed)
+
+    async def search_ticket(self, query, format_='s', fields=None):
+        '''Search tickets according to query and return TicketList.
+
+        :param str query: Query
+        :param str format_: Reply format - 's' or 'l'
+        :param fields: Fields for the long format, implies 'l'
+        :type fields: list of str
+
+        :return: :class:`TicketList`
+        '''
+
+        if fields or format_ == 'l':
+
+            data = await self.load_search(query, fields)
+
+        else:
+
+            data = await self._get(
+                'search/ticket', params={'query': query},
+                endpoint='search/ticket', parser=self.parse_reply)
+
+        return TicketList(data, self)
+
+    async def load_search(self, query, fields=None):
+        '''Search tickets and return their records.
+
+        :param str query: Query
+        :param fields: Wanted fields, None for all fields
+        :type fields: list of str
+
+        :rtype: {str: {str: str}} or None
+        '''
+
+        params = {'query': query, 'format': 'l'}
+        if fields:
+
+            params['fields'] = ','.join(fields)
+
+        records = await self._get(
+            'search/ticket', params=params,
+            endpoint='search/ticket', parser=self.parse_multi_reply)
+        if records is None:
+
+            return None
+
+        return dict(
+            (self._record_id(record), record) for record in records)
+
+    async def search_ids(self, query):
+        '''Search tickets according to query and return only IDs.
+
+        :param str query: Query
+
+        :return: array('l')
+        '''
+
+        params = {'query': query, 'format': 'i'}
+        ids = await self._get(
+            'search/ticket', params=params,
+            endpoint='search/ticket', parser=self.parse_ids_reply)
+        if ids is None:
+
+            ids = array('l')
+
+        return ids
+
+    async def load_history(self, id_):
+        r'''Load history data for ticket.
+
+        :param id\_: Ticket ID
+        :type id\_: str
+
+        :rtype: {str: {str: str}}
+        '''
+
+        return await self._get(
+            'ticket/' + str(id_) + '/history', params={'format': 'l'},
+            endpoint='ticket/history', ticket=id_,
+            parser=self.parse_history_reply)
+
+    async def load_history_ids(self, id_):
+        r'''Load transaction IDs of ticket history.
+
+        :param id\_: Ticket ID
+        :type id\_: str
+
+        :return: [str] sorted IDs
+        '''
+
+        data = await self._get(
+            'ticket/' + str(id_) + '/history',
+            endpoint='ticket/history/ids', ticket=id_,
+            parser=self.parse_reply)
+
+        return sorted(data or {}, key=lambda x: int(x))
+
+    async def load_transaction(self, id_, h_id):
+        r'''Load one history transaction of ticket.
+
+        :param id\_: Ticket ID
+        :type id\_: str
+        :param str h_id: Transaction ID
+
+        :rtype: {str: str}
+        '''
+
+        history = await self._get(
+            'ticket/' + str(id_) + '/history/id/' + str(h_id),
+            endpoint='ticket/history/id', ticket=id_,
+            parser=self.parse_history_reply)
+
+        return (history or {}).get(str(h_id))
+
+    async def get_user(self, username):
+        '''Return user record, shared through the user cache.
+
+        :param str username: Username
+
+        :return: {str: str} or None
+        '''
+
+        data = self.user_cache.get(username)
+        if data is None:
+
+            data = await self._get(
+                'user/' + username, endpoint='user', parser=self.parse_reply)
+
+            if not data:
+
+                return data
+
+            self.user_cache.put(username, data)
+
+        return dict(data)
+
+    async def user_exists(self, username):
+        '''Try to find user in RT and return boolean value.
+
+        :param str username: Username
+
+        :return: bool
+        '''
+
+        data = await self.get_user(username)
+
+        return bool(data) and 'Disabled' in data
+
+    async def get_usermail(self, username):
+        '''Try to find user's mail.
+
+        :param str username: Username
+
+        :return: str
+        '''
+
+        data = await self.get_user(username)
+
+        if data is not None:
+
+            return data.get('EmailAddress', '')
+
+        return ''
+
+    async def get_userlang(self, username):
+        '''Return user's language.
+
+        :param str username: Username
+
+        :return: str
+        '''
+
+        data = await self.get_user(username)
+
+        if data is not None:
+
+            return data.get('Lang', '').lower()
+
+        return ''
+
+    async def set_userlang(self, username, user_data):
+        '''Edit user's language. Need root user.
+
+        :param str username: Username
+
+        :return: str
+        '''
+
+        try:
+
+            return await self._post(
+                'user/' + username + '/edit', data=user_data,
+                endpoint='user/edit', parser=self.check_reply)
+
+        finally:
+
+            self.invalidate_user(username)
+
+    async def create_user(self, user_data):
+        '''Create user.
+
+        :param user_data: User raw data
+        :type user_data: dict - {'content': user data}
+
+        :return: str
+        '''
+
+        return await self._post(
+            'user/new', data=user_data,
+            endpoint='user/new', parser=self.check_reply)
+
+    async def create_group(self, group_data):
+        '''Create group.
+
+        :param group_data: Group raw data
+        :type group_data: dict - {'content': group data}
+
+        :return: str
+        '''
+
+        return await self._post(
+            'group/new', data=group_data,
+            endpoint='group/new', parser=self.check_reply)
+
+    async def edit_group(self, groupname, group_data):
+        '''Edit group - limited.
+
+        :return: str
+        '''
+
+        return await self._post(
+            'group/' + groupname + '/edit', data=group_data,
+            endpoint='group/edit')
+
+    async def add_comment(self, id_, message):
+        r'''Add comment to ticket.
+
+        :param id\_: Ticket ID
+        :type id\_: str
+        :param message: Comment text
+        :type message: str
+
+        :rtype: None
+        '''
+
+        await self._post(
+            'ticket/' + str(id_) + '/comment', data=message,
+            endpoint='ticket/comment', ticket=id_)
+        self.invalidate_ticket(id_)
+
+    async def create_ticket(self, ticket_data):
+        '''Create ticket and return info.
+
+        :param ticket_data: Ticket data
+        :type ticket_data: dict - {'content': ticket body}
+
+        :return: str
+        '''
+
+        try:
+
+            info = await self._post(
+                'ticket/new', data=ticket_data,
+                endpoint='ticket/new', parser=self.check_reply)
+
+        except BadRequestException as e:
+
+            print(e)
+            return 'Cannot create ticket.'
+
+        return info
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+"""Module for columnar ticket analytics.
+
+Needs the optional ``numpy`` package (``pip install py-rt[numpy]``).
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import time
+
+try:
+
+    import numpy
+
+except ImportError:
+
+    numpy = None
+
+from .pyrt import _rt_date
+
+__all__ = [
+    'TicketColumns'
+]
+
+
+def _datetimes(values):
+    """Return datetime64 array for RT dates, NaT for unset dates.
+
+    Args:
+        values ([str]): the dates from RT
+
+    Return:
+        numpy.ndarray
+    """
+
+    dates = [_rt_date(value) or 'NaT' for value in values]
+
+    return numpy.array(dates, dtype='datetime64[s]')
+
+
+def _codes(values):
+    """Return sorted names and their codes for values.
+
+    Args:
+        values ([str]): the values, '' for missing ones
+
+    Return:
+        (tuple of str, numpy.ndarray)
+    """
+
+    if not values:
+
+        return (), numpy.zeros(0, dtype=numpy.intp)
+
+    names, codes = numpy.unique(values, return_inverse=True)
+
+    return tuple(names.tolist()), codes
+
+
+def _datetime(value):
+    """Return datetime64 for date, the local time for None.
+
+    Args:
+        value (str/datetime): 'YYYY-MM-DD[ HH:MM:SS]' or datetime
+
+    Return:
+        numpy.datetime64
+    """
+
+    if value is None:
+
+        value = time.strftime('%Y-%m-%d %H:%M:%S')
+
+    elif hasattr(value, 'strftime'):
+
+        value = value.strftime('%Y-%m-%d %H:%M:%S')
+
+    return numpy.datetime64(value, 's')
+
+
+class TicketColumns(object):
+    """Columnar view of ticket rows.
+
+    Every ticket field is stored as one NumPy array in the order of
+    :attr:`ids`, so reports are computed without creating ticket objects.
+    Missing priorities are NaN, unset dates NaT and missing names ''.
+
+    Args:
+        rows ({'id': {str: str}}): the ticket data, e.g. rows of a long
+            format search or a local store search
+
+    Attributes:
+        ids (numpy.ndarray): the ticket IDs
+        priorities (numpy.ndarray): the priorities as floats
+        created (numpy.ndarray): the creation dates as datetime64
+        due (numpy.ndarray): the due dates as datetime64
+        last_updated (numpy.ndarray): the last update dates as datetime64
+        statuses (tuple of str): the status names
+        status_codes (numpy.ndarray): indexes into :attr:`statuses`
+        queues (tuple of str): the queue names
+        queue_codes (numpy.ndarray): indexes into :attr:`queues`
+    """
+
+    def __init__(self, rows):
+
+        if numpy is None:
+
+            raise ImportError('TicketColumns needs the numpy package')
+
+        ids = []
+        priorities = []
+        created = []
+        due = []
+        last_updated = []
+        statuses = []
+        queues = []
+
+        for id_ in rows:
+
+            row = rows[id_]
+            if not isinstance(row, dict):
+
+                row = {}
+
+            ids.append(int(id_))
+
+            try:
+
+                priorities.append(float(row.get('Priority', '')))
+
+            except ValueError:
+
+                priorities.append(numpy.nan)
+
+            created.append(row.get('Created'))
+            due.append(row.get('Due'))
+            last_updated.append(row.get('LastUpdated'))
+            statuses.append(row.get('Status') or '')
+            queues.append(row.get('Queue') or '')
+
+        self.ids = numpy.array(ids, dtype=numpy.int64)
+        self.priorities = numpy.array(priorities, dtype=numpy.float64)
+        self.created = _datetimes(created)
+        self.due = _datetimes(due)
+        self.last_updated = _datetimes(last_updated)
+        self.statuses, self.status_codes = _codes(statuses)
+        self.queues, self.queue_codes = _codes(queues)
+
+    def __len__(self):
+
+        return len(self.ids)
+
+    def count_by_status(self):
+        """Return number of tickets in every status.
+
+        Return:
+            {str: int}
+        """
+
+        return self._count(self.statuses, self.status_codes)
+
+    def count_by_queue(self):
+        """Return number of tickets in every queue.
+
+        Return:
+            {str: int}
+        """
+
+        return self._count(self.queues, self.queue_codes)
+
+    @staticmethod
+    def _count(names, codes):
+        """Return counts of codes by names, without missing names.
+
+        Args:
+            names (tuple of str): the names
+            codes (numpy.ndarray): the codes
+
+        Return:
+            {str: int}
+        """
+
+        counts = numpy.bincount(codes, minlength=len(names))
+
+        return dict(
+            (name, int(count))
+            for name, count in zip(names, counts) if name)
+
+    def ages(self, now=None, field='created'):
+        """Return ticket ages in days, NaN for unset dates.
+
+        Args:
+            now (str/datetime): the reference time, local time for None
+            field (str): the date column - 'created', 'due'
+                or 'last_updated'
+
+        Return:
+            numpy.ndarray
+        """
+
+        dates = getattr(self, field)
+        ages = (_datetime(now) - dates) / numpy.timedelta64(1, 'D')
+
+        return numpy.where(numpy.isnat(dates), numpy.nan, ages)
+
+    def age_histogram(self, bins=(0, 1, 7, 30, 90), now=None,
+                      field='created'):
+        """Return histogram of ticket ages in days.
+
+        Tickets without the date are not counted, ages above the last
+        bin edge fall into an open last bin.
+
+        Args:
+            bins ([float]): the increasing bin edges in days
+            now (str/datetime): the reference time, local time for None
+            field (str): the date column - 'created', 'due'
+                or 'last_updated'
+
+        Return:
+            (numpy.ndarray, numpy.ndarray): the counts and the bin edges,
+            the last edge is infinity
+        """
+
+        ages = self.ages(now, field)
+        edges = numpy.append(numpy.asarray(bins, dtype=numpy.float64),
+                             numpy.inf)
+
+        counts, edges = numpy.histogram(ages[~numpy.isnan(ages)], edges)
+
+        return counts, edges
+
+    def priority_distribution(self):
+        """Return number of tickets with every priority.
+
+        Tickets without priority are not counted.
+
+        Return:
+            {int: int}
+        """
+
+        priorities = self.priorities[~numpy.isnan(self.priorities)]
+        values, counts = numpy.unique(priorities, return_counts=True)
+
+        return dict(
+            (int(value), int(count)) for value, count in zip(values, counts))
+
+    def overdue(self, now=None):
+        """Return IDs of tickets with due date before now.
+
+        Args:
+            now (str/datetime): the reference time, local time for None
+
+        Return:
+            numpy.ndarray
+        """
+
+        mask = ~numpy.isnat(self.due) & (self.due < _datetime(now))
+
+        return self.ids[mask]
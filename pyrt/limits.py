@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+"""Module for retries and concurrency limits of RT requests."""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import random
+import threading
+import time
+
+__all__ = [
+    'ConcurrencyLimiter',
+    'RetryPolicy',
+    'shared_limiter'
+]
+
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+# HTTP statuses of an overloaded or unavailable RT
+OVERLOAD_STATUSES = (429, 502, 503, 504)
+
+# methods safe to repeat, RT REST 1.0 changes data only by POST
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RetryPolicy(object):
+    """Retries of idempotent requests with jittered exponential backoff.
+
+    Requests are repeated after connection errors, timeouts and the
+    overload HTTP statuses. The delay before retry N (from 0) is random
+    between 0 and ``min(max_backoff, backoff * 2 ** N)``, so clients
+    failing together do not come back together.
+
+    Args:
+        retries (int): maximum number of retries
+        backoff (float): the first delay limit in seconds
+        max_backoff (float): the maximum delay in seconds
+        statuses (tuple of int): HTTP statuses to retry
+        jitter (bool): randomize delays, the limits are used otherwise
+    """
+
+    __slots__ = ('retries', 'backoff', 'max_backoff', 'statuses', 'jitter')
+
+    def __init__(
+            self,
+            retries=3,
+            backoff=0.1,
+            max_backoff=10.0,
+            statuses=OVERLOAD_STATUSES,
+            jitter=True):
+
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = tuple(statuses)
+        self.jitter = jitter
+
+    def delay(self, attempt):
+        """Return delay in seconds before the retry.
+
+        Args:
+            attempt (int): the number of the failed attempt, from 0
+
+        Return:
+            float
+        """
+
+        limit = min(self.max_backoff, self.backoff * 2 ** attempt)
+        if self.jitter:
+
+            return random.uniform(0, limit)
+
+        return limit
+
+
+class ConcurrencyLimiter(object):
+    """Adaptive limit of concurrent requests.
+
+    The limit grows by one after a window of successful requests and is
+    multiplied by ``decrease`` when a request fails, times out, gets an
+    overload status or is slower than ``latency`` (AIMD). Every decrease
+    starts a new epoch and requests acquired in an older epoch cannot
+    decrease the limit again, so a burst of failures does not drop the
+    limit to the minimum.
+
+    Requests over the limit wait in :meth:`acquire`. One limiter can be
+    shared by many :class:`RT4` instances and threads, see
+    :func:`shared_limiter`.
+
+    Args:
+        initial (int): the initial limit
+        minimum (int): the lowest limit
+        maximum (int): the highest limit
+        latency (float): the target latency in seconds, None to react to
+            failures only
+        decrease (float): the multiplicative decrease, 0 - 1
+    """
+
+    def __init__(
+            self,
+            initial=8,
+            minimum=1,
+            maximum=64,
+            latency=None,
+            decrease=0.5):
+
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency = latency
+        self.decrease = decrease
+
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._in_flight = 0
+        self._epoch = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+
+        return self._in_flight
+
+    def acquire(self):
+        """Wait for a free slot and take it.
+
+        Return:
+            (int, float): the epoch and start time for :meth:`release`
+        """
+
+        with self._condition:
+
+            while self._in_flight >= int(self._limit):
+
+                self._condition.wait()
+
+            self._in_flight += 1
+            epoch = self._epoch
+
+        return epoch, _timer()
+
+    def release(self, token, overloaded=False):
+        """Free the slot and adapt the limit.
+
+        Args:
+            token ((int, float)): the value returned by :meth:`acquire`
+            overloaded (bool): the request failed because of RT load
+
+        Return:
+            None
+        """
+
+        epoch, start = token
+        if self.latency is not None and _timer() - start > self.latency:
+
+            overloaded = True
+
+        with self._condition:
+
+            self._in_flight -= 1
+
+            if not overloaded:
+
+                self._limit = min(
+                    self.maximum, self._limit + 1.0 / self._limit)
+
+            elif epoch == self._epoch:
+
+                self._limit = max(self.minimum, self._limit * self.decrease)
+                self._epoch += 1
+
+            self._condition.notify_all()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_limiter():
+    """Return the limiter shared in the process, create it if needed.
+
+    Return:
+        ConcurrencyLimiter
+    """
+
+    global _shared
+
+    with _shared_lock:
+
+        if _shared is None:
+
+            _shared = ConcurrencyLimiter()
+
+        return _shared
@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+
+"""Module for profiling pyrt calls.
+
+Profiling is off unless enabled explicitly or by the ``PYRT_PROFILE``
+environment variable, so call sites can stay wrapped in production::
+
+    with Profile(rt) as prof:
+
+        tickets = rt.load_tickets(ids)
+
+    print(prof.summary())
+
+Enabled by the environment, the summary is written on exit to the file
+from ``PYRT_PROFILE_OUTPUT`` or to the standard error.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import cProfile
+import functools
+import inspect
+import io
+import os
+import pstats
+import sys
+import threading
+
+try:
+
+    from StringIO import StringIO
+
+except ImportError:
+
+    from io import StringIO
+
+try:
+
+    import tracemalloc
+
+except ImportError:
+
+    tracemalloc = None
+
+from . import pyrt
+
+__all__ = [
+    'Profile'
+]
+
+
+ENABLE_VARIABLE = 'PYRT_PROFILE'
+OUTPUT_VARIABLE = 'PYRT_PROFILE_OUTPUT'
+
+CATEGORIES = ('fetch', 'parse', 'construction', 'other')
+
+# modules of the HTTP stack, allocations there belong to fetch
+_FETCH_MODULES = (
+    'requests', 'urllib3', 'http', 'httplib', 'socket', 'ssl', 'aiohttp',
+    'email', 'chardet', 'charset_normalizer', 'idna')
+
+_FETCH_FUNCTIONS = (
+    pyrt.RT4._request, pyrt.RT4._get, pyrt.RT4._post,
+    pyrt.RT4._session_login)
+
+_PARSE_FUNCTIONS = (
+    pyrt.RT4._reply_text, pyrt.RT4._reply_status, pyrt.RT4.check_reply,
+    pyrt.RT4.parse_reply, pyrt.RT4.parse_multi_reply,
+    pyrt.RT4.parse_ids_reply, pyrt.RT4.parse_history_reply,
+    pyrt.RT4._iter_history, pyrt.RT4._history_record,
+    pyrt.RT4._iter_lines, pyrt.RT4._check_status, pyrt._text,
+    pyrt.strip_hashes, pyrt.strip_all)
+
+_MODEL_CLASSES = (
+    pyrt.Ticket, pyrt.TicketHistory, pyrt.TicketList, pyrt._LazyTickets)
+
+# constructors timed as object construction, they never nest
+_CONSTRUCTORS = (
+    pyrt.Ticket.__init__, pyrt.TicketHistory.__init__,
+    pyrt.TicketList.__init__)
+
+
+def _columns_classes():
+    """Return TicketColumns if its module is loaded, numpy stays unloaded.
+
+    Return:
+        tuple
+    """
+
+    columns = sys.modules.get('pyrt.columns')
+    if columns is None:
+
+        return ()
+
+    return (columns.TicketColumns,)
+
+
+def _code(function):
+
+    return getattr(function, '__func__', function).__code__
+
+
+def _lines(obj):
+    """Return (file name, first line, last line) of function or class.
+
+    Args:
+        obj: the function or class
+
+    Return:
+        (str, int, int)
+    """
+
+    obj = getattr(obj, '__func__', obj)
+    source, first = inspect.getsourcelines(obj)
+    filename = os.path.abspath(inspect.getsourcefile(obj))
+
+    return filename, first, first + len(source) - 1
+
+
+class Profile(object):
+    """Profile of pyrt calls made inside the context or decorated function.
+
+    Time is attributed to fetch (HTTP requests) and parse (decoding and
+    parsing of replies) from :class:`pyrt.RequestEvent` of the profiled
+    RT4 instances, object construction is the time spent in constructors
+    of tickets, histories and ticket lists from cProfile. Allocations are
+    attributed the same way from tracemalloc when it is available
+    (Python 3). cProfile covers only the calling thread.
+
+    Disabled profile does nothing, decorated functions are returned
+    unchanged.
+
+    Args:
+        rt (RT4/[RT4]): the profiled RT4 instances
+        enabled (bool): profile, None for the ``PYRT_PROFILE`` variable
+        output (str): file for the summary written on exit, None for
+            ``PYRT_PROFILE_OUTPUT``
+        limit (int): number of functions in the summary
+
+    Attributes:
+        profiler (cProfile.Profile): the collected profile, None if
+            disabled
+    """
+
+    def __init__(self, rt=None, enabled=None, output=None, limit=20):
+
+        from_environment = enabled is None
+        if from_environment:
+
+            enabled = bool(os.environ.get(ENABLE_VARIABLE))
+
+        if output is None:
+
+            output = os.environ.get(OUTPUT_VARIABLE)
+
+        if rt is None:
+
+            rt = []
+
+        elif isinstance(rt, pyrt.RTBase):
+
+            rt = [rt]
+
+        self.enabled = enabled
+        self.rts = list(rt)
+        self.output = output
+        self.limit = limit
+        self.profiler = cProfile.Profile() if enabled else None
+
+        self._report_on_exit = from_environment or output is not None
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._start = None
+        self._snapshot = None
+        self._traced = False
+
+        self.wall_time = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.fetch_time = 0.0
+        self.parse_time = 0.0
+        self.allocations = None
+        self.peak_memory = None
+
+    def __call__(self, function):
+
+        if not self.enabled:
+
+            return function
+
+        @functools.wraps(function)
+        def profiled(*args, **kwargs):
+
+            with self:
+
+                return function(*args, **kwargs)
+
+        return profiled
+
+    def __enter__(self):
+
+        if not self.enabled:
+
+            return self
+
+        self._depth += 1
+        if self._depth > 1:
+
+            return self
+
+        for rt in self.rts:
+
+            rt.observers.append(self._observe)
+
+        if tracemalloc is not None:
+
+            self._traced = not tracemalloc.is_tracing()
+            if self._traced:
+
+                tracemalloc.start()
+
+            elif hasattr(tracemalloc, 'reset_peak'):
+
+                tracemalloc.reset_peak()
+
+            self._snapshot = tracemalloc.take_snapshot()
+
+        self._start = pyrt._timer()
+        self.profiler.enable()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        if not self.enabled:
+
+            return
+
+        self._depth -= 1
+        if self._depth:
+
+            return
+
+        self.profiler.disable()
+        self.wall_time += pyrt._timer() - self._start
+
+        for rt in self.rts:
+
+            rt.observers.remove(self._observe)
+
+        if tracemalloc is not None:
+
+            self._add_allocations(tracemalloc.take_snapshot())
+            peak = tracemalloc.get_traced_memory()[1]
+            self.peak_memory = max(self.peak_memory or 0, peak)
+
+            if self._traced:
+
+                tracemalloc.stop()
+
+        if self._report_on_exit:
+
+            self._write_summary()
+
+    def _observe(self, event):
+
+        with self._lock:
+
+            self.requests += 1
+            self.errors += event.error is not None
+            self.fetch_time += event.network_time or 0.0
+            self.parse_time += event.parse_time or 0.0
+
+    def _add_allocations(self, snapshot):
+        """Add allocations made since the start snapshot by category.
+
+        Args:
+            snapshot (tracemalloc.Snapshot): the end snapshot
+
+        Return:
+            None
+        """
+
+        if self.allocations is None:
+
+            self.allocations = dict.fromkeys(CATEGORIES, 0)
+
+        ranges = self._line_ranges()
+        for stat in snapshot.compare_to(self._snapshot, 'lineno'):
+
+            if stat.size_diff <= 0:
+
+                continue
+
+            frame = stat.traceback[0]
+            category = _category(frame.filename, frame.lineno, ranges)
+            self.allocations[category] += stat.size_diff
+
+    @staticmethod
+    def _line_ranges():
+        """Return source line ranges of pyrt functions by category.
+
+        Return:
+            [(str, str, int, int)]: category, file name, first and last
+            line
+        """
+
+        ranges = []
+        for category, objects in (
+                ('fetch', _FETCH_FUNCTIONS),
+                ('parse', _PARSE_FUNCTIONS),
+                ('construction', _MODEL_CLASSES + _columns_classes())):
+
+            for obj in objects:
+
+                ranges.append((category,) + _lines(obj))
+
+        return ranges
+
+    def construction_time(self):
+        """Return time spent in constructors of pyrt objects.
+
+        Return:
+            float
+        """
+
+        if self.profiler is None:
+
+            return 0.0
+
+        constructors = _CONSTRUCTORS + tuple(
+            cls.__init__ for cls in _columns_classes())
+        codes = set(
+            (code.co_filename, code.co_firstlineno, code.co_name)
+            for code in (_code(function) for function in constructors))
+
+        try:
+
+            stats = pstats.Stats(self.profiler).stats
+
+        except TypeError:
+
+            # nothing was profiled
+            return 0.0
+
+        return sum(stats[key][3] for key in stats if key in codes)
+
+    def report(self):
+        """Return time and allocations by category.
+
+        Return:
+            dict: wall_time, requests, errors, time ({category: seconds}),
+            allocations ({category: bytes} or None without tracemalloc)
+            and peak_memory (bytes or None)
+        """
+
+        time = {
+            'fetch': self.fetch_time,
+            'parse': self.parse_time,
+            'construction': self.construction_time(),
+        }
+        time['other'] = max(0.0, self.wall_time - sum(time.values()))
+
+        return {
+            'wall_time': self.wall_time,
+            'requests': self.requests,
+            'errors': self.errors,
+            'time': time,
+            'allocations': self.allocations,
+            'peak_memory': self.peak_memory,
+        }
+
+    def summary(self):
+        """Return readable summary with the most expensive functions.
+
+        Return:
+            str
+        """
+
+        report = self.report()
+        wall_time = report['wall_time'] or 1.0
+
+        lines = ['pyrt profile: {:.3f} s, {} requests, {} errors'.format(
+            report['wall_time'], report['requests'], report['errors'])]
+
+        for category in CATEGORIES:
+
+            seconds = report['time'][category]
+            line = '  {:<13} {:>9.3f} s {:>6.1f} %'.format(
+                category, seconds, 100.0 * seconds / wall_time)
+
+            if report['allocations'] is not None:
+
+                line += ' {:>10.1f} KiB'.format(
+                    report['allocations'][category] / 1024.0)
+
+            lines.append(line)
+
+        if report['peak_memory'] is not None:
+
+            lines.append('  peak traced memory {:.1f} KiB'.format(
+                report['peak_memory'] / 1024.0))
+
+        if self.profiler is not None and self.limit:
+
+            stream = StringIO()
+            try:
+
+                stats = pstats.Stats(self.profiler, stream=stream)
+                stats.sort_stats('cumulative').print_stats(self.limit)
+
+            except TypeError:
+
+                pass
+
+            lines.append(stream.getvalue().rstrip())
+
+        return '\n'.join(lines) + '\n'
+
+    def _write_summary(self):
+
+        summary = self.summary()
+
+        if self.output:
+
+            with io.open(self.output, 'a', encoding='utf-8') as fh:
+
+                fh.write(summary)
+
+        else:
+
+            sys.stderr.write(summary)
+
+
+def _category(filename, lineno, ranges):
+    """Return category of source line.
+
+    Args:
+        filename (str): the file name
+        lineno (int): the line number
+        ranges ([(str, str, int, int)]): the pyrt line ranges
+
+    Return:
+        str
+    """
+
+    filename = os.path.abspath(filename)
+    for category, range_file, first, last in ranges:
+
+        if filename == range_file and first <= lineno <= last:
+
+            return category
+
+    parts = set(
+        os.path.splitext(part)[0]
+        for part in filename.replace('\\', '/').split('/'))
+    if parts.intersection(_FETCH_MODULES):
+
+        return 'fetch'
+
+    return 'other'
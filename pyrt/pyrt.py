@@ -5,18 +5,135 @@
 from __future__ import unicode_literals
 from __future__ import print_function
 
+import codecs
 import requests
+import requests.adapters
 import re
+import threading
+import time
+
+from array import array
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+try:
+
+    from collections.abc import Mapping
+
+except ImportError:
+
+    from collections import Mapping
+
+from .limits import IDEMPOTENT_METHODS, OVERLOAD_STATUSES
 
 __all__ = [
     'BadRequestException',
+    'BatchError',
     'ParseError',
+    'RequestEvent',
     'Ticket',
     'TicketHistory',
     'TicketList',
-    'RT4'
+    'TicketWatcher',
+    'RTBase',
+    'RT4',
+    'strip_all',
+    'strip_hashes'
 ]
 
+# history fields checked in transactions, Content is optional
+_HISTORY_FIELDS = (
+    'id', 'Ticket', 'Type', 'Content', 'Creator', 'Description', 'Created')
+_HISTORY_DIGIT_FIELDS = ('id', 'Ticket')
+
+_HISTORY_ID_RE = re.compile(r'^id: (\d+)$', re.MULTILINE)
+
+# comment lines, the last line is removed with its preceding new line
+_HASH_LINES_RE = re.compile(r'^#.*\n', re.MULTILINE)
+_HASH_LAST_LINE_RE = re.compile(r'(?:^|\n)#.*\Z')
+_NEW_LINES_RE = re.compile(r'\n+')
+
+# clock for request timing
+_timer = getattr(time, 'perf_counter', time.time)
+
+# failures of the HTTP request worth a retry
+_RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout)
+
+# date formats in RT replies
+_RT_DATE_FORMATS = ('%a %b %d %H:%M:%S %Y', '%Y-%m-%d %H:%M:%S')
+
+
+def strip_hashes(text):
+    """Remove comment lines starting with '#' from text.
+
+    Args:
+        text (str): the reply text
+
+    Return:
+        str
+    """
+
+    return _HASH_LAST_LINE_RE.sub('', _HASH_LINES_RE.sub('', text))
+
+
+def strip_all(text):
+    """Remove comment lines and collapse runs of new lines in text.
+
+    Args:
+        text (str): the reply text
+
+    Return:
+        str
+    """
+
+    return _NEW_LINES_RE.sub('\n', strip_hashes(text))
+
+
+def _rt_date(value):
+    """Return RT date in sortable 'YYYY-MM-DD HH:MM:SS' format.
+
+    Args:
+        value (str): the date from RT, e.g. 'Mon Jun 20 06:35:11 2016'
+
+    Return:
+        str or None for unset and unknown dates
+    """
+
+    if not value:
+
+        return None
+
+    for date_format in _RT_DATE_FORMATS:
+
+        try:
+
+            date = time.strptime(value, date_format)
+
+        except ValueError:
+
+            continue
+
+        return time.strftime('%Y-%m-%d %H:%M:%S', date)
+
+    return None
+
+
+def _text(reply):
+    """Return reply text, raw replies are decoded as UTF-8.
+
+    Args:
+        reply (str/bytes): the reply
+
+    Return:
+        str
+    """
+
+    if isinstance(reply, bytes):
+
+        return reply.decode('utf-8', 'replace')
+
+    return reply
+
 
 class BadRequestException(Exception):
     """Exception for bad requests."""
@@ -36,9 +153,27 @@ class ParseError(Exception):
         self.message = message
 
 
+class BatchError(Exception):
+    """Failures of a batch of requests.
+
+    Args:
+        errors ({str: Exception}): the failures by ticket ID
+    """
+
+    def __init__(self, errors):
+
+        message = 'Failed tickets: {}'.format(', '.join(sorted(errors)))
+        super(BatchError, self).__init__(message)
+        self.message = message
+        self.errors = errors
+
+
 class Ticket(object):
     """Represents RT ticket.
 
+    Ticket without data loads them on first access to data attributes,
+    the history object is created on first access.
+
     Args:
         id_ (str): ticket ID
         subject (str): ticket subject
@@ -48,6 +183,10 @@ class Ticket(object):
         TypeError: if rt is None
     """
 
+    __slots__ = (
+        'id_', 'subject', 'rt',
+        '_history', '_creator', '_due', '_priority', '_loaded')
+
     def __init__(self, id_, subject, data, rt):
         """Initialize ticket."""
 
@@ -58,17 +197,81 @@ class Ticket(object):
         self.id_ = id_
         self.subject = subject
 
-        self.history = TicketHistory(id_, rt)
+        self._history = None
+
+        self._creator = None
+        self._due = None
+        self._priority = None
+        self._loaded = False
 
-        self.creator = None
-        self.due = None
-        self.priority = None
+        self.rt = rt
 
         if data:
 
             self.map_data(data)
 
-        self.rt = rt
+    @property
+    def history(self):
+
+        if self._history is None:
+
+            self._history = TicketHistory(self.id_, self.rt)
+
+        return self._history
+
+    @property
+    def creator(self):
+
+        self._load()
+
+        return self._creator
+
+    @creator.setter
+    def creator(self, value):
+
+        self._creator = value
+
+    @property
+    def due(self):
+
+        self._load()
+
+        return self._due
+
+    @due.setter
+    def due(self, value):
+
+        self._due = value
+
+    @property
+    def priority(self):
+
+        self._load()
+
+        return self._priority
+
+    @priority.setter
+    def priority(self, value):
+
+        self._priority = value
+
+    def _load(self):
+        """Load data if not loaded yet.
+
+        The ticket is marked as loaded only when the request succeeds, a
+        failed request is repeated on the next access.
+
+        Return:
+            None
+        """
+
+        if not self._loaded:
+
+            data = self.rt.load_ticket(self.id_)
+            self._loaded = True
+            if data:
+
+                self.map_data(data)
 
     def __unicode__(self):
 
@@ -107,6 +310,8 @@ class Ticket(object):
         self.due = data.get('Due', None)
         self.priority = data.get('Priority', None)
 
+        self._loaded = True
+
     def load_history(self):
         """Load the history.
 
@@ -114,492 +319,2003 @@ class Ticket(object):
             None
         """
 
-        self.history.load()
+        self.history.load()
+
+    def comment(self, text):
+        """Add a comment to the ticket.
+
+        Args:
+            text (str): the comment text
+
+        Return:
+            None
+        """
+
+        data = {
+            'content':
+            'Action: correspond\nText: {}\n'.format(text)}
+        self.rt.add_comment(self.id_, data)
+
+
+class TicketHistory(object):
+    """Store and offer views for history.
+
+    Transactions are stored once in :attr:`history`, the history list
+    and comments are views computed on access.
+
+    Args:
+        id_ (str): the ticket ID
+        rt (RT4): the RT4 instance
+    """
+
+    __slots__ = ('id_', 'rt', 'history', 'last_id', '_order')
+
+    f_history = None
+
+    # wanted history fields
+    fields = ('Ticket', 'Type', 'Content', 'Creator')
+
+    def __init__(self, id_, rt):
+
+        self.id_ = id_
+        self.rt = rt
+
+        self.history = None
+
+        # the highest loaded transaction ID
+        self.last_id = None
+
+        # transaction IDs in ascending order
+        self._order = []
+
+    @property
+    def history_list(self):
+        """Transactions in ascending order, None if not loaded.
+
+        Return:
+            [{str: str}]
+        """
+
+        if self.history is None:
+
+            return None
+
+        # for web [{value: content}]
+        return [self.history[hist] for hist in self._order]
+
+    @property
+    def comments(self):
+        """Transactions as 'field: value' lines in ascending order.
+
+        Return:
+            [str]
+        """
+
+        if self.history is None:
+
+            return []
+
+        comments = []
+        # temporary solution - test
+        for hist in self._order:
+
+            comments.append(''.join(
+                key + ': ' + value + '\n'
+                for key, value in self.history[hist].items()))
+
+        return comments
+
+    def load(self):
+        """Load all data into the object.
+
+        Return:
+            None
+        """
+
+        data = self.rt.load_history(self.id_)
+
+#        # filter history to fh
+#        fh = {}
+#        for history in data:
+#
+#            fh[history] = self.history_filter(
+#                data[history], self.fields)
+#
+
+        self.restore(data)
+
+    def restore(self, data):
+        """Fill the object with already loaded transactions.
+
+        Args:
+            data ({str: {str: str}}): the transactions
+
+        Return:
+            None
+        """
+
+        self.history = {}
+        self.last_id = None
+        self._order = []
+
+        self._add(data)
+
+    def update(self):
+        """Load only transactions newer than the last loaded one.
+
+        New transactions are added to the history and its views. The
+        whole history is loaded if nothing was loaded yet.
+
+        Return:
+            [{str: str}]: new transactions
+        """
+
+        if self.history is None:
+
+            self.load()
+
+            return self.history_list
+
+        data = {}
+        for h_id in self.rt.load_history_ids(self.id_):
+
+            if self.last_id is None or int(h_id) > self.last_id:
+
+                data[h_id] = self.rt.load_transaction(self.id_, h_id)
+
+        return self._add(data)
+
+    def _add(self, data):
+        """Add transactions to the history.
+
+        Args:
+            data ({str: {str: str}}): transactions newer than loaded ones
+
+        Return:
+            [{str: str}]: added transactions
+        """
+
+        added = []
+        if not data:
+
+            return added
+
+        for hist in sorted(data, key=lambda x: int(x)):
+
+            if hist not in self.history:
+
+                self._order.append(hist)
+
+            self.history[hist] = data[hist]
+            added.append(data[hist])
+
+        if self.last_id is not None and int(min(data, key=int)) < self.last_id:
+
+            self._order.sort(key=lambda x: int(x))
+
+        self.last_id = max(self.last_id or 0, int(hist))
+
+        return added
+
+
+class _LazyTickets(Mapping):
+    """Mapping of ticket IDs to tickets created on first access.
+
+    Args:
+        rows ({'id': 'Subject'}/{'id': {str: str}}): the ticket rows
+        rt (RT4): the RT4 instance
+    """
+
+    __slots__ = ('_rows', '_rt', '_tickets')
+
+    def __init__(self, rows, rt):
+
+        self._rows = rows
+        self._rt = rt
+        self._tickets = {}
+
+    def __getitem__(self, id_):
+
+        ticket = self._tickets.get(id_)
+        if ticket is None:
+
+            row = self._rows[id_]
+            if isinstance(row, dict):
+
+                ticket = self._rt.ticket_class(id_, None, row, self._rt)
+
+            else:
+
+                ticket = self._rt.ticket_class(id_, row, None, self._rt)
+
+            self._tickets[id_] = ticket
+
+        return ticket
+
+    def __iter__(self):
+
+        return iter(self._rows)
+
+    def __len__(self):
+
+        return len(self._rows)
+
+    def subject(self, id_):
+        """Return ticket subject without creating the ticket.
+
+        Args:
+            id_ (str): the ticket ID
+
+        Return:
+            str
+        """
+
+        if id_ in self._tickets:
+
+            return self._tickets[id_].subject
+
+        row = self._rows[id_]
+        if isinstance(row, dict):
+
+            return row.get('Subject', None)
+
+        return row
+
+
+class TicketList(object):
+    """Container for tickets.
+
+    Rows are kept as they come and ticket objects are created on first
+    access through :attr:`tickets`.
+
+    Args:
+        data ({'id': 'Subject'}/{'id': {str: str}}): the tickets, subjects
+            or whole ticket data
+    """
+
+    __slots__ = ('tickets',)
+
+    def __init__(self, data, rt):
+
+        self.tickets = _LazyTickets(data if data is not None else {}, rt)
+
+    def list_all(self):
+        """Return tickets info.
+
+        Return:
+            tuple of (int, str)
+        """
+
+        tickets_info = []
+        for ticket_id in self.tickets:
+
+            try:
+
+                tickets_info.append(
+                    (int(ticket_id), self.tickets.subject(ticket_id)))
+
+            except ValueError as e:
+
+                print(e)
+
+        return tuple(tickets_info)
+
+    def columns(self):
+        """Return columnar view of the tickets for vectorized reports.
+
+        Needs the optional numpy package and whole ticket data, e.g. from
+        a long format search. Tickets with subjects only have empty
+        columns. The :mod:`pyrt.columns` module, and numpy with it, is
+        imported on the first call, ``import pyrt`` does not load numpy.
+
+        Return:
+            TicketColumns
+        """
+
+        from .columns import TicketColumns
+
+        return TicketColumns(self.tickets._rows)
+
+    def __unicode__(self):
+
+        info = 'Ticket list: {} tickets'.format(len(self.tickets))
+
+        return info
+
+    def __str__(self):
+
+        return unicode(self).encode('utf-8')
+
+
+class TicketWatcher(object):
+    """Change feed of updated tickets.
+
+    Repeatedly searches for tickets with LastUpdated at or after the
+    watermark, moves the watermark forward and reports every ticket
+    change only once.
+
+    Dates are compared in the timezone of the RT user, the default
+    watermark is the local time.
+
+    Args:
+        rt (RT4): the RT4 instance
+        queues ([str]): the queue names, None for all queues
+        since (str): the initial watermark 'YYYY-MM-DD HH:MM:SS'
+        interval (float): seconds between polls
+        history (bool): report new history transactions too, all
+            transactions are reported when a ticket is seen first time
+        history_cache_size (int): number of histories kept for tickets
+    """
+
+    def __init__(
+            self,
+            rt,
+            queues=None,
+            since=None,
+            interval=60,
+            history=False,
+            history_cache_size=1024):
+
+        if since is None:
+
+            since = time.strftime('%Y-%m-%d %H:%M:%S')
+
+        self.rt = rt
+        self.queues = queues
+        self.watermark = since
+        self.interval = interval
+        self.history = history
+
+        # {id: LastUpdated} of tickets reported at the watermark
+        self._seen = {}
+        self._histories = _Cache(history_cache_size)
+
+    def __iter__(self):
+
+        while True:
+
+            for change in self.poll():
+
+                yield change
+
+            time.sleep(self.interval)
+
+    def query(self):
+        """Return the search query for the current watermark.
+
+        Return:
+            str
+        """
+
+        query = "LastUpdated >= '{}'".format(self.watermark)
+        if self.queues:
+
+            queues = ' OR '.join(
+                "Queue = '{}'".format(queue.replace("'", "\\'"))
+                for queue in self.queues)
+            query = '({}) AND {}'.format(queues, query)
+
+        return query
+
+    def poll(self):
+        """Search once for changed tickets.
+
+        Return:
+            [str] changed ticket IDs or [(str, [{str: str}])] tickets
+            with new transactions if history is enabled
+        """
+
+        records = self.rt.load_search(self.query(), ['LastUpdated'])
+
+        changed = []
+        for id_, record in (records or {}).items():
+
+            last_updated = _rt_date(record.get('LastUpdated'))
+            if last_updated is None or last_updated < self.watermark:
+
+                continue
+
+            if self._seen.get(id_) == last_updated:
+
+                continue
+
+            changed.append((last_updated, int(id_), id_))
+
+        changed.sort()
+
+        for last_updated, _, id_ in changed:
+
+            if last_updated > self.watermark:
+
+                self.watermark = last_updated
+                self._seen = {}
+
+            self._seen[id_] = last_updated
+
+        if not self.history:
+
+            return [id_ for _, _, id_ in changed]
+
+        return [(id_, self._new_transactions(id_)) for _, _, id_ in changed]
+
+    def _new_transactions(self, id_):
+        """Return transactions not reported yet for ticket.
+
+        Args:
+            id_ (str): the ticket ID
+
+        Return:
+            [{str: str}]
+        """
+
+        history = self._histories.get(id_)
+        if history is None:
+
+            history = TicketHistory(id_, self.rt)
+            self._histories.put(id_, history)
+
+        return history.update()
+
+
+class _Cache(object):
+    """Bounded cache with LRU eviction and expiration.
+
+    Args:
+        maxsize (int): maximum number of items, 0 disables the cache
+        ttl (float): item lifetime in seconds, None for no expiration
+        timer (callable): time source
+    """
+
+    def __init__(self, maxsize, ttl=None, timer=time.time):
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+
+        # {key: (value, expiration)}, the most recent item is the last
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+
+        return len(self._items)
+
+    def get(self, key):
+        """Return the value or None if missing or expired.
+
+        Args:
+            key: the key
+
+        Return:
+            the value or None
+        """
+
+        with self._lock:
+
+            item = self._items.pop(key, None)
+            if item is None:
+
+                return None
+
+            if item[1] is not None and item[1] <= self.timer():
+
+                return None
+
+            self._items[key] = item
+
+            return item[0]
+
+    def put(self, key, value):
+        """Store the value and evict the least recently used items.
+
+        Args:
+            key: the key
+            value: the value
+
+        Return:
+            None
+        """
+
+        if not self.maxsize:
+
+            return
+
+        expiration = None
+        if self.ttl is not None:
+
+            expiration = self.timer() + self.ttl
+
+        with self._lock:
+
+            self._items.pop(key, None)
+            self._items[key] = (value, expiration)
+
+            while len(self._items) > self.maxsize:
+
+                self._items.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Remove the key or all items.
+
+        Args:
+            key: the key, None for all items
+
+        Return:
+            None
+        """
+
+        with self._lock:
+
+            if key is None:
+
+                self._items.clear()
+
+            else:
+
+                self._items.pop(key, None)
+
+
+class RequestEvent(object):
+    """Measurement of one RT request passed to observers.
+
+    Times are in seconds. Streamed replies are parsed while they are
+    read, their whole read time is the network time.
+
+    Args:
+        method (str): the HTTP method
+        endpoint (str): the endpoint name, e.g. 'ticket/show'
+        ticket (str): the ticket ID or None
+
+    Attributes:
+        status (str): the RT status code, e.g. '200', or None
+        bytes (int): the size of the reply or None
+        network_time (float): the time of the HTTP request
+        parse_time (float): the time of decoding and parsing or None
+        error (Exception): the failure of the request or None
+        retries (int): the number of repeated HTTP requests, their
+            backoff delays are part of the network time
+    """
+
+    __slots__ = (
+        'method', 'endpoint', 'ticket', 'status', 'bytes', 'network_time',
+        'parse_time', 'error', 'retries')
+
+    def __init__(self, method, endpoint, ticket=None):
+
+        self.method = method
+        self.endpoint = endpoint
+        self.ticket = None if ticket is None else str(ticket)
+        self.status = None
+        self.bytes = None
+        self.network_time = None
+        self.parse_time = None
+        self.error = None
+        self.retries = 0
+
+    def __repr__(self):
+
+        return str('<RequestEvent {} {} {}>').format(
+            self.method, self.endpoint, self.status)
+
+
+class RTBase(object):
+    """Common part of the Request tracker clients.
+
+    Holds the configuration, the caches and the reply parsers shared by
+    :class:`RT4` and :class:`pyrt.aio.AsyncRT4`, the clients send the
+    requests.
+
+    Args:
+        rest_url (str): REST API URL
+        user_cache_size (int): number of cached user records, 0 disables
+            the cache
+        user_cache_ttl (float): lifetime of cached user records in seconds
+        ticket_cache_size (int): number of cached tickets, 0 disables the
+            cache; cached tickets are revalidated by LastUpdated
+        store (TicketStore): local mirror of tickets
+        observers ([callable]): functions called with a
+            :class:`RequestEvent` after every request, e.g.
+            :class:`RequestStats`
+        retry (RetryPolicy): retries of idempotent (GET) requests, None
+            for no retries
+        timeout (float): timeout of HTTP requests in seconds, None for
+            no timeout
+        normalize (callable): function applied to reply bodies in
+            :meth:`check_reply`, e.g. :func:`strip_hashes` or
+            :func:`strip_all`; the parsers skip comments without it
+    """
+
+    # class of the ticket objects created by the client
+    ticket_class = Ticket
+
+    def __init__(
+            self,
+            rest_url='http://localhost/REST/1.0/',
+            user_cache_size=0,
+            user_cache_ttl=60,
+            ticket_cache_size=0,
+            store=None,
+            observers=None,
+            retry=None,
+            timeout=None,
+            normalize=None):
+
+        self.rest_url = rest_url
+        self.credentials = None
+        self._login_data = None
+
+        self.user_cache = _Cache(user_cache_size, user_cache_ttl)
+        self.ticket_cache = _Cache(ticket_cache_size)
+
+        self.store = store
+        self.observers = list(observers or [])
+
+        self.retry = retry
+        self.timeout = timeout
+        self.normalize = normalize
+
+    def _notify(self, event):
+        '''Pass request event to the observers.
+
+        :param event: Request measurement
+        :type event: :class:`RequestEvent`
+
+        :rtype: None
+        '''
+
+        for observer in self.observers:
+
+            observer(event)
+
+    def _params(self, params):
+        '''Return query parameters with the credentials.
+
+        :param dict params: Request parameters
+
+        :return: dict or None
+        '''
+
+        if not params:
+
+            return self.credentials
+
+        merged = dict(self.credentials or {})
+        merged.update(params)
+
+        return merged
+
+    def _get(self, path, **kwargs):
+        '''Send GET request to RT.
+
+        :param str path: Path relative to the REST URL
+
+        :return: :class:`requests.Response` or the parser result
+        '''
+
+        return self._request('GET', path, **kwargs)
+
+    def _post(self, path, **kwargs):
+        '''Send POST request to RT.
+
+        :param str path: Path relative to the REST URL
+
+        :return: :class:`requests.Response` or the parser result
+        '''
+
+        return self._request('POST', path, **kwargs)
+
+    def _unauthorized(self, reply):
+        '''Return True if RT asks for credentials.
+
+        :param reply: Reply text or raw content
+        :type reply: str or bytes
+
+        :return: bool
+        '''
+
+        return self._reply_status(reply) == '401'
+
+    def _reply_status(self, reply):
+        '''Return RT status code from the status line of reply.
+
+        Only the status line is read, raw replies are not decoded.
+
+        :param reply: Reply text or raw content
+        :type reply: str or bytes
+
+        :return: str or None
+        '''
+
+        end = reply.find(b'\n' if isinstance(reply, bytes) else '\n')
+        status = reply[:end if end >= 0 else len(reply)].split()
+
+        if len(status) < 2:
+
+            return None
+
+        return _text(status[1])
+
+    def check_reply(self, reply):
+        """Check a head of a reply and return data without the head.
+
+        The data are passed through the normalize function if it is set.
+
+        Args:
+            reply (str/bytes): the reply text or raw UTF-8 content
+
+        Raises:
+            BadRequestException: if the reply from RT is not OK
+
+        Return:
+            str: cleaned data
+        """
+
+        if not reply:
+
+            return ''
+
+        reply = _text(reply)
+
+        # the head is the status line and an empty line
+        status_end = reply.find('\n')
+        if status_end < 0:
+
+            status_end = len(reply)
+
+        code_fields = reply[:status_end].split()
+
+        # simple check
+        if code_fields[1] != '200':
+
+            lines = reply.split('\n', 5)
+            if len(lines) > 2:
+
+                # show first few reply lines
+                raise BadRequestException(lines[2:5])
+
+            else:
+
+                raise BadRequestException('Unknown error.')
+
+        body_start = reply.find('\n', status_end + 1)
+        if body_start < 0:
+
+            return '\n'
+
+        # remove redundant empty lines at the end
+        body = reply[body_start + 1:].rstrip() + '\n'
+        if self.normalize is not None:
+
+            body = self.normalize(body)
+
+        return body
+
+    def parse_reply(self, reply):
+        '''Parse data from string.
+
+        :param reply: Reply text or raw UTF-8 content
+        :type reply: str or bytes
+
+        :return: {str: str}
+        '''
+
+        if not reply:
+
+            return None
+
+        try:
+
+            lines = self.check_reply(reply).split('\n')
+
+        except BadRequestException as e:
+
+            print(e)
+            return None
+
+        data = {}
+        for line in lines:
+
+            if line == '':
+                continue
+
+            if line == 'No matching results.':
+                continue
+
+            if line.startswith('#'):
+                continue
+
+            fields = line.split(':', 1)
+            id_ = fields[0]
+            data[id_] = fields[1].lstrip()
+
+        return data
+
+    def parse_multi_reply(self, reply):
+        '''Parse records separated by ``--`` from string.
+
+        :param reply: Reply text or raw UTF-8 content
+        :type reply: str or bytes
+
+        :return: [{str: str}]
+        '''
+
+        if not reply:
+
+            return None
+
+        try:
+
+            lines = self.check_reply(reply).split('\n')
+
+        except BadRequestException as e:
+
+            print(e)
+            return None
+
+        records = []
+        data = {}
+        for line in lines:
+
+            if line == '--':
+
+                if data:
+
+                    records.append(data)
+                    data = {}
+
+                continue
+
+            if line == '':
+                continue
+
+            if line == 'No matching results.':
+                continue
+
+            if line.startswith('#'):
+                continue
+
+            fields = line.split(':', 1)
+            data[fields[0]] = fields[1].lstrip()
+
+        if data:
+
+            records.append(data)
+
+        return records
+
+    def parse_ids_reply(self, reply):
+        '''Parse ticket IDs from ids-only search reply.
+
+        :param reply: Reply text or raw UTF-8 content with lines like
+            'ticket/10'
+        :type reply: str or bytes
+
+        :return: array('l')
+        '''
+
+        if not reply:
+
+            return None
+
+        try:
+
+            lines = self.check_reply(reply).split('\n')
+
+        except BadRequestException as e:
+
+            print(e)
+            return None
+
+        ids = array(str('l'))
+        for line in lines:
+
+            if line == '':
+                continue
+
+            if line == 'No matching results.':
+                continue
+
+            if line.startswith('#'):
+                continue
+
+            ids.append(int(line.rsplit('/', 1)[-1]))
+
+        return ids
+
+    def parse_history_reply(self, reply):
+        '''Parse history data from string.
+
+        :param reply: History reply text or raw UTF-8 content
+        :type reply: str or bytes
+
+        :raises ParseError: if a transaction misses a required field
+
+        :return: {str: {str: str}}
+        '''
+
+        if not reply:
+
+            return None
+
+        lines = self.check_reply(reply)
+
+        # {history id: {value: content}}
+        history = {}
+        for h_id, values in self._iter_history(lines.split('\n')):
+
+            history[h_id] = values
+
+        return history
+
+    def _iter_history(self, lines):
+        '''Parse history lines and yield transactions one by one.
+
+        Transactions are separated by '--' lines. Indented lines continue
+        the previous field, such fields (and Content always) get all
+        lines stripped and joined with a trailing new line.
+
+        :param lines: Reply lines without the head
+        :type lines: iterable of str
+
+        :raises ParseError: if a transaction misses a required field
+
+        :return: generator of (str, {str: str})
+        '''
+
+        values = {}
+        counts = {}
+        key = None
+        multi = None
+
+        for line in lines:
+
+            if line.startswith(' '):
+
+                if key is not None:
+
+                    if multi is None:
+
+                        multi = [values[key]] if values[key] else []
+
+                    multi.append(line.lstrip())
+
+                continue
+
+            if multi is not None:
+
+                values[key] = '\n'.join(multi) + '\n'
+                multi = None
+
+            key = None
+
+            if line == '--':
+
+                if values:
+
+                    yield self._history_record(values, counts)
+
+                values = {}
+                counts = {}
+                continue
+
+            if line == '' or line.startswith('#'):
+                continue
+
+            name, sep, value = line.partition(':')
+            if not sep:
+                continue
+
+            value = value.lstrip()
+            if name in _HISTORY_DIGIT_FIELDS:
+
+                valid = value.isdigit() or value == ''
+
+            else:
+
+                valid = value != '' or name == 'Content'
+
+            if valid:
+
+                counts[name] = counts.get(name, 0) + 1
+
+            key = name
+            values[name] = value
+            if name == 'Content':
+
+                multi = [value]
+
+        if multi is not None:
+
+            values[key] = '\n'.join(multi) + '\n'
+
+        if values:
+
+            yield self._history_record(values, counts)
+
+    def _history_record(self, values, counts):
+        '''Check transaction fields and return (history id, values).
+
+        :param values: Transaction fields
+        :type values: {str: str}
+        :param counts: Number of valid occurrences of fields
+        :type counts: {str: int}
+
+        :raises ParseError: if a required field is missing or repeated
+
+        :return: (str, {str: str})
+        '''
+
+        for name in _HISTORY_FIELDS:
+
+            found = counts.get(name, 0)
+            if name == 'Content':
+
+                if found > 1:
+
+                    raise ParseError(found)
+
+            elif found != 1:
+
+                raise ParseError(found)
+
+        return values['id'], values
+
+    def _strip_all(self, history):
+        '''Clean history string before next processsing.
+
+        :param str history: History text
+
+        return: str
+        '''
+
+        return strip_all(history)
+
+    def _strip_hashes(self, lines):
+        '''Delete hashes from start of lines.
+
+        :param str lines: Lines string
+
+        :return: str
+        '''
+
+        return strip_hashes(lines)
+
+    def _history_id(self, history):
+        '''Return history id from string.
+
+        :param str history: History text
+
+        :return: str
+        '''
+
+        id_list = _HISTORY_ID_RE.findall(history)
+
+        if len(id_list) == 1:
+
+            return id_list[0]
+
+        else:
+
+            return None
+
+    def _record_id(self, record):
+        '''Return ID from a record with id field like 'ticket/10'.
+
+        :param record: Record data
+        :type record: {str: str}
+
+        :return: str
+        '''
+
+        return record.get('id', '').split('/')[-1]
+
+    def invalidate_ticket(self, id_=None):
+        r'''Remove ticket data from the ticket cache.
+
+        :param id\_: Ticket ID, None for all tickets
+        :type id\_: str
+
+        :rtype: None
+        '''
+
+        if id_ is not None:
+
+            id_ = str(id_)
+
+        self.ticket_cache.invalidate(id_)
+
+    def invalidate_user(self, username=None):
+        '''Remove user record from the user cache.
+
+        :param str username: Username, None for all users
+
+        :rtype: None
+        '''
+
+        self.user_cache.invalidate(username)
+
+    def search_local(self, **filters):
+        '''Search tickets in the store and return TicketList.
+
+        Accepts filters of :meth:`TicketStore.search`, e.g.
+        ``search_local(queue='General', status=['new', 'open'])``.
+
+        :raises TypeError: if the store is not set
+
+        :return: :class:`TicketList`
+        '''
+
+        if self.store is None:
+
+            raise TypeError('store cannot be None')
+
+        return self.store.search(self, **filters)
+
+
+class RT4(RTBase):
+    """Request tracker.
+
+    All requests are sent through one :class:`requests.Session`, so
+    connections to RT are pooled and kept alive between calls.
+
+    Args:
+        rest_url (str): REST API URL
+        session (requests.Session): session to use instead of own one
+        pool_connections (int): number of host pools to cache
+        pool_maxsize (int): maximum number of connections per host
+        pool_block (bool): block when no free connection is available
+        keep_alive (bool): keep connections open between requests
+        user_cache_size (int): number of cached user records, 0 disables
+            the cache
+        user_cache_ttl (float): lifetime of cached user records in seconds
+        ticket_cache_size (int): number of cached tickets, 0 disables the
+            cache; cached tickets are revalidated by LastUpdated
+        store (TicketStore): local mirror for :meth:`sync_ticket`
+        observers ([callable]): functions called with a
+            :class:`RequestEvent` after every request, e.g.
+            :class:`RequestStats`
+        retry (RetryPolicy): retries of idempotent (GET) requests, None
+            for no retries
+        timeout (float): timeout of HTTP requests in seconds, None for
+            no timeout
+        limiter (ConcurrencyLimiter): adaptive limit of concurrent
+            requests, e.g. :func:`shared_limiter` for all RT4 instances
+            in the process, None for no limit
+        normalize (callable): function applied to reply bodies in
+            :meth:`check_reply`, e.g. :func:`strip_hashes` or
+            :func:`strip_all`; the parsers skip comments without it
+    """
+
+    def __init__(
+            self,
+            rest_url='http://localhost/REST/1.0/',
+            session=None,
+            pool_connections=10,
+            pool_maxsize=10,
+            pool_block=False,
+            keep_alive=True,
+            user_cache_size=0,
+            user_cache_ttl=60,
+            ticket_cache_size=0,
+            store=None,
+            observers=None,
+            retry=None,
+            timeout=None,
+            limiter=None,
+            normalize=None):
+
+        super(RT4, self).__init__(
+            rest_url, user_cache_size, user_cache_ttl, ticket_cache_size,
+            store, observers, retry, timeout, normalize)
+
+        if session is None:
+
+            session = self._create_session(
+                pool_connections, pool_maxsize, pool_block, keep_alive)
+            self._own_session = True
+
+        else:
+
+            self._own_session = False
+
+        self.session = session
+        self.limiter = limiter
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+    @staticmethod
+    def _create_session(
+            pool_connections, pool_maxsize, pool_block, keep_alive):
+        '''Create a session with a connection pool.
+
+        :param int pool_connections: Number of host pools to cache
+        :param int pool_maxsize: Maximum number of connections per host
+        :param bool pool_block: Block when the pool is exhausted
+        :param bool keep_alive: Keep connections open
+
+        :return: :class:`requests.Session`
+        '''
+
+        session = requests.Session()
+
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        if not keep_alive:
+
+            session.headers['Connection'] = 'close'
+
+        return session
+
+    def close(self):
+        '''Close pooled connections if the session is owned.
+
+        :rtype: None
+        '''
+
+        if self._own_session:
+
+            self.session.close()
+
+    def _request(
+            self, method, path, endpoint=None, ticket=None, parser=None,
+            **kwargs):
+        '''Send request to RT and return the response or the parsed reply.
+
+        Observers get a :class:`RequestEvent` for every request,
+        streamed replies are reported by the caller. Retries are made by
+        :meth:`_send`.
+
+        :param str method: HTTP method
+        :param str path: Path relative to the REST URL
+        :param str endpoint: Endpoint name for observers, path by default
+        :param ticket: Ticket ID for observers
+        :type ticket: str
+        :param parser: Function for the reply text, e.g. :meth:`parse_reply`
+        :type parser: callable
+
+        :return: :class:`requests.Response` or the parser result
+        '''
+
+        url = self.rest_url + path
+        params = self._params(kwargs.pop('params', None))
+
+        # streamed replies are checked by the caller
+        if kwargs.get('stream'):
+
+            return self._send(method, url, params=params, **kwargs)
+
+        event = RequestEvent(method, endpoint or path, ticket)
+        start = _timer()
+
+        try:
+
+            response = self._send(method, url, event, params=params, **kwargs)
+
+        except Exception as e:
+
+            event.network_time = _timer() - start
+            event.error = e
+            self._notify(event)
+            raise
+
+        event.network_time = _timer() - start
+        event.bytes = len(response.content)
+        event.status = self._reply_status(response.content)
+
+        if parser is None:
+
+            self._notify(event)
+            return response
+
+        start = _timer()
+
+        try:
+
+            return parser(self._reply_text(response))
+
+        except Exception as e:
+
+            event.error = e
+            raise
+
+        finally:
+
+            event.parse_time = _timer() - start
+            self._notify(event)
+
+    def _send(self, method, url, event=None, **kwargs):
+        '''Send HTTP request, retry idempotent requests if RT fails.
+
+        Connection errors, timeouts and the retried HTTP statuses of
+        the retry policy are repeated after a backoff delay, the last
+        response or error is returned.
+
+        :param str method: HTTP method
+        :param str url: URL
+        :param event: Request measurement to count the retries
+        :type event: :class:`RequestEvent`
+
+        :return: :class:`requests.Response`
+        '''
+
+        retry = self.retry
+        if method not in IDEMPOTENT_METHODS:
+
+            retry = None
+
+        if self.timeout is not None:
+
+            kwargs.setdefault('timeout', self.timeout)
+
+        attempt = 0
+        while True:
+
+            try:
+
+                response = self._attempt(method, url, **kwargs)
+
+            except _RETRY_EXCEPTIONS:
+
+                if retry is None or attempt >= retry.retries:
+
+                    raise
+
+            else:
+
+                if (retry is None or attempt >= retry.retries or
+                        response.status_code not in retry.statuses):
+
+                    return response
+
+                response.close()
+
+            time.sleep(retry.delay(attempt))
+            attempt += 1
+
+            if event is not None:
+
+                event.retries = attempt
+
+    def _attempt(self, method, url, **kwargs):
+        '''Send one HTTP request within the concurrency limit.
+
+        The limiter learns from the latency and failures of the request.
+        With cookie login the request is repeated once after a new login
+        if RT reports an expired session.
+
+        :param str method: HTTP method
+        :param str url: URL
+
+        :return: :class:`requests.Response`
+        '''
+
+        limiter = self.limiter
+        if limiter is not None:
+
+            token = limiter.acquire()
+
+        overloaded = False
+
+        try:
+
+            response = self.session.request(method, url, **kwargs)
+
+            if (not kwargs.get('stream') and self._login_data and
+                    self._unauthorized(response.content)):
+
+                self._session_login()
+                response = self.session.request(method, url, **kwargs)
+
+            overloaded = response.status_code in OVERLOAD_STATUSES
+
+            return response
+
+        except _RETRY_EXCEPTIONS:
+
+            overloaded = True
+            raise
+
+        finally:
+
+            if limiter is not None:
+
+                limiter.release(token, overloaded)
+
+    def login(self, login_name, password, cookie=False):
+        """Save the credentials.
+
+        By default the credentials are sent with every request. With
+        cookie login RT is asked only once and the RT session cookie is
+        used afterwards; an expired session is renewed automatically.
+
+        Args:
+            login_name (str): login
+            password (str): password
+            cookie (bool): use cookie-based session login
+
+        Raises:
+            BadRequestException: if the cookie login is refused
+
+        Return:
+            None
+        """
+
+        if cookie:
+
+            self.credentials = None
+            self._login_data = {'user': login_name, 'pass': password}
+            self._session_login()
+
+        else:
+
+            self.credentials = {'user': login_name, 'pass': password}
+            self._login_data = None
+
+    def _session_login(self):
+        '''Log in and keep the RT session cookie in the session.
+
+        :raises BadRequestException: if RT refuses the credentials
+
+        :rtype: None
+        '''
+
+        event = RequestEvent('POST', 'login')
+        start = _timer()
+
+        try:
+
+            reply = self.session.request(
+                'POST', self.rest_url, data=self._login_data,
+                timeout=self.timeout)
+            event.bytes = len(reply.content)
+            event.status = self._reply_status(reply.content)
+
+        except Exception as e:
+
+            event.error = e
+            raise
+
+        finally:
+
+            event.network_time = _timer() - start
+            self._notify(event)
 
-    def comment(self, text):
-        """Add a comment to the ticket.
+        self.check_reply(self._reply_text(reply))
 
-        Args:
-            text (str): the comment text
+    def _reply_text(self, response):
+        '''Return reply text decoded from the raw content.
 
-        Return:
-            None
-        """
+        The charset declared by RT is used, UTF-8 otherwise, so the charset
+        is never guessed from the whole body.
 
-        data = {
-            'content':
-            'Action: correspond\nText: {}\n'.format(text)}
-        self.rt.add_comment(self.id_, data)
+        :param response: Response
+        :type response: :class:`requests.Response`
 
+        :return: str
+        '''
 
-class TicketHistory(object):
-    """Store and offer views for history.
+        return response.content.decode(
+            self._reply_encoding(response), 'replace')
 
-    Args:
-        id_ (str): the ticket ID
-        rt (RT4): the RT4 instance
-    """
+    def _reply_encoding(self, response):
+        '''Return the charset declared by RT or UTF-8.
 
-    def __init__(self, id_, rt):
+        :param response: Response
+        :type response: :class:`requests.Response`
 
-        self.id_ = id_
-        self.rt = rt
+        :return: str
+        '''
 
-        self.history = None
-        self.f_history = None
-        self.history_list = None
+        encoding = None
+        if 'charset' in response.headers.get('content-type', '').lower():
 
-        self.comments = []
+            encoding = response.encoding
 
-        # wanted history fields
-        self.fields = ['Ticket', 'Type', 'Content', 'Creator']
+        return encoding or 'utf-8'
 
-    def load(self):
-        """Load all data into the object.
+    def load_ticket(self, id_):
+        r'''Load ticket data and return it as dictionary.
 
-        Return:
-            None
-        """
+        :param id\_: Ticket ID
+        :type id\_: str
 
-        data = self.rt.load_history(self.id_)
-        self.history = data
+        :rtype: {str: str}
+        '''
 
-#        # filter history to fh
-#        fh = {}
-#        for history in data:
-#
-#            fh[history] = self.history_filter(
-#                data[history], self.fields)
-#
+        cached = self.ticket_cache.get(str(id_))
+        if cached is not None:
 
-        # for web [{value: content}]
-        self.history_list = []
-        for hist in sorted(
-                self.history,
-                key=lambda x: int(x),
-                reverse=False):
+            if self._last_updated(id_) == cached.get('LastUpdated'):
 
-            self.history_list.append(self.history[hist])
+                return dict(cached)
 
-        self.comments = []
-        # temporary solution - test
-        for comment in sorted(self.history, key=lambda x: int(x)):
+        data = self._get(
+            'ticket/' + str(id_) + '/show',
+            endpoint='ticket/show', ticket=id_, parser=self.parse_reply)
 
-            temp = ''
-            for key, value in self.history[comment].items():
+        if data:
 
-                temp += key + ': ' + value + '\n'
+            self.ticket_cache.put(str(id_), dict(data))
 
-            self.comments.append(temp)
+        return data
 
+    def _last_updated(self, id_):
+        r'''Load only LastUpdated field of ticket.
 
-class TicketList(object):
-    """Container for tickets.
+        :param id\_: Ticket ID
+        :type id\_: str
 
-    Args:
-        data ({str: str}/{'id': 'Subject'}): the tickets
-    """
+        :return: str or None
+        '''
 
-    def __init__(self, data, rt):
+        data = self._get(
+            'ticket/' + str(id_) + '/show', params={'fields': 'LastUpdated'},
+            endpoint='ticket/show', ticket=id_, parser=self.parse_reply)
 
-        self.tickets = {}
-        if data is not None:
+        return (data or {}).get('LastUpdated')
 
-            for id_ in data:
+    def load_tickets(self, ids, chunk_size=50):
+        '''Load data for more tickets with multi-ticket show requests.
 
-                self.tickets[id_] = Ticket(id_, data[id_], None, rt)
+        :param ids: Ticket IDs
+        :type ids: iterable of str
+        :param int chunk_size: Number of tickets in one request
 
-    def list_all(self):
-        """Return tickets info.
+        :rtype: {str: {str: str}}
+        '''
 
-        Return:
-            tuple of (int, str)
-        """
+        ids = [str(id_) for id_ in ids]
 
-        tickets_info = []
-        for ticket_id, ticket in self.tickets.items():
+        tickets = {}
+        for start in range(0, len(ids), chunk_size):
 
-            try:
+            chunk = ids[start:start + chunk_size]
+            records = self._get(
+                'ticket/' + ','.join(chunk) + '/show',
+                endpoint='ticket/show', parser=self.parse_multi_reply)
 
-                tickets_info.append((int(ticket_id), ticket.subject))
+            for data in records or []:
 
-            except ValueError as e:
+                id_ = self._record_id(data)
+                tickets[id_] = data
+                self.ticket_cache.put(id_, dict(data))
 
-                print(e)
+        return tickets
 
-        return tuple(tickets_info)
+    def get_ticket(self, id_):
+        r'''Return ticket object with data.
 
-    def __unicode__(self):
+        :param id\_: Ticket ID
+        :type id\_: str
 
-        info = 'Ticket list: {} tickets'.format(len(self.tickets))
+        :rtype: Ticket
+        '''
 
-        return info
+        tdata = self.load_ticket(id_)
+        ticket = self.ticket_class(id_, None, tdata, self)
 
-    def __str__(self):
+        return ticket
 
-        return unicode(self).encode('utf-8')
+    def sync_ticket(self, id_):
+        r'''Return ticket with history synchronized through the store.
 
+        An unchanged ticket is read from the store after one request for
+        its LastUpdated field. A changed or unknown ticket is loaded
+        with only the history transactions missing in the store, and
+        the store is updated.
 
-class RT4(object):
-    """Request tracker.
+        :param id\_: Ticket ID
+        :type id\_: str
 
-    Args:
-        rest_url (str): REST API URL
-    """
+        :raises TypeError: if the store is not set
+        :raises BadRequestException: if the ticket cannot be loaded
 
-    def __init__(
-            self,
-            rest_url='http://localhost/REST/1.0/'):
+        :rtype: Ticket
+        '''
 
-        self.rest_url = rest_url
-        self.credentials = None
+        if self.store is None:
 
-    def login(self, login_name, password):
-        """Save the credentials.
+            raise TypeError('store cannot be None')
 
-        Args:
-            login_name (str): login
-            password (str): password
+        id_ = str(id_)
+        last_updated = self.store.get_state(id_)
 
-        Return:
-            None
-        """
+        data = None
+        if last_updated is not None:
 
-        self.credentials = {'user': login_name, 'pass': password}
+            if self._last_updated(id_) == last_updated:
 
-    def check_reply(self, reply):
-        """Check a head of a reply and return data without the head.
+                data = self.store.load_ticket(id_)
 
-        Args:
-            reply (str): the reply text
+        ticket = self.ticket_class(id_, None, data, self)
+        if last_updated is not None:
 
-        Raises:
-            BadRequestException: if the reply from RT is not OK
+            ticket.history.restore(self.store.load_history(id_))
 
-        Return:
-            str: cleaned data
-        """
+        if data is None:
 
-        if not reply:
+            data = self.load_ticket(id_)
+            if not data:
 
-            return ''
+                raise BadRequestException(
+                    'No data for ticket {}.'.format(id_))
 
-        # create lines from reply
-        lines = reply.split('\n')
+            ticket.map_data(data)
+            new = ticket.history.update()
 
-        code = lines[0]
-        code_fields = code.split()
+            self.store.save_ticket(id_, data)
+            self.store.save_history(
+                id_, dict((values['id'], values) for values in new))
+            self.store.set_state(id_, data.get('LastUpdated'))
 
-        # simple check
-        if code_fields[1] != '200':
+        return ticket
 
-            if len(lines) > 2:
+    def watch(self, queues=None, since=None, interval=60, history=False):
+        '''Return change feed of tickets updated after `since`.
 
-                # show first few reply lines
-                raise BadRequestException(lines[2:5])
+        Iterate over the result to poll RT every `interval` seconds, see
+        :class:`TicketWatcher`.
 
-            else:
+        :param queues: Queue names, None for all queues
+        :type queues: list of str
+        :param str since: Initial watermark 'YYYY-MM-DD HH:MM:SS'
+        :param float interval: Seconds between polls
+        :param bool history: Report new history transactions too
 
-                raise BadRequestException('Unknown error.')
+        :return: :class:`TicketWatcher`
+        '''
 
-        # create a string and remove redundant empty lines at the end
-        body = '\n'.join(lines[2:])
-        body = body.rstrip() + '\n'
+        return TicketWatcher(self, queues, since, interval, history)
 
-        return body
+    def get_tickets(self, ids, workers=8, ordered=True, errors=None):
+        '''Fetch tickets concurrently and yield ticket objects.
 
-    def parse_reply(self, reply):
-        '''Parse data from string.
+        Tickets are loaded by at most `workers` threads sharing the
+        connection pool, so `workers` should not exceed the pool size.
+        Failures do not stop the batch, they are stored into `errors`
+        or raised together after the last ticket if `errors` is None.
 
-        :param str reply: Reply text
+        :param ids: Ticket IDs
+        :type ids: iterable of str
+        :param int workers: Number of parallel requests
+        :param bool ordered: Yield tickets in input order, otherwise as
+            they complete
+        :param dict errors: Dictionary for failures - {id: exception}
 
-        :return: {str: str}
+        :raises BatchError: if some tickets failed and errors is None
+
+        :return: generator of :class:`Ticket`
         '''
 
-        if not reply:
+        failed = {} if errors is None else errors
 
-            return None
+        pool = ThreadPool(workers)
 
         try:
 
-            lines = self.check_reply(reply).split('\n')
+            if ordered:
 
-        except BadRequestException as e:
+                results = pool.imap(self._fetch_ticket, ids)
 
-            print(e)
-            return None
+            else:
 
-        data = {}
-        for line in lines:
+                results = pool.imap_unordered(self._fetch_ticket, ids)
 
-            if line == '':
-                continue
+            for id_, ticket, error in results:
 
-            if line == 'No matching results.':
-                continue
+                if error is None:
 
-            if line.startswith('#'):
-                continue
+                    yield ticket
 
-            fields = line.split(':', 1)
-            id_ = fields[0]
-            data[id_] = fields[1].lstrip()
+                else:
 
-        return data
+                    failed[id_] = error
 
-    def parse_history_reply(self, reply):
-        '''Parse history data from string.
+        finally:
 
-        :param str reply: History reply text
+            pool.terminate()
 
-        :return: {str: {str: str}}
+        if errors is None and failed:
+
+            raise BatchError(failed)
+
+    def _fetch_ticket(self, id_):
+        r'''Return ticket object or an error for ticket.
+
+        :param id\_: Ticket ID
+        :type id\_: str
+
+        :return: (id, :class:`Ticket`, None) or (id, None, Exception)
         '''
 
-        if not reply:
+        try:
 
-            return None
+            tdata = self.load_ticket(id_)
 
-        lines = self.check_reply(reply)
+        except Exception as e:
 
-        # {history id: {value: content}}
-        history = {}
+            return id_, None, e
 
-        contents = lines.split('--')
-        for comment in contents:
+        if not tdata:
 
-            h_id = self._history_id(comment)
-            values = {}
+            error = BadRequestException(
+                'No data for ticket {}.'.format(id_))
 
-            # id
-            r = re.compile(r'^(id): (\d*)$', re.M)
-            found = r.findall(comment)
-            if len(found) != 1:
+            return id_, None, error
 
-                raise ParseError(len(found))
+        return id_, self.ticket_class(id_, None, tdata, self), None
 
-            v_id = found[0]
-            values[v_id[0]] = v_id[1]
+    def search_ticket(self, query, format_='s', fields=None):
+        '''Search tickets according to query and return TicketList.
 
-            # Ticket
-            r = re.compile(r'^(Ticket): (\d*)$', re.M)
-            found = r.findall(comment)
-            if len(found) != 1:
+        The short format returns only subjects. The long format ('l')
+        returns whole records, or the selected fields, and the tickets
+        are filled from the search reply without other requests.
 
-                raise ParseError(len(found))
+        :param str query: Query
+        :param str format_: Reply format - 's' or 'l'
+        :param fields: Fields for the long format, implies 'l'
+        :type fields: list of str
 
-            v_ticket = found[0]
-            values[v_ticket[0]] = v_ticket[1]
+        :return: :class:`TicketList`
+        '''
 
-            # Type
-            r = re.compile(r'^(Type): (.+)$', re.M)
-            found = r.findall(comment)
-            if len(found) != 1:
+        if fields or format_ == 'l':
 
-                raise ParseError(len(found))
+            data = self.load_search(query, fields)
 
-            v_type = found[0]
-            values[v_type[0]] = v_type[1]
+        else:
 
-            # Content
-            r = re.compile(r'^(Content): ((?:.*\n)(?:^ +.*\n)*)', re.M)
-            found = r.findall(comment)
-            if len(found) > 1:
+            data = self._get(
+                'search/ticket', params={'query': query},
+                endpoint='search/ticket', parser=self.parse_reply)
 
-                raise ParseError(len(found))
+        tl = TicketList(data, self)
 
-            elif found:
+        return tl
 
-                v_content = found[0]
-                lines = []
-                for line in v_content[1].split('\n'):
+    def load_search(self, query, fields=None):
+        '''Search tickets and return their records.
 
-                    lines.append(line.lstrip())
+        :param str query: Query
+        :param fields: Wanted fields, None for all fields
+        :type fields: list of str
 
-                values[v_content[0]] = '\n'.join(lines)
+        :rtype: {str: {str: str}} or None
+        '''
 
-            # Creator
-            r = re.compile(r'^(Creator): (.+)$', re.M)
-            found = r.findall(comment)
-            if len(found) != 1:
+        params = {'query': query, 'format': 'l'}
+        if fields:
 
-                raise ParseError(len(found))
+            params['fields'] = ','.join(fields)
 
-            v_creator = found[0]
-            values[v_creator[0]] = v_creator[1]
+        records = self._get(
+            'search/ticket', params=params,
+            endpoint='search/ticket', parser=self.parse_multi_reply)
+        if records is None:
 
-            # Description
-            r = re.compile(r'^(Description): (.+)$', re.M)
-            found = r.findall(comment)
-            if len(found) != 1:
+            return None
 
-                raise ParseError(len(found))
+        return dict(
+            (self._record_id(record), record) for record in records)
 
-            v_description = found[0]
-            values[v_description[0]] = v_description[1]
+    def search_ids(self, query):
+        '''Search tickets according to query and return only IDs.
 
-            # Created
-            r = re.compile(r'^(Created): (.+)$', re.M)
-            found = r.findall(comment)
-            if len(found) != 1:
+        :param str query: Query
 
-                raise ParseError(len(found))
+        :return: array('l')
+        '''
 
-            v_created = found[0]
-            values[v_created[0]] = v_created[1]
+        params = {'query': query, 'format': 'i'}
+        ids = self._get(
+            'search/ticket', params=params,
+            endpoint='search/ticket', parser=self.parse_ids_reply)
+        if ids is None:
 
-            history[h_id] = values
+            ids = array(str('l'))
 
-        return history
+        return ids
 
-    def _strip_all(self, history):
-        '''Clean history string before next processsing.
+    def load_history(self, id_):
+        r'''Load history data for ticket.
 
-        :param str history: History text
+        :param id\_: Ticket ID
+        :type id\_: str
 
-        return: str
+        :rtype: {str: {str: str}}
         '''
 
-        temp = []
-        for line in history.split('\n'):
-            if line.startswith('#'):
-
-                continue
+        history = self._get(
+            'ticket/' + str(id_) + '/history', params={'format': 'l'},
+            endpoint='ticket/history', ticket=id_,
+            parser=self.parse_history_reply)
 
-            elif line.startswith('\n'):
+        # {id: {value: content}}
+        return history
 
-                continue
+    def load_history_ids(self, id_):
+        r'''Load transaction IDs of ticket history.
 
-            else:
+        :param id\_: Ticket ID
+        :type id\_: str
 
-                temp.append(line)
+        :return: [str] sorted IDs
+        '''
 
-        clean_str = '\n'.join(temp)
+        # {id: description}
+        data = self._get(
+            'ticket/' + str(id_) + '/history',
+            endpoint='ticket/history/ids', ticket=id_,
+            parser=self.parse_reply)
 
-        new_str = ''
-        nl = False
-        for char in clean_str:
+        return sorted(data or {}, key=lambda x: int(x))
 
-            if char == '\n' and not nl:
+    def load_transaction(self, id_, h_id):
+        r'''Load one history transaction of ticket.
 
-                new_str += char
-                nl = True
+        :param id\_: Ticket ID
+        :type id\_: str
+        :param str h_id: Transaction ID
 
-            elif char == '\n' and nl:
+        :rtype: {str: str}
+        '''
 
-                nl = True
+        history = self._get(
+            'ticket/' + str(id_) + '/history/id/' + str(h_id),
+            endpoint='ticket/history/id', ticket=id_,
+            parser=self.parse_history_reply)
 
-            else:
+        return (history or {}).get(str(h_id))
 
-                new_str += char
-                nl = False
+    def iter_history(self, id_, chunk_size=8192):
+        r'''Load history for ticket and yield transactions one by one.
 
-        return new_str
+        The reply is read from the connection and parsed incrementally,
+        so a long history is never held in memory at once.
 
-    def _strip_hashes(self, lines):
-        '''Delete hashes from start of lines.
+        :param id\_: Ticket ID
+        :type id\_: str
+        :param int chunk_size: Size of read chunks in bytes
 
-        :param str lines: Lines string
+        :raises BadRequestException: if the reply from RT is not OK
+        :raises ParseError: if a transaction misses a required field
 
-        :return: str
+        :return: generator of (str, {str: str})
         '''
 
-        temp = []
-        for line in lines.split('\n'):
+        path = 'ticket/' + str(id_) + '/history'
+        params = {'format': 'l'}
 
-            if line.startswith('#'):
+        event = RequestEvent('GET', 'ticket/history', id_)
+        start = _timer()
 
-                continue
+        response = self._get(path, params=params, stream=True)
+        lines = self._iter_lines(response, chunk_size)
+        status = next(lines, '')
 
-            else:
+        if self._login_data and self._unauthorized(status):
 
-                temp.append(line)
+            response.close()
+            self._session_login()
 
-        return '\n'.join(temp)
+            response = self._get(path, params=params, stream=True)
+            lines = self._iter_lines(response, chunk_size)
+            status = next(lines, '')
 
-    def _history_id(self, history):
-        '''Return history id from string.
+        event.status = self._reply_status(status)
 
-        :param str history: History text
+        try:
 
-        :return: str
-        '''
+            self._check_status(status, lines)
 
-        r = re.compile(r'^id: (\d+)$', re.MULTILINE)
+            for transaction in self._iter_history(lines):
 
-        id_list = r.findall(history)
+                yield transaction
 
-        if len(id_list) == 1:
+        except Exception as e:
 
-            return id_list[0]
+            event.error = e
+            raise
 
-        else:
+        finally:
 
-            return None
+            response.close()
 
-    def load_ticket(self, id_):
-        '''Load ticket data and return it as dictionary.
+            event.network_time = _timer() - start
+            self._notify(event)
 
-        :param id\_: Ticket ID
-        :type id\_: str
+    def _iter_lines(self, response, chunk_size):
+        '''Read response incrementally and yield decoded lines.
 
-        :rtype: {str: str}
+        Raw chunks are decoded incrementally with the charset rule of
+        :meth:`_reply_text`, characters may span chunks.
+
+        :param response: Streamed response
+        :type response: :class:`requests.Response`
+        :param int chunk_size: Size of read chunks in bytes
+
+        :return: generator of str
         '''
 
-        request = requests.get(
-            self.rest_url + 'ticket/' + str(id_) + '/show',
-            params=self.credentials)
+        decoder = codecs.getincrementaldecoder(
+            self._reply_encoding(response))('replace')
 
-        data = self.parse_reply(request.text)
+        pending = ''
+        for chunk in response.iter_content(chunk_size):
 
-        return data
+            lines = (pending + decoder.decode(chunk)).split('\n')
+            pending = lines.pop()
 
-    def get_ticket(self, id_):
-        '''Return ticket object with data.
+            for line in lines:
 
-        :param id\_: Ticket ID
-        :type id\_: str
+                yield line
 
-        :rtype: Ticket
-        '''
+        pending += decoder.decode(b'', final=True)
+        if pending:
 
-        tdata = self.load_ticket(id_)
-        ticket = Ticket(id_, None, tdata, self)
+            yield pending
 
-        return ticket
+    def _check_status(self, status, lines):
+        '''Check status line of streamed reply and skip the empty line.
 
-    def search_ticket(self, query):
-        '''Search tickets according to query and return TicketList.
+        :param str status: Status line
+        :param lines: Next reply lines
+        :type lines: iterator of str
 
-        :param str query: Query
+        :raises BadRequestException: if the reply from RT is not OK
 
-        :return: :class:`TicketList`
+        :rtype: None
         '''
 
-        request = requests.get(
-            self.rest_url + 'search/ticket?query=' + query,
-            params=self.credentials)
+        code_fields = status.split()
+        if len(code_fields) < 2 or code_fields[1] != '200':
 
-        tl = TicketList(self.parse_reply(request.text), self)
+            next(lines, None)
+            info = [line for _, line in zip(range(3), lines)]
+            if info:
 
-        return tl
+                # show first few reply lines
+                raise BadRequestException(info)
 
-    def load_history(self, id_):
-        '''Load history data for ticket.
+            raise BadRequestException('Unknown error.')
 
-        :param id\_: Ticket ID
-        :type id\_: str
+        next(lines, None)
 
-        :rtype: {str: {str: str}}
+    def get_user(self, username):
+        '''Return user record.
+
+        Records are shared by the user lookups through the user cache.
+
+        :param str username: Username
+
+        :return: {str: str} or None
         '''
 
-        request = requests.get(
-            self.rest_url + 'ticket/' + id_ + '/history?format=l',
-            params=self.credentials)
+        data = self.user_cache.get(username)
+        if data is None:
 
-        history = self.parse_history_reply(request.text)
+            data = self._get(
+                'user/' + username, endpoint='user', parser=self.parse_reply)
 
-        # {id: {value: content}}
-        return history
+            if not data:
+
+                return data
+
+            self.user_cache.put(username, data)
+
+        return dict(data)
 
     def user_exists(self, username):
         '''Try to find user in RT and return boolean value.
@@ -611,14 +2327,9 @@ class RT4(object):
         :return: bool
         '''
 
-        reply = requests.get(
-            self.rest_url + 'user/' + username,
-            params=self.credentials)
+        data = self.get_user(username)
 
-        # print(reply.text)
-        data = self.parse_reply(reply.text)
-
-        if 'Disabled' in data:
+        if data and 'Disabled' in data:
 
             return True
 
@@ -636,11 +2347,9 @@ class RT4(object):
         '''
 
         payload = user_data
-        reply = requests.post(
-            self.rest_url + 'user/new',
-            params=self.credentials, data=payload)
-
-        info = self.check_reply(reply.text)
+        info = self._post(
+            'user/new', data=payload,
+            endpoint='user/new', parser=self.check_reply)
 
         return info
 
@@ -654,11 +2363,9 @@ class RT4(object):
         '''
 
         payload = group_data
-        reply = requests.post(
-            self.rest_url + 'group/new',
-            params=self.credentials, data=payload)
-
-        info = self.check_reply(reply.text)
+        info = self._post(
+            'group/new', data=payload,
+            endpoint='group/new', parser=self.check_reply)
 
         return info
 
@@ -669,11 +2376,11 @@ class RT4(object):
         '''
 
         payload = group_data
-        reply = requests.post(
-            self.rest_url + 'group/' + groupname + '/edit',
-            params=self.credentials, data=payload)
+        reply = self._post(
+            'group/' + groupname + '/edit', data=payload,
+            endpoint='group/edit')
 
-        info = reply.text  # self.check_reply(reply.text)
+        info = self._reply_text(reply)  # self.check_reply(...)
 
         return info
 
@@ -685,11 +2392,7 @@ class RT4(object):
         :return: str
         '''
 
-        reply = requests.get(
-            self.rest_url + 'user/' + username,
-            params=self.credentials)
-
-        data = self.parse_reply(reply.text)
+        data = self.get_user(username)
 
         # if __debug__:
         #    print('get_usermail data:\n{}'.format(data))
@@ -712,11 +2415,7 @@ class RT4(object):
         :return: str
         '''
 
-        reply = requests.get(
-            self.rest_url + 'user/' + username,
-            params=self.credentials)
-
-        data = self.parse_reply(reply.text)
+        data = self.get_user(username)
 
         # if __debug__:
         #    print('get_userlang data:\n{}'.format(data))
@@ -740,16 +2439,20 @@ class RT4(object):
         '''
 
         payload = user_data
-        reply = requests.post(
-            self.rest_url + 'user/' + username + '/edit',
-            params=self.credentials, data=payload)
+        try:
 
-        info = self.check_reply(reply.text)
+            info = self._post(
+                'user/' + username + '/edit', data=payload,
+                endpoint='user/edit', parser=self.check_reply)
+
+        finally:
+
+            self.invalidate_user(username)
 
         return info
 
     def add_comment(self, id_, message):
-        '''Add comment to ticket.
+        r'''Add comment to ticket.
 
         :param id\_: Ticket ID
         :type id\_: str
@@ -761,9 +2464,10 @@ class RT4(object):
 
         payload = message
         # TODO: add logging for the reply
-        requests.post(
-            self.rest_url + 'ticket/' + id_ + '/comment',
-            params=self.credentials, data=payload)
+        self._post(
+            'ticket/' + str(id_) + '/comment', data=payload,
+            endpoint='ticket/comment', ticket=id_)
+        self.invalidate_ticket(id_)
         # if __debug__:
         #    print('add_comment reply:\n{}'.format(reply.text))
 
@@ -777,15 +2481,11 @@ class RT4(object):
         '''
 
         payload = ticket_data
-        reply = requests.post(
-            self.rest_url + 'ticket/new',
-            params=self.credentials, data=payload)
-        # if __debug__:
-        #    print('create_ticket reply:\n{}'.format(reply.text))
-
         try:
 
-            info = self.check_reply(reply.text)
+            info = self._post(
+                'ticket/new', data=payload,
+                endpoint='ticket/new', parser=self.check_reply)
 
         except BadRequestException as e:
 
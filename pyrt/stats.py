@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+"""Module for request statistics."""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import bisect
+import threading
+
+__all__ = [
+    'RequestStats'
+]
+
+
+# upper bounds of latency histogram buckets in seconds
+DEFAULT_BOUNDS = (
+    0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+
+class _Histogram(object):
+    """Latency histogram with fixed buckets.
+
+    Args:
+        bounds (tuple of float): the increasing bucket upper bounds
+    """
+
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, bounds):
+
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        """Add measured value, None is ignored.
+
+        Args:
+            value (float): the time in seconds
+
+        Return:
+            None
+        """
+
+        if value is None:
+
+            return
+
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        """Return upper bound of the bucket containing the percentile.
+
+        Values above the last bound are reported as the maximum.
+
+        Args:
+            percent (float): the percentile, 0 - 100
+
+        Return:
+            float or None without values
+        """
+
+        if not self.count:
+
+            return None
+
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+
+            seen += count
+            if count and seen >= rank:
+
+                return min(bound, self.max)
+
+        return self.max
+
+    def report(self):
+        """Return histogram summary.
+
+        Return:
+            dict: count, total, mean, max, p50, p99 and histogram - list
+            of (upper bound, count), None bound for the last bucket
+        """
+
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'max': self.max if self.count else None,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'histogram': list(zip(self.bounds + (None,), self.counts)),
+        }
+
+
+class _EndpointStats(object):
+    """Statistics of one endpoint.
+
+    Args:
+        bounds (tuple of float): the histogram bucket upper bounds
+    """
+
+    __slots__ = (
+        'count', 'errors', 'retries', 'bytes', 'statuses', 'network', 'parse')
+
+    def __init__(self, bounds):
+
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes = 0
+        self.statuses = {}
+        self.network = _Histogram(bounds)
+        self.parse = _Histogram(bounds)
+
+    def add(self, event):
+
+        self.count += 1
+        if event.error is not None:
+
+            self.errors += 1
+
+        self.retries += event.retries
+        self.bytes += event.bytes or 0
+        self.statuses[event.status] = self.statuses.get(event.status, 0) + 1
+        self.network.add(event.network_time)
+        self.parse.add(event.parse_time)
+
+    def report(self):
+
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'retries': self.retries,
+            'bytes': self.bytes,
+            'statuses': dict(self.statuses),
+            'network': self.network.report(),
+            'parse': self.parse.report(),
+        }
+
+
+class RequestStats(object):
+    """In-memory aggregator of RT requests per endpoint.
+
+    An observer for :class:`RT4`, it counts requests, errors, retries,
+    received bytes and RT statuses and keeps histograms of network and parse
+    times::
+
+        stats = RequestStats()
+        rt = RT4(url, observers=[stats])
+        ...
+        print(stats.summary())
+
+    Args:
+        bounds ([float]): the increasing upper bounds of histogram
+            buckets in seconds
+    """
+
+    def __init__(self, bounds=DEFAULT_BOUNDS):
+
+        self.bounds = tuple(bounds)
+
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+
+        with self._lock:
+
+            stats = self._endpoints.get(event.endpoint)
+            if stats is None:
+
+                stats = _EndpointStats(self.bounds)
+                self._endpoints[event.endpoint] = stats
+
+            stats.add(event)
+
+    def reset(self):
+        """Remove collected statistics.
+
+        Return:
+            None
+        """
+
+        with self._lock:
+
+            self._endpoints.clear()
+
+    def report(self):
+        """Return statistics of every endpoint.
+
+        Return:
+            {str: dict}: endpoint - count, errors, retries, bytes, statuses
+            ({status: count}), network and parse histogram summaries
+        """
+
+        with self._lock:
+
+            return dict(
+                (endpoint, stats.report())
+                for endpoint, stats in self._endpoints.items())
+
+    def summary(self):
+        """Return statistics as a text table sorted by total time.
+
+        Return:
+            str
+        """
+
+        def ms(value):
+
+            return '-' if value is None else '{:.2f}'.format(value * 1000)
+
+        report = self.report()
+        endpoints = sorted(
+            report,
+            key=lambda e: report[e]['network']['total'] +
+            report[e]['parse']['total'],
+            reverse=True)
+
+        lines = ['{:<20} {:>7} {:>6} {:>7} {:>10} {:>9} {:>9} {:>9}'.format(
+            'endpoint', 'count', 'errors', 'retries', 'bytes', 'net p50',
+            'net p99', 'parse avg')]
+        for endpoint in endpoints:
+
+            stats = report[endpoint]
+            lines.append(
+                '{:<20} {:>7} {:>6} {:>7} {:>10} {:>9} {:>9} {:>9}'.format(
+                    endpoint, stats['count'], stats['errors'],
+                    stats['retries'], stats['bytes'],
+                    ms(stats['network']['p50']), ms(stats['network']['p99']),
+                    ms(stats['parse']['mean'])))
+
+        return '\n'.join(lines)
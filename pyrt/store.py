@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+
+"""Module for local ticket storage."""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import datetime
+import json
+import sqlite3
+import threading
+
+from .pyrt import TicketList, _rt_date
+
+__all__ = [
+    'TicketStore'
+]
+
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tickets (
+    id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    ticket INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS transactions_ticket ON transactions (ticket);
+
+CREATE TABLE IF NOT EXISTS sync (
+    ticket INTEGER PRIMARY KEY,
+    last_updated TEXT
+);
+
+CREATE TABLE IF NOT EXISTS ticket_index (
+    id INTEGER PRIMARY KEY,
+    queue TEXT,
+    status TEXT,
+    owner TEXT,
+    priority INTEGER,
+    created TEXT,
+    last_updated TEXT
+);
+
+CREATE INDEX IF NOT EXISTS ticket_index_queue ON ticket_index (queue);
+CREATE INDEX IF NOT EXISTS ticket_index_status ON ticket_index (status);
+CREATE INDEX IF NOT EXISTS ticket_index_owner ON ticket_index (owner);
+CREATE INDEX IF NOT EXISTS ticket_index_priority ON ticket_index (priority);
+CREATE INDEX IF NOT EXISTS ticket_index_created ON ticket_index (created);
+CREATE INDEX IF NOT EXISTS ticket_index_last_updated
+    ON ticket_index (last_updated);
+'''
+
+
+def _index_row(id_, data):
+    """Return ticket_index row for ticket data.
+
+    Args:
+        id_ (str): the ticket ID
+        data ({str: str}): the ticket data
+
+    Return:
+        tuple
+    """
+
+    try:
+
+        priority = int(data.get('Priority', ''))
+
+    except ValueError:
+
+        priority = None
+
+    return (
+        int(id_),
+        data.get('Queue'),
+        data.get('Status'),
+        data.get('Owner'),
+        priority,
+        _rt_date(data.get('Created')),
+        _rt_date(data.get('LastUpdated')),
+    )
+
+
+def _date_bound(value, upper=False):
+    """Return date bound in the index format.
+
+    Date without time is the start of the day, or its end for the upper
+    bound, so ranges of days are inclusive.
+
+    Args:
+        value (str/date/datetime): 'YYYY-MM-DD[ HH:MM:SS]', date or
+            datetime
+        upper (bool): the value is the upper bound
+
+    Return:
+        str
+    """
+
+    if isinstance(value, datetime.datetime):
+
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+
+    if isinstance(value, datetime.date):
+
+        value = value.strftime('%Y-%m-%d')
+
+    if len(value) == len('YYYY-MM-DD'):
+
+        return value + (' 23:59:59' if upper else ' 00:00:00')
+
+    return value
+
+
+def _date_end(value):
+
+    return _date_bound(value, upper=True)
+
+
+class TicketStore(object):
+    """SQLite mirror of tickets and their histories.
+
+    Stores ticket data, history transactions and synchronization state
+    of every ticket, so a restarted process loads only changes from RT.
+
+    Args:
+        path (str): database file, ':memory:' for a temporary store
+    """
+
+    def __init__(self, path):
+
+        self.path = path
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock:
+
+            self._db.executescript(_SCHEMA)
+
+            indexed = self._db.execute(
+                'SELECT COUNT(*) FROM ticket_index').fetchone()[0]
+            stored = self._db.execute(
+                'SELECT COUNT(*) FROM tickets').fetchone()[0]
+
+        # stores without the index
+        if indexed != stored:
+
+            self.reindex()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+    def close(self):
+        """Close the database.
+
+        Return:
+            None
+        """
+
+        with self._lock:
+
+            self._db.close()
+
+    def save_ticket(self, id_, data):
+        """Save ticket data.
+
+        Args:
+            id_ (str): the ticket ID
+            data ({str: str}): the ticket data
+
+        Return:
+            None
+        """
+
+        with self._lock, self._db:
+
+            self._db.execute(
+                'INSERT OR REPLACE INTO tickets (id, data) VALUES (?, ?)',
+                (int(id_), json.dumps(data)))
+            self._db.execute(
+                'INSERT OR REPLACE INTO ticket_index VALUES '
+                '(?, ?, ?, ?, ?, ?, ?)', _index_row(id_, data))
+
+    def load_ticket(self, id_):
+        """Return ticket data or None.
+
+        Args:
+            id_ (str): the ticket ID
+
+        Return:
+            {str: str}
+        """
+
+        with self._lock:
+
+            row = self._db.execute(
+                'SELECT data FROM tickets WHERE id = ?',
+                (int(id_),)).fetchone()
+
+        if row is None:
+
+            return None
+
+        return json.loads(row[0])
+
+    def ticket_ids(self):
+        """Return IDs of stored tickets.
+
+        Return:
+            [str]
+        """
+
+        with self._lock:
+
+            rows = self._db.execute(
+                'SELECT id FROM tickets ORDER BY id').fetchall()
+
+        return [str(row[0]) for row in rows]
+
+    def save_history(self, id_, history):
+        """Save history transactions of ticket.
+
+        Args:
+            id_ (str): the ticket ID
+            history ({str: {str: str}}): the transactions
+
+        Return:
+            None
+        """
+
+        rows = [
+            (int(h_id), int(id_), json.dumps(history[h_id]))
+            for h_id in history]
+
+        with self._lock, self._db:
+
+            self._db.executemany(
+                'INSERT OR REPLACE INTO transactions (id, ticket, data) '
+                'VALUES (?, ?, ?)', rows)
+
+    def load_history(self, id_):
+        """Return stored history transactions of ticket.
+
+        Args:
+            id_ (str): the ticket ID
+
+        Return:
+            {str: {str: str}}
+        """
+
+        with self._lock:
+
+            rows = self._db.execute(
+                'SELECT id, data FROM transactions WHERE ticket = ?',
+                (int(id_),)).fetchall()
+
+        return dict((str(h_id), json.loads(data)) for h_id, data in rows)
+
+    def get_state(self, id_):
+        """Return synchronization state of ticket.
+
+        Args:
+            id_ (str): the ticket ID
+
+        The stored history gives the last transaction.
+
+        Return:
+            str: LastUpdated value of the ticket, None for unknown
+            tickets
+        """
+
+        with self._lock:
+
+            row = self._db.execute(
+                'SELECT last_updated FROM sync WHERE ticket = ?',
+                (int(id_),)).fetchone()
+
+        if row is None:
+
+            return None
+
+        return row[0]
+
+    def set_state(self, id_, last_updated):
+        """Save synchronization state of ticket.
+
+        Args:
+            id_ (str): the ticket ID
+            last_updated (str): LastUpdated value of the ticket
+
+        Return:
+            None
+        """
+
+        with self._lock, self._db:
+
+            self._db.execute(
+                'INSERT OR REPLACE INTO sync (ticket, last_updated) '
+                'VALUES (?, ?)', (int(id_), last_updated))
+
+    def reindex(self):
+        """Rebuild the query index from stored tickets.
+
+        Return:
+            None
+        """
+
+        with self._lock, self._db:
+
+            rows = self._db.execute('SELECT id, data FROM tickets')
+            index = [
+                _index_row(id_, json.loads(data)) for id_, data in rows]
+
+            self._db.execute('DELETE FROM ticket_index')
+            self._db.executemany(
+                'INSERT INTO ticket_index VALUES (?, ?, ?, ?, ?, ?, ?)',
+                index)
+
+    def search(
+            self,
+            rt,
+            queue=None,
+            status=None,
+            owner=None,
+            priority=None,
+            created=None,
+            last_updated=None):
+        """Search stored tickets and return TicketList.
+
+        Values of queue, status and owner are single values or lists of
+        allowed values. Ranges are (from, to) tuples, both inclusive,
+        None for an open end. Dates are 'YYYY-MM-DD[ HH:MM:SS]' strings,
+        date or datetime objects, a date without time covers the whole
+        day.
+
+        Args:
+            rt (RT4): the RT4 instance for the tickets
+            queue (str/[str]): the queue names
+            status (str/[str]): the statuses
+            owner (str/[str]): the owners
+            priority ((int, int)): the priority range
+            created ((str, str)): the creation date range
+            last_updated ((str, str)): the last update date range
+
+        Return:
+            TicketList
+        """
+
+        where = []
+        args = []
+
+        for column, value in (
+                ('queue', queue), ('status', status), ('owner', owner)):
+
+            if value is None:
+
+                continue
+
+            if isinstance(value, (list, tuple, set, frozenset)):
+
+                where.append('{} IN ({})'.format(
+                    column, ', '.join('?' * len(value))))
+                args.extend(value)
+
+            else:
+
+                where.append(column + ' = ?')
+                args.append(value)
+
+        for column, bounds, convert_low, convert_high in (
+                ('priority', priority, int, int),
+                ('created', created, _date_bound, _date_end),
+                ('last_updated', last_updated, _date_bound, _date_end)):
+
+            if bounds is None:
+
+                continue
+
+            low, high = bounds
+            if low is not None:
+
+                where.append(column + ' >= ?')
+                args.append(convert_low(low))
+
+            if high is not None:
+
+                where.append(column + ' <= ?')
+                args.append(convert_high(high))
+
+        sql = (
+            'SELECT tickets.id, tickets.data FROM ticket_index '
+            'JOIN tickets ON tickets.id = ticket_index.id')
+        if where:
+
+            sql += ' WHERE ' + ' AND '.join(where)
+
+        with self._lock:
+
+            rows = self._db.execute(sql, args).fetchall()
+
+        data = dict((str(id_), json.loads(data)) for id_, data in rows)
+
+        return TicketList(data, rt)
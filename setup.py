@@ -40,16 +40,16 @@ setup(
 
     keywords='rt4 helpdesk request tracker',
 
-    packages=find_packages(exclude=['docs', 'tests']),
+    packages=find_packages(exclude=['benchmarks', 'docs', 'tests']),
 
     install_requires=[
         'requests',
     ],
 
-    # extras_require = {
-    #     'dev': ['check-manifest'],
-    #     'test': ['coverage'],
-    # },
+    extras_require={
+        'async': ['aiohttp'],
+        'numpy': ['numpy'],
+    },
 
     # package_data={
     #     'sample': ['package_data.dat'],
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+#
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import unittest
+
+import pyrt
+
+try:
+
+    import asyncio
+
+except ImportError:
+
+    asyncio = None
+
+
+class FakeAsyncResponse(object):
+
+    def __init__(self, text, status=200):
+
+        self._content = text.encode('utf-8')
+        self.charset = None
+        self.status = status
+
+    def read(self):
+
+        return asyncio.sleep(0, result=self._content)
+
+    def __aenter__(self):
+
+        return asyncio.sleep(0, result=self)
+
+    def __aexit__(self, exc_type, exc_value, traceback):
+
+        return asyncio.sleep(0)
+
+
+class FakeAsyncSession(object):
+    """Session replacement recording requests."""
+
+    def __init__(self, replies=None):
+
+        self.replies = list(replies or [])
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+
+        self.requests.append((method, url, kwargs))
+
+        if self.replies:
+
+            reply = self.replies.pop(0)
+            if isinstance(reply, FakeAsyncResponse):
+
+                return reply
+
+            return FakeAsyncResponse(reply)
+
+        return FakeAsyncResponse('RT/4.0 200 ok\n\n')
+
+
+@unittest.skipIf(asyncio is None, 'asyncio is not available')
+class TestAsyncRT4(unittest.TestCase):
+
+    def setUp(self):
+
+        from pyrt import aio
+
+        self.aio = aio
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+
+        self.loop.close()
+
+    def run_coro(self, coro):
+
+        return self.loop.run_until_complete(coro)
+
+    def test_load_ticket(self):
+
+        session = FakeAsyncSession(['RT/4.0 200 ok\n\nSubject: test\n'])
+        rt = self.aio.AsyncRT4('http://rt/REST/1.0/', session=session)
+        self.run_coro(rt.login('test', 'testpass'))
+
+        ticket = self.run_coro(rt.get_ticket('1'))
+        self.assertEqual(ticket.subject, 'test')
+
+        method, url, kwargs = session.requests[0]
+        self.assertEqual(method, 'GET')
+        self.assertEqual(url, 'http://rt/REST/1.0/ticket/1/show')
+        self.assertEqual(kwargs['params'], rt.credentials)
+
+    def test_get_tickets(self):
+
+        session = FakeAsyncSession([
+            'RT/4.0 200 Ok\n\nSubject: First\n',
+            'RT/4.0 200 Ok\n\n# Ticket 2 does not exist.\n',
+            'RT/4.0 200 Ok\n\nSubject: Third\n',
+        ])
+        rt = self.aio.AsyncRT4(session=session)
+        errors = {}
+
+        tickets = self.collect(
+            rt.get_tickets(['1', '2', '3'], workers=2, errors=errors))
+        self.assertEqual(
+            [(t.id_, t.subject) for t in tickets],
+            [('1', 'First'), ('3', 'Third')])
+        self.assertEqual(list(errors), ['2'])
+
+        session.replies = ['RT/4.0 200 Ok\n\n# Ticket 2 does not exist.\n']
+        with self.assertRaises(pyrt.BatchError) as cm:
+
+            self.collect(rt.get_tickets(['2']))
+
+        self.assertEqual(list(cm.exception.errors), ['2'])
+
+    def collect(self, async_gen):
+
+        items = []
+        while True:
+
+            try:
+
+                items.append(self.run_coro(async_gen.__anext__()))
+
+            except StopAsyncIteration:  # NOQA
+
+                return items
+
+    def test_search_and_history(self):
+
+        session = FakeAsyncSession([
+            'RT/4.0 200 ok\n\n1: First\n2: Second\n',
+            (
+                'RT/4.0 200 ok\n\nid: 10\nTicket: 1\nType: Create\n'
+                'Creator: tuser\nDescription: Ticket created\n'
+                'Created: 2013-06-20 06:35:11\n'
+            ),
+        ])
+        rt = self.aio.AsyncRT4(session=session)
+
+        tl = self.run_coro(rt.search_ticket('Queue="General"'))
+        self.assertEqual(
+            sorted(tl.list_all()), [(1, 'First'), (2, 'Second')])
+
+        history = self.run_coro(rt.load_history('1'))
+        self.assertEqual(history['10']['Creator'], 'tuser')
+        self.assertEqual(session.requests[1][2]['params'], {'format': 'l'})
+
+    def test_lazy_attributes(self):
+
+        session = FakeAsyncSession(['RT/4.0 200 ok\n\n10: First\n'])
+        rt = self.aio.AsyncRT4(session=session)
+
+        tl = self.run_coro(rt.search_ticket('Queue="General"'))
+        ticket = tl.tickets['10']
+
+        self.assertIsInstance(ticket, self.aio.AsyncTicket)
+        self.assertEqual(ticket.subject, 'First')
+        self.assertEqual(ticket.creator, None)
+        self.assertEqual(ticket.priority, None)
+        self.assertEqual(len(session.requests), 1)
+
+    def test_long_search_and_transactions(self):
+
+        session = FakeAsyncSession([
+            'RT/4.0 200 ok\n\nid: ticket/1\nSubject: First\n',
+            'RT/4.0 200 ok\n\n10: Ticket created\n11: Comments added\n',
+            (
+                'RT/4.0 200 ok\n\nid: 11\nTicket: 1\nType: Comment\n'
+                'Creator: tuser\nDescription: Comments added\n'
+                'Created: 2013-06-20 06:35:11\n'
+            ),
+        ])
+        rt = self.aio.AsyncRT4(session=session)
+
+        tl = self.run_coro(rt.search_ticket('Queue="General"', format_='l'))
+        self.assertEqual(tl.list_all(), ((1, 'First'),))
+        self.assertEqual(session.requests[0][2]['params']['format'], 'l')
+
+        ids = self.run_coro(rt.load_history_ids('1'))
+        self.assertEqual(ids, ['10', '11'])
+
+        transaction = self.run_coro(rt.load_transaction('1', '11'))
+        self.assertEqual(transaction['Type'], 'Comment')
+
+    def test_async_tickets(self):
+
+        session = FakeAsyncSession([
+            'RT/4.0 200 ok\n\nSubject: test\nPriority: 10\n',
+            (
+                'RT/4.0 200 ok\n\nid: 10\nTicket: 1\nType: Create\n'
+                'Creator: tuser\nDescription: Ticket created\n'
+                'Created: 2013-06-20 06:35:11\n'
+            ),
+            'RT/4.0 200 ok\n\n10: Ticket created\n11: Comments added\n',
+            (
+                'RT/4.0 200 ok\n\nid: 11\nTicket: 1\nType: Comment\n'
+                'Creator: tuser\nDescription: Comments added\n'
+                'Created: 2013-06-20 06:35:11\n'
+            ),
+        ])
+        rt = self.aio.AsyncRT4(session=session)
+        self.assertIsInstance(rt, pyrt.RTBase)
+        self.assertNotIsInstance(rt, pyrt.RT4)
+
+        ticket = self.aio.AsyncTicket('1', None, None, rt)
+        self.assertEqual(ticket.priority, None)
+        self.assertEqual(session.requests, [])
+
+        self.run_coro(ticket.load_all())
+        self.assertEqual(ticket.priority, '10')
+        self.assertEqual(ticket.history.last_id, 10)
+
+        added = self.run_coro(ticket.history.update())
+        self.assertEqual([t['id'] for t in added], ['11'])
+        self.assertEqual(len(session.requests), 4)
+
+        self.run_coro(ticket.comment('text'))
+        self.assertEqual(
+            session.requests[4][1],
+            'http://localhost/REST/1.0/ticket/1/comment')
+
+    def test_observers(self):
+
+        session = FakeAsyncSession(['RT/4.0 200 ok\n\nSubject: test\n'])
+        events = []
+        rt = self.aio.AsyncRT4(session=session, observers=[events.append])
+
+        self.run_coro(rt.get_ticket('1'))
+        self.assertEqual(
+            [(e.endpoint, e.ticket, e.status, e.bytes) for e in events],
+            [('ticket/show', '1', '200', 29)])
+        self.assertGreaterEqual(events[0].parse_time, 0)
+
+    def test_retry(self):
+
+        session = FakeAsyncSession([
+            FakeAsyncResponse('Service Unavailable', status=503),
+            'RT/4.0 200 ok\n\nSubject: test\n',
+        ])
+        events = []
+        rt = self.aio.AsyncRT4(
+            session=session,
+            observers=[events.append],
+            retry=pyrt.RetryPolicy(backoff=0),
+            timeout=5)
+
+        ticket = self.run_coro(rt.get_ticket('1'))
+        self.assertEqual(ticket.subject, 'test')
+        self.assertEqual(len(session.requests), 2)
+        self.assertEqual(events[0].retries, 1)
+
+        with self.assertRaises(TypeError):
+
+            self.aio.AsyncRT4(limiter=pyrt.ConcurrencyLimiter())
+
+    def test_cookie_login(self):
+
+        session = FakeAsyncSession([
+            'RT/4.0 200 Ok\n\n',
+            'RT/4.0 401 Credentials required\n\n',
+            'RT/4.0 200 Ok\n\n',
+            'RT/4.0 200 Ok\n\nEmailAddress: test@example.com\n',
+        ])
+        rt = self.aio.AsyncRT4('http://rt/REST/1.0/', session=session)
+        self.run_coro(rt.login('test', 'testpass', cookie=True))
+
+        mail = self.run_coro(rt.get_usermail('test'))
+        self.assertEqual(mail, 'test@example.com')
+        self.assertEqual(
+            [r[1] for r in session.requests],
+            [
+                'http://rt/REST/1.0/',
+                'http://rt/REST/1.0/user/test',
+                'http://rt/REST/1.0/',
+                'http://rt/REST/1.0/user/test',
+            ])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
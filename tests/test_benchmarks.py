@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+#
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import unittest
+
+import pyrt
+
+from benchmarks import bench_parsers, bench_rt4
+from benchmarks.corpus import Corpus
+from benchmarks.fake_rt import FakeRT, FakeRTProcess
+
+
+class TestFakeRT(unittest.TestCase):
+
+    def setUp(self):
+
+        self.server = FakeRT(
+            tickets=5, transactions=3, corpus=Corpus(fields=2)).start()
+        self.rt = pyrt.RT4(self.server.url)
+
+    def tearDown(self):
+
+        self.rt.close()
+        self.server.stop()
+
+    def test_replies(self):
+
+        ticket = self.rt.get_ticket('2')
+        self.assertTrue(ticket.subject.startswith('Ticket 2 - '))
+        self.assertEqual(ticket.priority, '2')
+
+        tl = self.rt.search_ticket('Queue = "General"')
+        self.assertEqual(len(tl.tickets), 5)
+
+        tl = self.rt.search_ticket('Queue = "General"', fields=['Status'])
+        self.assertEqual(tl.tickets['3'].subject, None)
+
+        history = self.rt.load_history('2')
+        self.assertEqual(sorted(history), ['2000', '2001', '2002'])
+        self.assertIn('\n', history['2000']['Content'])
+
+        reply = self.rt.create_ticket({'content': 'Subject: test\n'})
+        self.assertEqual(reply, '# Ticket 6 created.\n')
+
+    def test_benchmarks(self):
+
+        for name, function in bench_rt4.BENCHMARKS:
+
+            stats = bench_rt4.run_benchmark(
+                function, self.rt, self.server, requests=4, workers=2)
+            self.assertEqual(stats['calls'], 4)
+            self.assertLessEqual(stats['p50'], stats['p99'])
+
+            if bench_rt4.tracemalloc is None:
+
+                self.assertEqual(stats['peak_kb'], None)
+
+            else:
+
+                self.assertGreaterEqual(stats['peak_kb'], 0)
+
+        stats = bench_rt4.run_benchmark(
+            bench_rt4.bench_get_ticket, self.rt, self.server, requests=2,
+            memory=False)
+        self.assertEqual(stats['peak_kb'], None)
+
+    def test_process(self):
+
+        with FakeRTProcess(tickets=3, transactions=2) as server:
+
+            rt = pyrt.RT4(server.url)
+            tl = rt.search_ticket('Queue = "General"')
+            self.assertEqual(len(tl.tickets), 3)
+            self.assertEqual(len(rt.load_history('1')), 2)
+            rt.close()
+
+
+class TestCorpus(unittest.TestCase):
+
+    def setUp(self):
+
+        self.rt = pyrt.RT4()
+
+    def test_ticket(self):
+
+        data = self.rt.parse_reply(Corpus(fields=5).show_reply([7]))
+        self.assertEqual(data['id'], 'ticket/7')
+        self.assertIn('CF.{Field 4}', data)
+
+        records = self.rt.parse_multi_reply(
+            Corpus().search_reply([1, 2, 3], 'l', set(['Status'])))
+        self.assertEqual(
+            [sorted(record) for record in records], [['Status', 'id']] * 3)
+
+        ids = self.rt.parse_ids_reply(Corpus().search_reply([1, 2], 'i'))
+        self.assertEqual(list(ids), [1, 2])
+
+    def test_history(self):
+
+        corpus = Corpus(content_size=500, line_words=5)
+        history = self.rt.parse_history_reply(corpus.history_reply(3, 4))
+        self.assertEqual(sorted(history), ['3000', '3001', '3002', '3003'])
+
+        content = history['3001']['Content']
+        self.assertGreater(len(content), 500)
+        self.assertGreater(content.count('\n'), 10)
+
+        corpus = Corpus(content_size=500, line_words=0, non_ascii=False)
+        history = self.rt.parse_history_reply(corpus.history_reply(3, 1))
+        content = history['3000']['Content']
+        self.assertEqual(content.count('\n'), 1)
+        content.encode('ascii')
+
+    def test_compare(self):
+
+        baselines = {'a': 1.0, 'b': 1.0}
+        results = {'a': 1.2, 'b': 1.3, 'c': 5.0}
+        self.assertEqual(
+            bench_parsers.compare(results, baselines, 0.25), ['b'])
+        self.assertEqual(
+            bench_parsers.compare(results, baselines, 0.1), ['a', 'b'])
+
+    def test_cases(self):
+
+        for name, function in bench_parsers.cases():
+
+            function()
+
+
+if __name__ == '__main__':
+
+    unittest.main()
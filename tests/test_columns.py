@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import datetime
+import os
+import subprocess
+import sys
+import unittest
+
+import pyrt
+
+try:
+
+    import numpy
+
+except ImportError:
+
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, 'numpy is not available')
+class TestTicketColumns(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tl = pyrt.TicketList({
+            '1': {
+                'Status': 'new', 'Queue': 'General', 'Priority': '10',
+                'Created': 'Mon Jun 20 06:35:11 2016', 'Due': 'Not set',
+            },
+            '2': {
+                'Status': 'open', 'Queue': 'General', 'Priority': '50',
+                'Created': 'Tue Jun 21 08:00:00 2016',
+                'Due': 'Wed Jun 22 08:00:00 2016',
+            },
+            '3': {
+                'Status': 'open', 'Queue': 'Support', 'Priority': '50',
+                'Created': '2016-06-29 12:00:00',
+                'Due': 'Fri Jul 01 08:00:00 2016',
+            },
+            '4': {'Status': 'resolved', 'Queue': 'Support'},
+        }, None)
+        self.columns = self.tl.columns()
+        self.now = '2016-06-30 12:00:00'
+
+    def test_columns(self):
+
+        columns = self.columns
+        self.assertEqual(len(columns), 4)
+        self.assertEqual(sorted(columns.ids.tolist()), [1, 2, 3, 4])
+
+        index = columns.ids.tolist().index(2)
+        self.assertEqual(columns.priorities[index], 50)
+        self.assertEqual(
+            columns.created[index], numpy.datetime64('2016-06-21T08:00:00'))
+        self.assertEqual(columns.statuses[columns.status_codes[index]], 'open')
+        self.assertEqual(columns.queues[columns.queue_codes[index]], 'General')
+
+        index = columns.ids.tolist().index(4)
+        self.assertTrue(numpy.isnan(columns.priorities[index]))
+        self.assertTrue(numpy.isnat(columns.created[index]))
+
+    def test_counts(self):
+
+        self.assertEqual(
+            self.columns.count_by_status(),
+            {'new': 1, 'open': 2, 'resolved': 1})
+        self.assertEqual(
+            self.columns.count_by_queue(), {'General': 2, 'Support': 2})
+        self.assertEqual(
+            self.columns.priority_distribution(), {10: 1, 50: 2})
+
+    def test_ages(self):
+
+        counts, edges = self.columns.age_histogram(
+            bins=[0, 1, 7], now=self.now)
+        self.assertEqual(counts.tolist(), [0, 1, 2])
+        self.assertEqual(edges[-1], numpy.inf)
+
+        ages = self.columns.ages(now=datetime.datetime(2016, 6, 30, 12))
+        index = self.columns.ids.tolist().index(3)
+        self.assertEqual(ages[index], 1)
+
+    def test_overdue(self):
+
+        self.assertEqual(
+            sorted(self.columns.overdue(now=self.now).tolist()), [2])
+
+    def test_subjects_only(self):
+
+        columns = pyrt.TicketList({'1': 'First'}, None).columns()
+        self.assertEqual(columns.ids.tolist(), [1])
+        self.assertEqual(columns.count_by_status(), {})
+        self.assertEqual(columns.priority_distribution(), {})
+
+    def test_empty(self):
+
+        columns = pyrt.TicketList(None, None).columns()
+        self.assertEqual(len(columns), 0)
+        self.assertEqual(columns.count_by_queue(), {})
+        self.assertEqual(columns.age_histogram()[0].tolist(), [0] * 5)
+
+
+def imported_modules(statement):
+    """Return names of modules loaded by statement in a new interpreter."""
+
+    code = statement + '; import sys; print(" ".join(sys.modules))'
+    output = subprocess.check_output(
+        [sys.executable, '-c', code],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    return output.decode('utf-8').split()
+
+
+class TestImport(unittest.TestCase):
+
+    def test_numpy_not_imported(self):
+
+        self.assertNotIn('numpy', imported_modules('import pyrt'))
+
+    def test_aiohttp_not_imported(self):
+
+        self.assertNotIn('aiohttp', imported_modules('import pyrt'))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
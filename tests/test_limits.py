@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+#
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import threading
+import time
+import unittest
+
+import requests
+
+import pyrt
+
+from pyrt import limits
+from test_pyrt import FakeResponse, FakeSession
+
+
+OK = 'RT/4.0 200 Ok\n\nSubject: test\n'
+
+
+class FlakySession(FakeSession):
+    """Session failing with the given exceptions or HTTP statuses."""
+
+    def __init__(self, failures):
+
+        super(FlakySession, self).__init__()
+        self.failures = list(failures)
+
+    def request(self, method, url, **kwargs):
+
+        self.requests.append((method, url, kwargs))
+
+        if self.failures:
+
+            failure = self.failures.pop(0)
+            if isinstance(failure, Exception):
+
+                raise failure
+
+            return FakeResponse('Service Unavailable', status_code=failure)
+
+        return FakeResponse(OK)
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_delay(self):
+
+        retry = pyrt.RetryPolicy(backoff=0.1, max_backoff=0.5, jitter=False)
+        self.assertEqual(
+            [retry.delay(attempt) for attempt in range(4)],
+            [0.1, 0.2, 0.4, 0.5])
+
+        retry = pyrt.RetryPolicy(backoff=0.1, max_backoff=0.5)
+        for attempt in range(10):
+
+            self.assertTrue(0 <= retry.delay(attempt) <= 0.5)
+
+    def test_status(self):
+
+        session = FlakySession([503, 502])
+        rt = pyrt.RT4(session=session, retry=pyrt.RetryPolicy(backoff=0))
+
+        events = []
+        rt.observers.append(events.append)
+
+        self.assertEqual(rt.load_ticket('1')['Subject'], 'test')
+        self.assertEqual(len(session.requests), 3)
+        self.assertEqual(events[0].retries, 2)
+        self.assertEqual(events[0].status, '200')
+
+    def test_exception(self):
+
+        session = FlakySession([
+            requests.ConnectionError('refused'), requests.Timeout('slow')])
+        rt = pyrt.RT4(session=session, retry=pyrt.RetryPolicy(backoff=0))
+
+        self.assertEqual(rt.load_ticket('1')['Subject'], 'test')
+        self.assertEqual(len(session.requests), 3)
+
+    def test_exhausted(self):
+
+        session = FlakySession([requests.ConnectionError('refused')] * 3)
+        rt = pyrt.RT4(
+            session=session, retry=pyrt.RetryPolicy(retries=2, backoff=0))
+
+        with self.assertRaises(requests.ConnectionError):
+
+            rt.load_ticket('1')
+
+        self.assertEqual(len(session.requests), 3)
+
+    def test_not_idempotent(self):
+
+        session = FlakySession([requests.ConnectionError('refused')])
+        rt = pyrt.RT4(session=session, retry=pyrt.RetryPolicy(backoff=0))
+
+        with self.assertRaises(requests.ConnectionError):
+
+            rt.add_comment('1', 'text')
+
+        self.assertEqual(len(session.requests), 1)
+
+    def test_no_retry(self):
+
+        session = FlakySession([requests.ConnectionError('refused')])
+        rt = pyrt.RT4(session=session)
+
+        with self.assertRaises(requests.ConnectionError):
+
+            rt.load_ticket('1')
+
+    def test_timeout(self):
+
+        session = FakeSession()
+        rt = pyrt.RT4(session=session, timeout=5)
+        rt.load_ticket('1')
+
+        self.assertEqual(session.requests[0][2]['timeout'], 5)
+
+        rt = pyrt.RT4(session=session)
+        rt.load_ticket('1')
+
+        self.assertNotIn('timeout', session.requests[1][2])
+
+
+class TestConcurrencyLimiter(unittest.TestCase):
+
+    def test_aimd(self):
+
+        limiter = pyrt.ConcurrencyLimiter(initial=4, maximum=6)
+
+        for _ in range(5):
+
+            limiter.release(limiter.acquire())
+
+        self.assertEqual(limiter.limit, 5)
+
+        limiter.release(limiter.acquire(), overloaded=True)
+        self.assertEqual(limiter.limit, 2)
+
+        for _ in range(100):
+
+            limiter.release(limiter.acquire())
+
+        self.assertEqual(limiter.limit, 6)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_one_decrease(self):
+
+        limiter = pyrt.ConcurrencyLimiter(initial=8)
+
+        tokens = [limiter.acquire() for _ in range(4)]
+        for token in tokens:
+
+            limiter.release(token, overloaded=True)
+
+        self.assertEqual(limiter.limit, 4)
+
+        limiter.release(limiter.acquire(), overloaded=True)
+        self.assertEqual(limiter.limit, 2)
+
+        for _ in range(5):
+
+            limiter.release(limiter.acquire(), overloaded=True)
+
+        self.assertEqual(limiter.limit, 1)
+
+    def test_frozen_clock(self):
+
+        timer = limits._timer
+        limits._timer = lambda: 1.0
+
+        try:
+
+            limiter = pyrt.ConcurrencyLimiter(initial=8)
+
+            tokens = [limiter.acquire() for _ in range(4)]
+            for token in tokens:
+
+                limiter.release(token, overloaded=True)
+
+            self.assertEqual(limiter.limit, 4)
+
+        finally:
+
+            limits._timer = timer
+
+    def test_latency(self):
+
+        limiter = pyrt.ConcurrencyLimiter(initial=4, latency=0.01)
+        token = limiter.acquire()
+        time.sleep(0.02)
+        limiter.release(token)
+
+        self.assertEqual(limiter.limit, 2)
+
+    def test_wait(self):
+
+        limiter = pyrt.ConcurrencyLimiter(initial=1)
+        token = limiter.acquire()
+
+        acquired = []
+
+        def worker():
+
+            acquired.append(limiter.acquire())
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        time.sleep(0.05)
+        self.assertEqual(acquired, [])
+
+        limiter.release(token)
+        thread.join(1)
+        self.assertEqual(len(acquired), 1)
+        self.assertEqual(limiter.in_flight, 1)
+
+    def test_rt4(self):
+
+        limiter = pyrt.ConcurrencyLimiter(initial=4)
+        session = FlakySession([503])
+        rt = pyrt.RT4(
+            session=session,
+            retry=pyrt.RetryPolicy(backoff=0),
+            limiter=limiter)
+
+        rt.load_ticket('1')
+
+        self.assertEqual(limiter.limit, 2)
+        self.assertEqual(limiter.in_flight, 0)
+
+        session.failures.append(requests.ConnectionError('refused'))
+        rt.retry = None
+
+        with self.assertRaises(requests.ConnectionError):
+
+            rt.load_ticket('1')
+
+        self.assertEqual(limiter.limit, 1)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_shared(self):
+
+        self.assertIs(pyrt.shared_limiter(), limits.shared_limiter())
+        self.assertIsInstance(
+            pyrt.shared_limiter(), pyrt.ConcurrencyLimiter)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
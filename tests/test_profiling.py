@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+#
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import pyrt
+
+from pyrt import profiling
+from test_pyrt import FakeSession
+
+
+class TestProfile(unittest.TestCase):
+
+    def setUp(self):
+
+        self.session = FakeSession(
+            ['RT/4.0 200 Ok\n\n1: First\n2: Second\n'] * 4)
+        self.rt = pyrt.RT4(session=self.session)
+
+        self.environ = dict(os.environ)
+        os.environ.pop(profiling.ENABLE_VARIABLE, None)
+        os.environ.pop(profiling.OUTPUT_VARIABLE, None)
+
+    def tearDown(self):
+
+        os.environ.clear()
+        os.environ.update(self.environ)
+
+    def search(self):
+
+        tl = self.rt.search_ticket('Queue = "General"')
+
+        return [t.subject for t in tl.tickets.values()]
+
+    def test_disabled(self):
+
+        profile = pyrt.Profile(self.rt)
+        self.assertFalse(profile.enabled)
+        search = self.search
+        self.assertIs(profile(search), search)
+
+        with profile:
+
+            self.assertEqual(self.rt.observers, [])
+            self.search()
+
+        self.assertEqual(profile.profiler, None)
+        self.assertEqual(profile.report()['requests'], 0)
+
+    def test_context(self):
+
+        with pyrt.Profile(self.rt, enabled=True) as profile:
+
+            self.search()
+            self.search()
+
+        self.assertEqual(self.rt.observers, [])
+
+        report = profile.report()
+        self.assertEqual(report['requests'], 2)
+        self.assertEqual(report['errors'], 0)
+        self.assertEqual(sorted(report['time']), sorted(profiling.CATEGORIES))
+        self.assertGreater(report['time']['fetch'], 0)
+        self.assertGreater(report['time']['parse'], 0)
+        self.assertGreater(report['time']['construction'], 0)
+        self.assertAlmostEqual(
+            sum(report['time'].values()), report['wall_time'], places=3)
+
+        if profiling.tracemalloc is not None:
+
+            self.assertEqual(
+                sorted(report['allocations']), sorted(profiling.CATEGORIES))
+            self.assertGreater(report['peak_memory'], 0)
+
+        else:
+
+            self.assertEqual(report['allocations'], None)
+
+        summary = profile.summary()
+        self.assertTrue(summary.startswith('pyrt profile:'))
+        self.assertIn('search_ticket', summary)
+
+    def test_decorator(self):
+
+        profile = pyrt.Profile(self.rt, enabled=True)
+        search = profile(self.search)
+
+        self.assertEqual(search(), ['First', 'Second'])
+        search()
+
+        self.assertEqual(profile.report()['requests'], 2)
+
+    def test_environment(self):
+
+        directory = tempfile.mkdtemp()
+        output = os.path.join(directory, 'profile.txt')
+
+        os.environ[profiling.ENABLE_VARIABLE] = '1'
+        os.environ[profiling.OUTPUT_VARIABLE] = output
+
+        try:
+
+            with pyrt.Profile(self.rt, limit=5):
+
+                self.search()
+
+            with io.open(output, encoding='utf-8') as fh:
+
+                self.assertIn('1 requests', fh.read())
+
+        finally:
+
+            shutil.rmtree(directory)
+
+    def test_category(self):
+
+        ranges = profiling.Profile._line_ranges()
+
+        code = pyrt.RT4.parse_reply.__code__ if hasattr(
+            pyrt.RT4.parse_reply, '__code__') else \
+            pyrt.RT4.parse_reply.__func__.__code__
+        self.assertEqual(
+            profiling._category(
+                code.co_filename, code.co_firstlineno + 5, ranges),
+            'parse')
+        self.assertEqual(
+            profiling._category(
+                '/usr/lib/python3/site-packages/requests/models.py', 10,
+                ranges),
+            'fetch')
+        self.assertEqual(
+            profiling._category('/srv/app/job.py', 10, ranges), 'other')
+
+
+if __name__ == '__main__':
+
+    unittest.main()
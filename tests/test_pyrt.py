@@ -4,10 +4,65 @@
 from __future__ import unicode_literals
 from __future__ import print_function
 
+import random
 import unittest
 import pyrt
 
 
+class FakeResponse(object):
+
+    def __init__(
+            self, text, content_type='text/plain; charset=utf-8',
+            status_code=200):
+
+        self.text = text
+        self.status_code = status_code
+        self.content = text.encode('utf-8')
+        self.headers = {'content-type': content_type}
+        self.encoding = 'utf-8'
+        self.closed = False
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+
+        data = self.text if decode_unicode else self.content
+        for start in range(0, len(data), chunk_size):
+
+            yield data[start:start + chunk_size]
+
+    def close(self):
+
+        self.closed = True
+
+
+class FakeSession(object):
+    """Session replacement recording requests."""
+
+    def __init__(self, replies=None, handler=None):
+
+        self.replies = list(replies or [])
+        self.handler = handler
+        self.requests = []
+        self.closed = False
+
+    def request(self, method, url, **kwargs):
+
+        self.requests.append((method, url, kwargs))
+
+        if self.handler is not None:
+
+            return FakeResponse(self.handler(method, url, kwargs))
+
+        if self.replies:
+
+            return FakeResponse(self.replies.pop(0))
+
+        return FakeResponse('RT/4.0 200 ok\n\n')
+
+    def close(self):
+
+        self.closed = True
+
+
 class TestTicket(unittest.TestCase):
 
     def setUp(self):
@@ -32,6 +87,54 @@ class TestTicket(unittest.TestCase):
             pyrt.RT4('čřčřč'),
         )
 
+    def test_lazy_load(self):
+
+        session = FakeSession([
+            'RT/4.0 200 Ok\n\nSubject: Loaded\nCreator: root\n'
+            'Priority: 10\n',
+        ])
+        rt = pyrt.RT4(session=session)
+
+        ticket = pyrt.Ticket('1', 'Subject', None, rt)
+        self.assertEqual(session.requests, [])
+
+        self.assertEqual(ticket.priority, '10')
+        self.assertEqual(ticket.creator, 'root')
+        self.assertEqual(ticket.subject, 'Loaded')
+        self.assertEqual(len(session.requests), 1)
+
+        ticket = pyrt.Ticket('2', None, {'Subject': 'Data'}, rt)
+        self.assertEqual(ticket.due, None)
+        self.assertEqual(len(session.requests), 1)
+
+        self.assertIsInstance(ticket.history, pyrt.TicketHistory)
+        self.assertIs(ticket.history, ticket.history)
+
+    def test_lazy_load_failure(self):
+
+        class FailingSession(FakeSession):
+
+            def request(self, method, url, **kwargs):
+
+                if not self.requests:
+
+                    self.requests.append((method, url, kwargs))
+                    raise IOError('refused')
+
+                return super(FailingSession, self).request(
+                    method, url, **kwargs)
+
+        session = FailingSession(['RT/4.0 200 Ok\n\nPriority: 10\n'])
+        ticket = pyrt.Ticket('1', 'Subject', None, pyrt.RT4(session=session))
+
+        with self.assertRaises(IOError):
+
+            ticket.priority
+
+        self.assertEqual(ticket.priority, '10')
+        self.assertEqual(ticket.due, None)
+        self.assertEqual(len(session.requests), 2)
+
     def test_map_data(self):
 
         ticket = pyrt.Ticket(
@@ -45,12 +148,258 @@ class TestTicket(unittest.TestCase):
         ticket.map_data(data)
 
 
+def transaction_text(h_id, description):
+
+    return (
+        'id: {0}\nTicket: 1\nType: Comment\nCreator: root\n'
+        'Content: Text {0}\nDescription: {1}\n'
+        'Created: 2013-06-20 06:35:11\n'
+    ).format(h_id, description)
+
+
 class TestTicketHistory(unittest.TestCase):
 
     def setUp(self):
 
         self.th = pyrt.TicketHistory(None, None)
 
+        self.transactions = {'10': 'Ticket created', '12': 'Comment added'}
+
+        def handler(method, url, kwargs):
+
+            path = url.split('/REST/1.0/ticket/1/')[1]
+            if path == 'history' and kwargs['params'] is None:
+
+                lines = [
+                    '{}: {}'.format(h_id, self.transactions[h_id])
+                    for h_id in sorted(self.transactions)]
+
+                return 'RT/4.0 200 Ok\n\n' + '\n'.join(lines) + '\n'
+
+            if path == 'history':
+
+                blocks = [
+                    transaction_text(h_id, self.transactions[h_id])
+                    for h_id in sorted(self.transactions)]
+
+                return 'RT/4.0 200 Ok\n\n' + '\n--\n\n'.join(blocks)
+
+            h_id = path.split('/')[-1]
+
+            return 'RT/4.0 200 Ok\n\n' + transaction_text(
+                h_id, self.transactions[h_id])
+
+        self.session = FakeSession(handler=handler)
+        self.rt = pyrt.RT4(session=self.session)
+
+    def test_load(self):
+
+        th = pyrt.TicketHistory('1', self.rt)
+        th.load()
+
+        self.assertEqual(sorted(th.history), ['10', '12'])
+        self.assertEqual(
+            [h['id'] for h in th.history_list], ['10', '12'])
+        self.assertEqual(len(th.comments), 2)
+        self.assertIn('Content: Text 12\n', th.comments[1])
+        self.assertEqual(th.last_id, 12)
+
+    def test_views(self):
+
+        self.assertEqual(self.th.history_list, None)
+        self.assertEqual(self.th.comments, [])
+
+        self.th.restore({
+            '12': {'id': '12', 'Type': 'Comment'},
+            '9': {'id': '9', 'Type': 'Create'},
+        })
+        self.assertEqual(
+            [h['id'] for h in self.th.history_list], ['9', '12'])
+        self.assertEqual(
+            sorted(self.th.comments[0].splitlines()),
+            ['Type: Create', 'id: 9'])
+
+        # views share the stored transactions
+        self.assertIs(self.th.history_list[1], self.th.history['12'])
+
+        self.th._add({'10': {'id': '10', 'Type': 'Status'}})
+        self.assertEqual(
+            [h['id'] for h in self.th.history_list], ['9', '10', '12'])
+        self.assertEqual(self.th.last_id, 12)
+
+    def test_slots(self):
+
+        ticket = pyrt.Ticket('1', 'test', None, self.rt)
+        tl = pyrt.TicketList({'1': 'test'}, self.rt)
+
+        for obj in (self.th, ticket, tl):
+
+            self.assertFalse(hasattr(obj, '__dict__'))
+
+    def test_update(self):
+
+        th = pyrt.TicketHistory('1', self.rt)
+        new = th.update()
+        self.assertEqual([h['id'] for h in new], ['10', '12'])
+
+        self.assertEqual(th.update(), [])
+
+        self.transactions['13'] = 'Status changed'
+        self.transactions['20'] = 'Comment added'
+        requests = len(self.session.requests)
+
+        new = th.update()
+        self.assertEqual([h['id'] for h in new], ['13', '20'])
+        self.assertEqual(
+            [h['id'] for h in th.history_list], ['10', '12', '13', '20'])
+        self.assertEqual(len(th.comments), 4)
+        self.assertEqual(th.last_id, 20)
+
+        # short history and two transactions
+        urls = [r[1] for r in self.session.requests[requests:]]
+        self.assertEqual(urls, [
+            'http://localhost/REST/1.0/ticket/1/history',
+            'http://localhost/REST/1.0/ticket/1/history/id/13',
+            'http://localhost/REST/1.0/ticket/1/history/id/20',
+        ])
+
+
+class TestTicketWatcher(unittest.TestCase):
+
+    def setUp(self):
+
+        # {id: LastUpdated}
+        self.tickets = {}
+        self.transactions = {}
+
+        def handler(method, url, kwargs):
+
+            params = kwargs['params'] or {}
+            if 'query' in params:
+
+                records = [
+                    'id: ticket/{}\nLastUpdated: {}\n'.format(id_, updated)
+                    for id_, updated in sorted(self.tickets.items())]
+
+                return 'RT/4.0 200 Ok\n\n' + '\n--\n\n'.join(records)
+
+            id_ = url.split('/ticket/')[1].split('/')[0]
+            if params.get('format') == 'l':
+
+                return 'RT/4.0 200 Ok\n\n' + '\n--\n\n'.join(
+                    transaction_text(h_id, 'Comment')
+                    for h_id in self.transactions[id_])
+
+            if url.endswith('/history'):
+
+                return 'RT/4.0 200 Ok\n\n' + ''.join(
+                    '{}: Comment\n'.format(h_id)
+                    for h_id in self.transactions[id_])
+
+            h_id = url.split('/')[-1]
+
+            return 'RT/4.0 200 Ok\n\n' + transaction_text(h_id, 'Comment')
+
+        self.session = FakeSession(handler=handler)
+        self.rt = pyrt.RT4(session=self.session)
+
+    def test_query(self):
+
+        watcher = self.rt.watch(since='2016-06-20 00:00:00')
+        self.assertEqual(
+            watcher.query(), "LastUpdated >= '2016-06-20 00:00:00'")
+
+        watcher = self.rt.watch(['General', "Bob's"], '2016-06-20 00:00:00')
+        self.assertEqual(
+            watcher.query(),
+            "(Queue = 'General' OR Queue = 'Bob\\'s') "
+            "AND LastUpdated >= '2016-06-20 00:00:00'")
+
+    def test_poll(self):
+
+        watcher = self.rt.watch(['General'], '2016-06-20 00:00:00')
+        self.assertEqual(watcher.poll(), [])
+
+        self.tickets['1'] = 'Mon Jun 20 06:35:11 2016'
+        self.tickets['2'] = 'Mon Jun 20 06:00:00 2016'
+        self.assertEqual(watcher.poll(), ['2', '1'])
+        self.assertEqual(watcher.watermark, '2016-06-20 06:35:11')
+
+        # nothing new at the watermark
+        self.assertEqual(watcher.poll(), [])
+        self.assertIn(
+            "LastUpdated >= '2016-06-20 06:35:11'",
+            self.session.requests[-1][2]['params']['query'])
+
+        self.tickets['3'] = 'Mon Jun 20 06:35:11 2016'
+        self.assertEqual(watcher.poll(), ['3'])
+
+        self.tickets['1'] = 'Mon Jun 20 07:00:00 2016'
+        self.assertEqual(watcher.poll(), ['1'])
+        self.assertEqual(watcher.poll(), [])
+
+    def test_poll_history(self):
+
+        watcher = self.rt.watch(since='2016-06-20 00:00:00', history=True)
+
+        self.tickets['1'] = 'Mon Jun 20 06:35:11 2016'
+        self.transactions['1'] = ['10', '12']
+        changes = watcher.poll()
+        self.assertEqual(
+            [(id_, [t['id'] for t in new]) for id_, new in changes],
+            [('1', ['10', '12'])])
+
+        self.tickets['1'] = 'Mon Jun 20 07:00:00 2016'
+        self.transactions['1'].append('15')
+        changes = watcher.poll()
+        self.assertEqual(
+            [(id_, [t['id'] for t in new]) for id_, new in changes],
+            [('1', ['15'])])
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.now = 0
+        self.cache = pyrt.pyrt._Cache(2, 10, timer=lambda: self.now)
+
+    def test_lru(self):
+
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+        self.assertEqual(self.cache.get('a'), 1)
+
+        self.cache.put('c', 3)
+        self.assertEqual(self.cache.get('b'), None)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(self.cache.get('c'), 3)
+
+    def test_ttl(self):
+
+        self.cache.put('a', 1)
+        self.now = 9
+        self.assertEqual(self.cache.get('a'), 1)
+
+        self.now = 10
+        self.assertEqual(self.cache.get('a'), None)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_invalidate(self):
+
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+        self.cache.invalidate('a')
+        self.assertEqual(self.cache.get('a'), None)
+        self.assertEqual(self.cache.get('b'), 2)
+
+        self.cache.invalidate()
+        self.assertEqual(len(self.cache), 0)
+
+        cache = pyrt.pyrt._Cache(0)
+        cache.put('a', 1)
+        self.assertEqual(cache.get('a'), None)
+
 
 class TestTicketList(unittest.TestCase):
 
@@ -67,6 +416,38 @@ class TestTicketList(unittest.TestCase):
 
         self.tl = pyrt.TicketList(data, pyrt.RT4())
 
+    def test_lazy_tickets(self):
+
+        tickets = self.tl.tickets
+        self.assertEqual(len(tickets), 6)
+        self.assertEqual(tickets._tickets, {})
+
+        self.tl.list_all()
+        self.assertEqual(tickets._tickets, {})
+
+        ticket = tickets['25']
+        self.assertEqual(ticket.subject, 'test 2')
+        self.assertIs(tickets['25'], ticket)
+        self.assertEqual(list(tickets._tickets), ['25'])
+
+        ticket.subject = 'changed'
+        self.assertIn((25, 'changed'), self.tl.list_all())
+
+        with self.assertRaises(KeyError):
+
+            tickets['404']
+
+    def test_init_data(self):
+
+        data = {
+            '10': {'Subject': 'Test 1', 'Priority': '5'},
+            '25': {'Subject': 'test 2'},
+        }
+        tl = pyrt.TicketList(data, pyrt.RT4())
+        self.assertEqual(tl.tickets['10'].subject, 'Test 1')
+        self.assertEqual(tl.tickets['10'].priority, '5')
+        self.assertItemsEqual(tl.list_all(), ((10, 'Test 1'), (25, 'test 2')))
+
     def test_list_all(self):
 
         out = self.tl.list_all()
@@ -97,6 +478,272 @@ class TestRT4(unittest.TestCase):
         aout = {'user': 'test login', 'pass': 'test pass'}
         self.assertEqual(self.rt.credentials, aout)
 
+    def test_session(self):
+
+        adapter = self.rt.session.get_adapter('http://localhost/')
+        self.assertEqual(adapter._pool_maxsize, 10)
+
+        rt = pyrt.RT4(pool_connections=2, pool_maxsize=20, pool_block=True)
+        adapter = rt.session.get_adapter('https://localhost/')
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 20)
+        self.assertTrue(adapter._pool_block)
+
+        rt = pyrt.RT4(keep_alive=False)
+        self.assertEqual(rt.session.headers['Connection'], 'close')
+
+    def test_injected_session(self):
+
+        session = FakeSession(['RT/4.0 200 ok\n\nSubject: test\n'])
+        rt = pyrt.RT4('http://rt/REST/1.0/', session=session)
+        rt.login('test', 'testpass')
+
+        data = rt.load_ticket('1')
+        self.assertEqual(data, {'Subject': 'test'})
+
+        method, url, kwargs = session.requests[0]
+        self.assertEqual(method, 'GET')
+        self.assertEqual(url, 'http://rt/REST/1.0/ticket/1/show')
+        self.assertEqual(kwargs['params'], rt.credentials)
+
+        rt.create_ticket({'content': 'Queue: General\n'})
+        method, url, kwargs = session.requests[1]
+        self.assertEqual(method, 'POST')
+        self.assertEqual(url, 'http://rt/REST/1.0/ticket/new')
+
+        # injected session stays open
+        with rt:
+
+            pass
+
+        self.assertFalse(session.closed)
+
+    def test_cookie_login(self):
+
+        session = FakeSession([
+            'RT/4.0 200 Ok\n\n',
+            'RT/4.0 200 Ok\n\nSubject: test\n',
+            'RT/4.0 401 Credentials required\n\n',
+            'RT/4.0 200 Ok\n\n',
+            'RT/4.0 200 Ok\n\nSubject: test 2\n',
+        ])
+        rt = pyrt.RT4('http://rt/REST/1.0/', session=session)
+        rt.login('test', 'testpass', cookie=True)
+        self.assertEqual(rt.credentials, None)
+
+        method, url, kwargs = session.requests[0]
+        self.assertEqual((method, url), ('POST', 'http://rt/REST/1.0/'))
+        self.assertEqual(kwargs['data'], {'user': 'test', 'pass': 'testpass'})
+
+        self.assertEqual(rt.load_ticket('1'), {'Subject': 'test'})
+        self.assertEqual(session.requests[1][2]['params'], None)
+
+        # expired session
+        self.assertEqual(rt.load_ticket('2'), {'Subject': 'test 2'})
+        self.assertEqual(len(session.requests), 5)
+        self.assertEqual(session.requests[3][1], 'http://rt/REST/1.0/')
+        self.assertEqual(
+            session.requests[4][1], 'http://rt/REST/1.0/ticket/2/show')
+
+        session = FakeSession(['RT/4.0 401 Credentials required\n\n'])
+        rt = pyrt.RT4(session=session)
+        with self.assertRaises(pyrt.BadRequestException):
+
+            rt.login('test', 'badpass', cookie=True)
+
+    def test_observers(self):
+
+        session = FakeSession([
+            'RT/4.0 200 Ok\n\nSubject: +ěščřž\n',
+            'RT/4.0 200 Ok\n\n1: First\n',
+            (
+                'RT/4.0 200 Ok\n\nid: 10\nTicket: 1\nType: Create\n'
+                'Creator: root\n'
+            ),
+            'RT/4.0 400 Bad Request\n\n# Invalid\n',
+        ])
+        events = []
+        rt = pyrt.RT4(session=session, observers=[events.append])
+
+        rt.load_ticket('1')
+        rt.search_ticket('Queue = "General"')
+
+        with self.assertRaises(pyrt.ParseError):
+
+            rt.load_history('1')
+
+        self.assertEqual(rt.create_ticket({}), 'Cannot create ticket.')
+
+        self.assertEqual(
+            [(e.method, e.endpoint, e.ticket, e.status) for e in events],
+            [
+                ('GET', 'ticket/show', '1', '200'),
+                ('GET', 'search/ticket', None, '200'),
+                ('GET', 'ticket/history', '1', '200'),
+                ('POST', 'ticket/new', None, '400'),
+            ])
+        self.assertEqual(events[0].bytes, len(
+            'RT/4.0 200 Ok\n\nSubject: +ěščřž\n'.encode('utf-8')))
+        self.assertIsInstance(events[2].error, pyrt.ParseError)
+        self.assertIsInstance(events[3].error, pyrt.BadRequestException)
+        self.assertEqual(events[0].error, None)
+
+        for event in events:
+
+            self.assertGreaterEqual(event.network_time, 0)
+            self.assertGreaterEqual(event.parse_time, 0)
+
+    def test_observers_stream(self):
+
+        session = FakeSession([
+            'RT/4.0 200 Ok\n\n',
+            'RT/4.0 200 Ok\n\n' + transaction_text('10', 'Created'),
+        ])
+        events = []
+        rt = pyrt.RT4(session=session, observers=[events.append])
+        rt.login('test', 'testpass', cookie=True)
+
+        self.assertEqual(len(list(rt.iter_history('1'))), 1)
+        self.assertEqual(
+            [(e.endpoint, e.status, e.parse_time) for e in events],
+            [('login', '200', None), ('ticket/history', '200', None)])
+
+    def test_get_tickets(self):
+
+        def handler(method, url, kwargs):
+
+            id_ = url.split('/')[-2]
+            if id_ == '3':
+
+                raise ValueError('connection error')
+
+            if id_ == '4':
+
+                return 'RT/4.0 200 Ok\n\n# Ticket 4 does not exist.\n'
+
+            return 'RT/4.0 200 Ok\n\nSubject: Ticket {}\n'.format(id_)
+
+        rt = pyrt.RT4(session=FakeSession(handler=handler))
+        ids = [str(i) for i in range(1, 21)]
+        errors = {}
+
+        tickets = list(rt.get_tickets(ids, workers=4, errors=errors))
+        self.assertEqual(
+            [t.id_ for t in tickets], [i for i in ids if i not in '34'])
+        for ticket in tickets:
+
+            self.assertEqual(ticket.subject, 'Ticket ' + ticket.id_)
+
+        self.assertEqual(sorted(errors), ['3', '4'])
+        self.assertIsInstance(errors['3'], ValueError)
+        self.assertIsInstance(errors['4'], pyrt.BadRequestException)
+
+        tickets = []
+        with self.assertRaises(pyrt.BatchError) as cm:
+
+            for ticket in rt.get_tickets(ids, workers=4, ordered=False):
+
+                tickets.append(ticket)
+
+        self.assertEqual(len(tickets), 18)
+        self.assertEqual(sorted(cm.exception.errors), ['3', '4'])
+
+    def test_user_cache(self):
+
+        session = FakeSession([
+            (
+                'RT/4.0 200 Ok\n\nid: user/10\nName: test\n'
+                'EmailAddress: test@example.com\nLang: CS\nDisabled: 0\n'
+            ),
+            'RT/4.0 200 Ok\n\nMessage: User updated.\n',
+            'RT/4.0 200 Ok\n\nid: user/10\nName: test\nLang: en\n',
+            'RT/4.0 200 Ok\n\n# No user named nobody exists.\n',
+        ])
+        rt = pyrt.RT4(session=session, user_cache_size=16)
+
+        self.assertTrue(rt.user_exists('test'))
+        self.assertEqual(rt.get_usermail('test'), 'test@example.com')
+        self.assertEqual(rt.get_userlang('test'), 'cs')
+        self.assertEqual(rt.get_user('test')['Name'], 'test')
+        self.assertEqual(len(session.requests), 1)
+
+        rt.get_user('test')['Lang'] = 'de'
+        self.assertEqual(rt.get_userlang('test'), 'cs')
+
+        rt.set_userlang('test', {'content': 'Lang: en\n'})
+        self.assertEqual(rt.get_userlang('test'), 'en')
+        self.assertEqual(len(session.requests), 3)
+
+        # missing users are not cached
+        self.assertFalse(rt.user_exists('nobody'))
+        self.assertEqual(rt.get_usermail('nobody'), '')
+        self.assertEqual(len(session.requests), 5)
+
+        rt.invalidate_user()
+        self.assertEqual(len(rt.user_cache), 0)
+
+        # the cache is off by default
+        session = FakeSession()
+        rt = pyrt.RT4(session=session)
+        rt.get_user('test')
+        rt.get_user('test')
+        self.assertEqual(len(session.requests), 2)
+
+    def test_ticket_cache(self):
+
+        tickets = {'1': 'Mon Jun 20 06:35:11 2016'}
+
+        def handler(method, url, kwargs):
+
+            if method == 'POST':
+
+                tickets['1'] = 'Tue Jun 21 08:00:00 2016'
+
+                return 'RT/4.0 200 Ok\n\n# Comments added\n'
+
+            reply = 'RT/4.0 200 Ok\n\nLastUpdated: {}\n'.format(tickets['1'])
+            if not kwargs['params']:
+
+                reply += 'id: ticket/1\nSubject: test\n'
+
+            return reply
+
+        session = FakeSession(handler=handler)
+        rt = pyrt.RT4(session=session, ticket_cache_size=10)
+
+        data = rt.load_ticket('1')
+        self.assertEqual(data['Subject'], 'test')
+        data['Subject'] = 'changed'
+
+        # revalidation asks only for LastUpdated
+        ticket = rt.get_ticket('1')
+        self.assertEqual(ticket.subject, 'test')
+        self.assertEqual(
+            session.requests[1][2]['params'], {'fields': 'LastUpdated'})
+        self.assertEqual(len(session.requests), 2)
+
+        # changed ticket
+        tickets['1'] = 'Mon Jun 20 07:00:00 2016'
+        self.assertEqual(rt.load_ticket('1')['LastUpdated'], tickets['1'])
+        self.assertEqual(len(session.requests), 4)
+
+        # comment invalidates the ticket
+        ticket.comment('text')
+        self.assertEqual(len(rt.ticket_cache), 0)
+        self.assertEqual(rt.load_ticket('1')['LastUpdated'], tickets['1'])
+        self.assertEqual(len(session.requests), 6)
+
+        rt.invalidate_ticket()
+        self.assertEqual(len(rt.ticket_cache), 0)
+
+        # disabled cache
+        session = FakeSession(handler=handler)
+        rt = pyrt.RT4(session=session)
+        rt.load_ticket('1')
+        rt.load_ticket('1')
+        self.assertEqual(len(session.requests), 2)
+        self.assertEqual(len(rt.ticket_cache), 0)
+
     def test_check_reply(self):
 
         text = ''
@@ -121,6 +768,32 @@ class TestRT4(unittest.TestCase):
             text = 'RT/4.0 400 Bad request\n\nReason:\n'
             reply = self.rt.check_reply(text)
 
+        text = 'RT/4.0 200 ok\n\nSubject: +ěščřž\n\n\n'
+        reply = self.rt.check_reply(text.encode('utf-8'))
+        self.assertEqual(reply, 'Subject: +ěščřž\n')
+
+    def test_raw_replies(self):
+
+        text = 'RT/4.0 200 Ok\n\nSubject: +ěščřž\n'
+        self.assertEqual(
+            self.rt.parse_reply(text.encode('utf-8')),
+            {'Subject': '+ěščřž'})
+
+        # no declared charset - UTF-8 instead of detection
+        response = FakeResponse(text, content_type='text/plain')
+        response.encoding = 'ISO-8859-1'
+        self.assertEqual(self.rt._reply_text(response), text)
+
+        response = FakeResponse(text)
+        response.content = text.encode('iso-8859-2')
+        response.encoding = 'iso-8859-2'
+        response.headers['content-type'] = 'text/plain; charset=iso-8859-2'
+        self.assertEqual(self.rt._reply_text(response), text)
+
+        self.assertTrue(self.rt._unauthorized(b'RT/4.0 401 Credentials\n'))
+        self.assertTrue(self.rt._unauthorized('RT/4.0 401 Credentials'))
+        self.assertFalse(self.rt._unauthorized(b'RT/4.0 200 Ok\n\n401 x'))
+
     def test_history_id(self):
 
         text = 'test'
@@ -199,6 +872,128 @@ class TestRT4(unittest.TestCase):
 #            text = 'RT/4.0 400 Bad request\n\nReason:\n'
 #            reply = self.rt.parse_reply(text)
 
+    def test_parse_multi_reply(self):
+
+        text = ''
+        reply = self.rt.parse_multi_reply(text)
+        self.assertEqual(reply, None)
+
+        text = 'RT/4.0 400 Bad request\n\nTestfield: test\n'
+        reply = self.rt.parse_multi_reply(text)
+        self.assertEqual(reply, None)
+
+        text = 'RT/4.0 200 ok\n\nNo matching results.\n'
+        reply = self.rt.parse_multi_reply(text)
+        self.assertEqual(reply, [])
+
+        text = 'RT/4.0 200 ok\n\nid: ticket/1\nSubject: test\n'
+        reply = self.rt.parse_multi_reply(text)
+        areply = [{'id': 'ticket/1', 'Subject': 'test'}]
+        self.assertEqual(reply, areply)
+
+        text = (
+            'RT/4.0 200 ok\n\nid: ticket/1\nSubject: test: 1\n\n--\n\n'
+            '# Ticket 2 does not exist.\n\n--\n\n'
+            'id: ticket/3\nSubject: +ěščřž\n\n'
+        )
+        reply = self.rt.parse_multi_reply(text)
+        areply = [
+            {'id': 'ticket/1', 'Subject': 'test: 1'},
+            {'id': 'ticket/3', 'Subject': '+ěščřž'},
+        ]
+        self.assertEqual(reply, areply)
+
+    def test_load_tickets(self):
+
+        def handler(method, url, kwargs):
+
+            ids = url.split('/')[-2].split(',')
+            records = [
+                'id: ticket/{0}\nSubject: Ticket {0}\n'.format(id_)
+                for id_ in ids if id_ != '5'
+            ]
+
+            return 'RT/4.0 200 Ok\n\n' + '\n--\n\n'.join(records)
+
+        session = FakeSession(handler=handler)
+        rt = pyrt.RT4('http://rt/REST/1.0/', session=session)
+
+        tickets = rt.load_tickets(range(1, 8), chunk_size=3)
+        self.assertEqual(sorted(tickets), ['1', '2', '3', '4', '6', '7'])
+        self.assertEqual(tickets['7']['Subject'], 'Ticket 7')
+        self.assertEqual(
+            [r[1] for r in session.requests],
+            [
+                'http://rt/REST/1.0/ticket/1,2,3/show',
+                'http://rt/REST/1.0/ticket/4,5,6/show',
+                'http://rt/REST/1.0/ticket/7/show',
+            ])
+
+    def test_search_ticket(self):
+
+        session = FakeSession([
+            'RT/4.0 200 Ok\n\n1: First\n2: Second\n',
+            (
+                'RT/4.0 200 Ok\n\nid: ticket/1\nSubject: First\n'
+                'Priority: 10\nCreator: root\n\n--\n\n'
+                'id: ticket/2\nSubject: Second\nPriority: 50\n'
+            ),
+            'RT/4.0 200 Ok\n\nid: ticket/2\nPriority: 50\n',
+        ])
+        rt = pyrt.RT4('http://rt/REST/1.0/', session=session)
+        rt.login('test', 'testpass')
+
+        tl = rt.search_ticket('Queue="General"')
+        self.assertItemsEqual(tl.list_all(), ((1, 'First'), (2, 'Second')))
+        method, url, kwargs = session.requests[0]
+        self.assertEqual(url, 'http://rt/REST/1.0/search/ticket')
+        self.assertEqual(
+            kwargs['params'],
+            {'user': 'test', 'pass': 'testpass', 'query': 'Queue="General"'})
+
+        tl = rt.search_ticket('Queue="General"', format_='l')
+        self.assertItemsEqual(tl.list_all(), ((1, 'First'), (2, 'Second')))
+        self.assertEqual(tl.tickets['1'].priority, '10')
+        self.assertEqual(tl.tickets['1'].creator, 'root')
+        self.assertEqual(tl.tickets['2'].priority, '50')
+        self.assertEqual(session.requests[1][2]['params']['format'], 'l')
+
+        tl = rt.search_ticket('id=2', fields=['Priority'])
+        self.assertEqual(tl.tickets['2'].priority, '50')
+        params = session.requests[2][2]['params']
+        self.assertEqual(params['format'], 'l')
+        self.assertEqual(params['fields'], 'Priority')
+
+    def test_parse_ids_reply(self):
+
+        text = ''
+        reply = self.rt.parse_ids_reply(text)
+        self.assertEqual(reply, None)
+
+        text = 'RT/4.0 200 ok\n\nNo matching results.\n'
+        reply = self.rt.parse_ids_reply(text)
+        self.assertEqual(list(reply), [])
+
+        text = 'RT/4.0 200 ok\n\nticket/10\nticket/25\nticket/222555\n\n'
+        reply = self.rt.parse_ids_reply(text)
+        self.assertEqual(reply.typecode, 'l')
+        self.assertEqual(list(reply), [10, 25, 222555])
+
+    def test_search_ids(self):
+
+        session = FakeSession([
+            'RT/4.0 200 Ok\n\nticket/1\nticket/3\n',
+            'RT/4.0 400 Bad request\n\nInvalid query\n',
+        ])
+        rt = pyrt.RT4(session=session)
+
+        ids = rt.search_ids('Queue="General"')
+        self.assertEqual(list(ids), [1, 3])
+        self.assertEqual(session.requests[0][2]['params']['format'], 'i')
+
+        ids = rt.search_ids('Queue=')
+        self.assertEqual(list(ids), [])
+
     def test_parse_history_reply(self):
 
         text = ''
@@ -239,6 +1034,7 @@ class TestRT4(unittest.TestCase):
                 'id': '10',
                 'Ticket': '1234567890', 'Type': 'Create',
                 'Content': 'First line\nSecond line\n\nThird line.\n',
+                'Next': 'aaa',
                 'Creator': 'tuser',
                 'Description': 'Correspondence added',
                 'Created': '2013-06-20 06:35:11',
@@ -253,6 +1049,112 @@ class TestRT4(unittest.TestCase):
 
         self.assertEqual(out, aout)
 
+        text = (
+            'RT/4.0 200 ok\n\n# 2/2 (id/10/total)\n\nid: 10\n'
+            'Ticket: 1\nTimeTaken: 0\nType: Create\nCreator: tuser\n'
+            'Content: Help me\n         --\n         me\n'
+            'Description: Ticket created by tuser\n'
+            'Created: 2013-06-20 06:35:11\n'
+            'Attachments:\n             2: untitled (8b)\n\n--\n\n'
+            '# 2/2 (id/11/total)\n\nid: 11\nTicket: 1\n'
+            'Type: Status\nField: Status\nOldValue: new\nNewValue: open\n'
+            'Creator: root\nDescription: Status changed\n'
+            'Created: 2013-06-21 08:00:00\n'
+        )
+        out = self.rt.parse_history_reply(text)
+        self.assertEqual(sorted(out), ['10', '11'])
+        self.assertEqual(out['10']['Content'], 'Help me\n--\nme\n')
+        self.assertEqual(out['10']['TimeTaken'], '0')
+        self.assertEqual(out['10']['Attachments'], '2: untitled (8b)\n')
+        self.assertEqual(out['11']['NewValue'], 'open')
+        self.assertNotIn('Content', out['11'])
+
+        # missing, invalid and repeated fields
+        base = (
+            'RT/4.0 200 ok\n\nid: 10\nTicket: 1\nType: Create\n'
+            'Creator: tuser\nDescription: Created\n'
+        )
+        with self.assertRaises(pyrt.ParseError):
+
+            self.rt.parse_history_reply(base)
+
+        with self.assertRaises(pyrt.ParseError):
+
+            text = base.replace('id: 10', 'id: test') + 'Created: now\n'
+            self.rt.parse_history_reply(text)
+
+        with self.assertRaises(pyrt.ParseError):
+
+            text = base + 'Created: now\nType: Comment\n'
+            self.rt.parse_history_reply(text)
+
+        with self.assertRaises(pyrt.ParseError):
+
+            text = base + 'Created: now\nContent: a\nContent: b\n'
+            self.rt.parse_history_reply(text)
+
+    def test_iter_history(self):
+
+        text = (
+            'RT/4.0 200 ok\n\n# 2/2 (id/10/total)\n\nid: 10\n'
+            'Ticket: 1\nType: Create\nCreator: tuser\n'
+            'Content: Žluťoučký kůň\n         --\n         úpěl\n'
+            'Description: Ticket created by tuser\n'
+            'Created: 2013-06-20 06:35:11\n\n--\n\n'
+            '# 2/2 (id/11/total)\n\nid: 11\nTicket: 1\n'
+            'Type: Status\nCreator: root\nDescription: Status changed\n'
+            'Created: 2013-06-21 08:00:00\n\n'
+        )
+        session = FakeSession([text, text])
+        rt = pyrt.RT4(session=session)
+
+        history = rt.iter_history('1', chunk_size=7)
+        h_id, values = next(history)
+        self.assertEqual(h_id, '10')
+        self.assertEqual(values['Content'], 'Žluťoučký kůň\n--\núpěl\n')
+        self.assertEqual([h for h, _ in history], ['11'])
+
+        method, url, kwargs = session.requests[0]
+        self.assertEqual(url, 'http://localhost/REST/1.0/ticket/1/history')
+        self.assertTrue(kwargs['stream'])
+
+        self.assertEqual(
+            dict(rt.iter_history('1')), rt.parse_history_reply(text))
+
+        # no declared charset - UTF-8 as in non-streamed replies
+        def plain(*args, **kwargs):
+
+            response = FakeResponse(text, content_type='text/plain')
+            response.encoding = 'ISO-8859-1'
+
+            return response
+
+        session = FakeSession()
+        session.request = plain
+        rt = pyrt.RT4(session=session)
+        self.assertEqual(
+            dict(rt.iter_history('1', chunk_size=5)), rt.load_history('1'))
+        self.assertEqual(
+            rt.load_history('1')['10']['Content'],
+            'Žluťoučký kůň\n--\núpěl\n')
+
+        session = FakeSession(['RT/4.0 400 Bad request\n\nReason\n'])
+        rt = pyrt.RT4(session=session)
+        with self.assertRaises(pyrt.BadRequestException):
+
+            list(rt.iter_history('1'))
+
+        session = FakeSession([
+            'RT/4.0 200 Ok\n\n',
+            'RT/4.0 401 Credentials required\n\n',
+            'RT/4.0 200 Ok\n\n',
+            text,
+        ])
+        rt = pyrt.RT4('http://rt/REST/1.0/', session=session)
+        rt.login('test', 'testpass', cookie=True)
+        self.assertEqual(len(list(rt.iter_history('1'))), 2)
+        self.assertEqual(session.requests[2][1], 'http://rt/REST/1.0/')
+
     def test_strip_hashes(self):
 
         text = ''
@@ -271,6 +1173,108 @@ class TestRT4(unittest.TestCase):
         self.assertEqual(out, aout)
 
 
+def old_strip_hashes(lines):
+
+    return '\n'.join(
+        line for line in lines.split('\n') if not line.startswith('#'))
+
+
+def old_strip_all(history):
+
+    new_str = ''
+    nl = False
+    for char in old_strip_hashes(history):
+
+        if char == '\n':
+
+            if not nl:
+
+                new_str += char
+
+            nl = True
+
+        else:
+
+            new_str += char
+            nl = False
+
+    return new_str
+
+
+class TestStrip(unittest.TestCase):
+
+    texts = [
+        '',
+        '\n',
+        '#',
+        '#\n',
+        '\n#',
+        'a\n#x',
+        '#x\na',
+        '#x\n#y',
+        'a\n\n#y',
+        'a\n#x\n#y\n',
+        'a\n#\n#',
+        ' #x\n#\n\n\nb\n\n',
+        '# comment\nid: 10\n\n\nContent: +ěščřž\n  #not\n#\n--\n',
+    ]
+
+    def test_strip_hashes(self):
+
+        for text in self.texts:
+
+            self.assertEqual(
+                pyrt.strip_hashes(text), old_strip_hashes(text), text)
+
+    def test_strip_all(self):
+
+        for text in self.texts:
+
+            self.assertEqual(pyrt.strip_all(text), old_strip_all(text), text)
+
+    def test_random(self):
+
+        rand = random.Random(42)
+        for _ in range(2000):
+
+            text = ''.join(
+                rand.choice('#\na ') for _ in range(rand.randint(0, 30)))
+
+            self.assertEqual(pyrt.strip_hashes(text), old_strip_hashes(text))
+            self.assertEqual(pyrt.strip_all(text), old_strip_all(text))
+
+    def test_normalize(self):
+
+        history = (
+            'RT/4.0 200 ok\n\n# 2/2 (id/10/total)\n\nid: 10\n'
+            'Ticket: 1\nType: Create\nCreator: tuser\n'
+            'Content: first\n         second\n'
+            'Description: Ticket created by tuser\n'
+            'Created: 2013-06-20 06:35:11\n\n--\n\n'
+            '# 2/2 (id/11/total)\n\nid: 11\nTicket: 1\n'
+            'Type: Status\nCreator: root\nDescription: Status changed\n'
+            'Created: 2013-06-21 08:00:00\n\n'
+        )
+        show = 'RT/4.0 200 ok\n\n# comment\nid: ticket/1\nSubject: a\n'
+
+        rt = pyrt.RT4()
+        for normalize in (pyrt.strip_hashes, pyrt.strip_all):
+
+            normalized = pyrt.RT4(normalize=normalize)
+            self.assertEqual(
+                normalized.parse_history_reply(history),
+                rt.parse_history_reply(history))
+            self.assertEqual(
+                normalized.parse_reply(show), rt.parse_reply(show))
+
+        self.assertEqual(
+            pyrt.RT4(normalize=pyrt.strip_all).check_reply(history),
+            pyrt.strip_all(rt.check_reply(history)))
+        self.assertEqual(
+            pyrt.RT4(normalize=pyrt.strip_hashes).check_reply(show),
+            'id: ticket/1\nSubject: a\n')
+
+
 if __name__ == '__main__':
 
     unittest.main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import unittest
+
+import pyrt
+
+from test_pyrt import FakeSession
+
+
+def event(endpoint, network_time, parse_time=None, status='200', size=10):
+
+    event = pyrt.RequestEvent('GET', endpoint)
+    event.status = status
+    event.bytes = size
+    event.network_time = network_time
+    event.parse_time = parse_time
+
+    return event
+
+
+class TestRequestStats(unittest.TestCase):
+
+    def setUp(self):
+
+        self.stats = pyrt.RequestStats(bounds=[0.01, 0.1, 1])
+
+    def test_report(self):
+
+        for network_time in (0.005, 0.05, 0.05, 0.5, 5):
+
+            self.stats(event('ticket/show', network_time, 0.001))
+
+        failed = event('user', 0.2, status=None, size=None)
+        failed.error = ValueError()
+        self.stats(failed)
+
+        report = self.stats.report()
+        self.assertEqual(sorted(report), ['ticket/show', 'user'])
+
+        show = report['ticket/show']
+        self.assertEqual(show['count'], 5)
+        self.assertEqual(show['errors'], 0)
+        self.assertEqual(show['bytes'], 50)
+        self.assertEqual(show['statuses'], {'200': 5})
+        self.assertEqual(
+            show['network']['histogram'],
+            [(0.01, 1), (0.1, 2), (1, 1), (None, 1)])
+        self.assertEqual(show['network']['max'], 5)
+        self.assertEqual(show['network']['p50'], 0.1)
+        self.assertEqual(show['network']['p99'], 5)
+        self.assertAlmostEqual(show['parse']['mean'], 0.001)
+
+        user = report['user']
+        self.assertEqual((user['count'], user['errors']), (1, 1))
+        self.assertEqual(user['parse']['count'], 0)
+        self.assertEqual(user['parse']['mean'], None)
+
+    def test_summary(self):
+
+        self.stats(event('ticket/show', 0.001))
+        self.stats(event('search/ticket', 0.5))
+
+        lines = self.stats.summary().split('\n')
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith('search/ticket'))
+
+        self.stats.reset()
+        self.assertEqual(self.stats.report(), {})
+
+    def test_observer(self):
+
+        session = FakeSession(['RT/4.0 200 Ok\n\nSubject: test\n'] * 3)
+
+        stats = pyrt.RequestStats()
+        rt = pyrt.RT4(session=session, observers=[stats])
+        rt.load_ticket('1')
+        rt.load_ticket('2')
+        rt.get_user('root')
+
+        report = stats.report()
+        self.assertEqual(report['ticket/show']['count'], 2)
+        self.assertEqual(report['user']['count'], 1)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+#
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import pyrt
+
+from test_pyrt import FakeSession, transaction_text
+
+
+class TestTicketStore(unittest.TestCase):
+
+    def setUp(self):
+
+        self.store = pyrt.TicketStore(':memory:')
+
+    def tearDown(self):
+
+        self.store.close()
+
+    def test_ticket(self):
+
+        self.assertEqual(self.store.load_ticket('1'), None)
+
+        data = {'id': 'ticket/1', 'Subject': '+ěščřž'}
+        self.store.save_ticket('1', data)
+        self.assertEqual(self.store.load_ticket('1'), data)
+
+        data['Subject'] = 'changed'
+        self.store.save_ticket(1, data)
+        self.assertEqual(self.store.load_ticket('1'), data)
+        self.assertEqual(self.store.ticket_ids(), ['1'])
+
+    def test_history(self):
+
+        self.assertEqual(self.store.load_history('1'), {})
+
+        self.store.save_history('1', {'10': {'id': '10', 'Type': 'Create'}})
+        self.store.save_history('1', {'12': {'id': '12', 'Type': 'Status'}})
+        self.store.save_history('2', {'11': {'id': '11', 'Type': 'Create'}})
+
+        history = self.store.load_history('1')
+        self.assertEqual(sorted(history), ['10', '12'])
+        self.assertEqual(history['12']['Type'], 'Status')
+
+    def test_state(self):
+
+        self.assertEqual(self.store.get_state('1'), None)
+
+        self.store.set_state('1', 'Mon Jun 20 06:35:11 2016')
+        self.assertEqual(
+            self.store.get_state('1'), 'Mon Jun 20 06:35:11 2016')
+
+    def test_persistence(self):
+
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'tickets.db')
+
+        try:
+
+            with pyrt.TicketStore(path) as store:
+
+                store.save_ticket('1', {'Subject': 'test'})
+                store.set_state('1', 'now')
+
+            with pyrt.TicketStore(path) as store:
+
+                self.assertEqual(store.load_ticket('1'), {'Subject': 'test'})
+                self.assertEqual(store.get_state('1'), 'now')
+
+        finally:
+
+            shutil.rmtree(directory)
+
+
+class TestSearch(unittest.TestCase):
+
+    def setUp(self):
+
+        self.store = pyrt.TicketStore(':memory:')
+        self.rt = pyrt.RT4(store=self.store)
+
+        tickets = (
+            ('1', 'General', 'new', 'Nobody', '10',
+             'Mon Jun 20 06:35:11 2016', 'Mon Jun 20 06:35:11 2016'),
+            ('2', 'General', 'open', 'root', '50',
+             'Tue Jun 21 08:00:00 2016', 'Fri Jul 01 10:00:00 2016'),
+            ('3', 'Support', 'open', 'root', '90',
+             'Wed Jun 22 09:00:00 2016', 'Wed Jun 22 09:00:00 2016'),
+            ('4', 'Support', 'resolved', 'tuser', '',
+             'Thu Jun 23 10:00:00 2016', 'Not set'),
+        )
+        for id_, queue, status, owner, priority, created, updated in tickets:
+
+            self.store.save_ticket(id_, {
+                'id': 'ticket/' + id_,
+                'Subject': 'Ticket ' + id_,
+                'Queue': queue,
+                'Status': status,
+                'Owner': owner,
+                'Priority': priority,
+                'Created': created,
+                'LastUpdated': updated,
+            })
+
+    def tearDown(self):
+
+        self.store.close()
+
+    def search(self, **filters):
+
+        tl = self.rt.search_local(**filters)
+
+        return sorted(id_ for id_, _ in tl.list_all())
+
+    def test_search(self):
+
+        self.assertEqual(self.search(), [1, 2, 3, 4])
+        self.assertEqual(self.search(queue='General'), [1, 2])
+        self.assertEqual(self.search(status=['new', 'open']), [1, 2, 3])
+        self.assertEqual(self.search(queue='Support', owner='root'), [3])
+        self.assertEqual(self.search(priority=(50, None)), [2, 3])
+        self.assertEqual(self.search(priority=(None, 50)), [1, 2])
+        self.assertEqual(
+            self.search(created=('2016-06-21', '2016-06-22 23:59:59')),
+            [2, 3])
+        self.assertEqual(
+            self.search(
+                last_updated=(datetime.datetime(2016, 6, 22), None)),
+            [2, 3])
+        self.assertEqual(self.search(queue='Nothing'), [])
+
+    def test_search_days(self):
+
+        self.assertEqual(
+            self.search(created=('2016-06-20', '2016-06-20')), [1])
+        self.assertEqual(
+            self.search(created=(None, datetime.date(2016, 6, 21))), [1, 2])
+        self.assertEqual(
+            self.search(last_updated=(datetime.date(2016, 7, 1), None)), [2])
+
+    def test_ticket_data(self):
+
+        tl = self.rt.search_local(queue='Support', status='open')
+        ticket = tl.tickets['3']
+        self.assertEqual(ticket.subject, 'Ticket 3')
+        self.assertEqual(ticket.priority, '90')
+
+    def test_update(self):
+
+        self.store.save_ticket('1', {'Queue': 'Support', 'Status': 'open'})
+        self.assertEqual(self.search(queue='General'), [2])
+        self.assertEqual(self.search(queue='Support', status='open'), [1, 3])
+
+    def test_reindex(self):
+
+        self.store._db.execute('DELETE FROM ticket_index')
+        self.assertEqual(self.search(), [])
+
+        self.store.reindex()
+        self.assertEqual(self.search(queue='General'), [1, 2])
+
+    def test_no_store(self):
+
+        with self.assertRaises(TypeError):
+
+            pyrt.RT4().search_local(queue='General')
+
+
+class TestRTDate(unittest.TestCase):
+
+    def test_rt_date(self):
+
+        rt_date = pyrt.pyrt._rt_date
+        self.assertEqual(
+            rt_date('Mon Jun 20 06:35:11 2016'), '2016-06-20 06:35:11')
+        self.assertEqual(
+            rt_date('2013-06-20 06:35:11'), '2013-06-20 06:35:11')
+        self.assertEqual(rt_date('Not set'), None)
+        self.assertEqual(rt_date(''), None)
+        self.assertEqual(rt_date(None), None)
+
+
+class TestSyncTicket(unittest.TestCase):
+
+    def setUp(self):
+
+        self.last_updated = 'Mon Jun 20 06:35:11 2016'
+        self.transactions = ['10', '12']
+
+        def handler(method, url, kwargs):
+
+            path = url.split('/REST/1.0/ticket/1/')[1]
+            params = kwargs['params'] or {}
+
+            if path == 'show':
+
+                reply = 'RT/4.0 200 Ok\n\nLastUpdated: {}\n'.format(
+                    self.last_updated)
+                if not params:
+
+                    reply += 'id: ticket/1\nSubject: test\n'
+
+                return reply
+
+            if path == 'history' and params.get('format') == 'l':
+
+                return 'RT/4.0 200 Ok\n\n' + '\n--\n\n'.join(
+                    transaction_text(h_id, 'Comment')
+                    for h_id in self.transactions)
+
+            if path == 'history':
+
+                return 'RT/4.0 200 Ok\n\n' + ''.join(
+                    '{}: Comment\n'.format(h_id)
+                    for h_id in self.transactions)
+
+            h_id = path.split('/')[-1]
+
+            return 'RT/4.0 200 Ok\n\n' + transaction_text(h_id, 'Comment')
+
+        self.session = FakeSession(handler=handler)
+        self.store = pyrt.TicketStore(':memory:')
+        self.rt = pyrt.RT4(session=self.session, store=self.store)
+
+    def tearDown(self):
+
+        self.store.close()
+
+    def test_sync_ticket(self):
+
+        ticket = self.rt.sync_ticket('1')
+        self.assertEqual(ticket.subject, 'test')
+        self.assertEqual(sorted(ticket.history.history), ['10', '12'])
+        self.assertEqual(self.store.get_state('1'), self.last_updated)
+        self.assertEqual(sorted(self.store.load_history('1')), ['10', '12'])
+
+        # unchanged ticket - only LastUpdated is requested
+        requests = len(self.session.requests)
+        ticket = self.rt.sync_ticket('1')
+        self.assertEqual(len(self.session.requests), requests + 1)
+        self.assertEqual(ticket.subject, 'test')
+        self.assertEqual(len(ticket.history.history_list), 2)
+
+        # changed ticket - only the new transaction is loaded
+        self.last_updated = 'Tue Jun 21 08:00:00 2016'
+        self.transactions.append('15')
+        requests = len(self.session.requests)
+
+        ticket = self.rt.sync_ticket('1')
+        urls = [r[1] for r in self.session.requests[requests:]]
+        self.assertIn(
+            'http://localhost/REST/1.0/ticket/1/history/id/15', urls)
+        self.assertNotIn(
+            'http://localhost/REST/1.0/ticket/1/history/id/12', urls)
+        self.assertEqual(sorted(ticket.history.history), ['10', '12', '15'])
+        self.assertEqual(ticket.history.last_id, 15)
+        self.assertEqual(self.store.get_state('1'), self.last_updated)
+
+    def test_no_store(self):
+
+        with self.assertRaises(TypeError):
+
+            pyrt.RT4(session=self.session).sync_ticket('1')
+
+
+if __name__ == '__main__':
+
+    unittest.main()